@@ -0,0 +1,185 @@
+import multiprocessing
+import re
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# Opening <fa a=.. [p=..]> / <pa a=.. [p=..]> tag, or the matching closing tag
+ANNOTATION_TAG = re.compile(
+    r'<(fa|pa)\s+a=([^>\s]+)(?:\s+p=([^>\s]+))?[^>]*>|</(fa|pa)>'
+)
+
+def annotation_key(no, page_no=None):
+    """Key an annotation is referenced by: "no", or "no_page" when it has a page"""
+    return f"{no}_{page_no}" if page_no else no
+
+def annotation_keys(text):
+    """
+    List the annotations a text refers to
+    
+    Args:
+        text: Text that may contain annotation tags
+        
+    Returns:
+        Set of annotation keys, as used by render_annotations
+    """
+    if not text or ('<fa' not in text and '<pa' not in text):
+        return set()
+    return {annotation_key(number, page) for tag, number, page, _ in ANNOTATION_TAG.findall(text) if tag}
+
+# Indexes into an open-tag frame: [tag, number, page, raw tag, parts, footnotes]
+_TAG, _NUMBER, _PAGE, _RAW, _PARTS, _FOOTNOTES = range(6)
+
+def _escape_attribute(value):
+    """Escape quotes for an HTML attribute"""
+    return value.replace('"', '&quot;').replace("'", "&#39;")
+
+def _unwrap(frame, into):
+    """Emit a tag that was never closed as literal text into the enclosing frame"""
+    into[_PARTS].append(frame[_RAW])
+    into[_PARTS].extend(frame[_PARTS])
+    into[_FOOTNOTES].extend(frame[_FOOTNOTES])
+
+def render_annotations(text, annotations=None):
+    """
+    Convert <fa>/<pa> annotation tags into annotated HTML in a single pass
+
+    The text is split on tags once and walked left to right; nested tags
+    are tracked on a stack, so the cost is linear in the length of the
+    text. Tags that are never closed, and closing tags without an opening
+    tag, are kept as-is.
+
+    Args:
+        text: Text that may contain annotation tags
+        annotations: Map of annotation key ("no" or "no_page") to footnote
+            text, as returned by database.get_annotation_map. Without a map
+            each span only carries its key in data-footnote, and the page
+            sends the footnotes once (see the book view).
+
+    Returns:
+        Tuple of (html, footnotes); footnotes are dicts with number, page,
+        text and type, innermost first (text is None without a map)
+    """
+    if '<fa' not in text and '<pa' not in text:
+        return text, []
+
+    # split() yields: text, open tag, number, page, close tag, text, ...
+    pieces = ANNOTATION_TAG.split(text)
+    root = [None, None, None, '', [pieces[0]], []]
+    stack = [root]
+
+    for i in range(1, len(pieces), 5):
+        tag, number, page, closing = pieces[i:i + 4]
+        following = pieces[i + 4]
+
+        if tag:
+            raw = f'<{tag} a={number}' + (f' p={page}' if page else '') + '>'
+            stack.append([tag, number, page, raw, [following], []])
+            continue
+
+        # Closing tag: find the nearest open tag of the same type
+        depth = len(stack) - 1
+        while depth and stack[depth][_TAG] != closing:
+            depth -= 1
+        if not depth:
+            stack[-1][_PARTS].append(f'</{closing}>')
+            stack[-1][_PARTS].append(following)
+            continue
+        while len(stack) - 1 > depth:
+            _unwrap(stack.pop(), stack[-1])
+
+        frame = stack.pop()
+        parent = stack[-1]
+        number, page = frame[_NUMBER], frame[_PAGE]
+        key = annotation_key(number, page)
+        if annotations is None:
+            footnote_text = None
+            reference = f'data-footnote="{_escape_attribute(key)}"'
+        else:
+            footnote_text = annotations.get(key, f"Annotation {number} not found")
+            reference = f'title="{_escape_attribute(footnote_text)}"'
+
+        parent[_PARTS].append(
+            f'<span class="annotated-text" {reference} data-annotation="{number}">'
+            f'<sup class="annotation-number">{number}</sup>[{"".join(frame[_PARTS])}]</span>'
+        )
+        parent[_PARTS].append(following)
+        parent[_FOOTNOTES].extend(frame[_FOOTNOTES])
+        parent[_FOOTNOTES].append({
+            'number': number,
+            'page': page,
+            'text': footnote_text,
+            'type': frame[_TAG]
+        })
+
+    while len(stack) > 1:
+        _unwrap(stack.pop(), stack[-1])
+
+    return ''.join(root[_PARTS]), root[_FOOTNOTES]
+
+def render_fields(fields):
+    """
+    Render the annotation tags in the text fields of one row
+    
+    Spans reference their footnote by key, so the result does not change
+    when a footnote is edited.
+    
+    Args:
+        fields: Mapping of field name to raw text
+        
+    Returns:
+        Dictionary of field name to HTML for the fields that carry tags,
+        or None when none do
+    """
+    rendered = {}
+    for field, text in fields.items():
+        if text and ('<fa' in text or '<pa' in text):
+            rendered[field], _ = render_annotations(text)
+    return rendered or None
+
+def render_batch(batch):
+    """Render a list of (key, fields) rows; module level so a process pool can run it"""
+    return [(key, render_fields(fields)) for key, fields in batch]
+
+# Pool shared by every render_batches call of this process (see start_render_pool)
+_render_pool = None
+_render_pool_workers = None
+
+def start_render_pool(workers=None):
+    """
+    Create the process pool render_batches spreads large renders over
+    
+    Called once at startup. Its processes are started by a forkserver (or
+    spawned where there is none) on first use, so they never inherit the
+    state of a threaded web worker, and each web worker that forks from a
+    preloaded app starts its own.
+    
+    Args:
+        workers: Number of processes (default: one per CPU)
+    """
+    global _render_pool, _render_pool_workers
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+    _render_pool = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+    _render_pool_workers = workers
+
+def render_batches(batches, parallel=False):
+    """
+    Render batches of rows, optionally spread over the shared process pool
+    
+    Args:
+        batches: Lists of (key, fields) rows, e.g. one list per part
+        parallel: Render the batches in the pool of start_render_pool; rows
+            are rendered in this process when no pool was started
+        
+    Returns:
+        List of (key, rendered fields) in the order of the batches
+    """
+    if parallel and _render_pool is not None:
+        try:
+            results = _render_pool.map(render_batch, batches)
+            return [row for batch in results for row in batch]
+        except BrokenProcessPool:
+            # A pool process died (e.g. killed for memory); replace the pool for
+            # the next render and do this one here
+            start_render_pool(_render_pool_workers)
+    return [row for batch in batches for row in render_batch(batch)]
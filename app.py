@@ -1,13 +1,15 @@
-from flask import Flask, render_template
+from flask import Flask, render_template, g, request
 from datetime import datetime
+import os
 
 from flask_login import login_required
 from config import Config
 from extensions import db
 from markupsafe import Markup
-import re
 from extensions import db, login_manager  # import the new object
 from models import User                   # needed by user_loader
+from timing import current_timer
+from annotations import start_render_pool
 # Import blueprints
 from routes.statute_routes import statute_bp
 from routes.hierarchy_routes import hierarchy_bp
@@ -20,6 +22,11 @@ def create_app(config_class=Config):
     # Set up Flask app
     app = Flask(__name__)
     app.config.from_object(config_class)
+    app.logger.setLevel(app.config['LOG_LEVEL'])
+    if app.config.get('ANNOTATION_CACHE_DIR') is None:
+        app.config['ANNOTATION_CACHE_DIR'] = os.path.join(app.instance_path, 'annotation-cache')
+    if app.config.get('RENDER_PARALLEL_THRESHOLD'):
+        start_render_pool(app.config.get('RENDER_PARALLEL_WORKERS'))
     
     # Initialize database with the app
     db.init_app(app)
@@ -50,6 +57,7 @@ def create_app(config_class=Config):
     @app.before_request
     def before_request():
         """Ensure fresh database connection for each request"""
+        current_timer()  # start timing the request
         try:
             # Test the connection
             db.session.execute(db.text('SELECT 1'))
@@ -58,6 +66,23 @@ def create_app(config_class=Config):
             db.session.rollback()
             db.session.remove()
     
+    @app.after_request
+    def report_timings(response):
+        """Send the phase timings of the request in Server-Timing and log them"""
+        timer = g.get('phase_timer')
+        if timer is None or not timer.phases:
+            return response
+        # A streamed body renders after this point; its header shows the phases
+        # so far and the log line, written once the stream closes, shows them all
+        response.headers['Server-Timing'] = timer.server_timing()
+        line = f"{request.method} {request.path} {response.status_code}"
+        logger = app.logger
+        if response.is_streamed:
+            response.call_on_close(lambda: logger.info(f"{line} {timer.summary()}"))
+        else:
+            logger.info(f"{line} {timer.summary()}")
+        return response
+    
     # Home route
     @app.route('/')
     @login_required
@@ -79,56 +104,23 @@ def create_app(config_class=Config):
     def process_annotations_filter(text, statute_id=None):
         """
         Template filter to process annotation tags in text.
-        This is a simplified version for template use.
+        Uses the same parser as the book view.
         """
         if not text or not statute_id:
             return text
         
         # Import here to avoid circular imports
-        from models import Annotation
+        from database import get_annotation_map
+        from annotations import render_annotations
         
-        # Get annotations for this statute
-        annotations = {}
+        # Get annotations for this statute (shared with the routes for the whole request)
         try:
-            statute_annotations = db.session.query(Annotation).filter(
-                Annotation.statute_id == statute_id
-            ).all()
-            
-            for ann in statute_annotations:
-                key = f"{ann.no}_{ann.page_no}" if ann.page_no else ann.no
-                annotations[key] = ann.footnote
+            annotations = get_annotation_map(statute_id)
         except Exception as e:
             app.logger.error(f"Error fetching annotations: {str(e)}")
             return text
         
-        processed_text = text
-        
-        # Pattern to match both fa and pa tags
-        pattern = r'<(fa|pa)\s+a=([^>\s]+)(?:\s+p=([^>\s]+))?[^>]*>(.*?)</\1>'
-        
-        def replace_annotation(match):
-            tag_type = match.group(1)  # 'fa' or 'pa'
-            a_value = match.group(2)   # annotation number
-            p_value = match.group(3)   # page number (optional)
-            content = match.group(4)   # text content
-            
-            # Create annotation key
-            ann_key = f"{a_value}_{p_value}" if p_value else a_value
-            
-            # Get footnote text
-            footnote_text = annotations.get(ann_key, f"Annotation {a_value} not found")
-            
-            # Escape quotes for HTML attribute
-            footnote_escaped = footnote_text.replace('"', '&quot;').replace("'", "&#39;")
-            
-            # Create formatted text with superscript and tooltip
-            formatted = f'<span class="annotated-text" title="{footnote_escaped}" data-annotation="{a_value}"><sup class="annotation-number">{a_value}</sup>[{content}]</span>'
-            
-            return formatted
-        
-        # Process all annotation tags (handle nesting by processing innermost first)
-        while re.search(pattern, processed_text, re.DOTALL):
-            processed_text = re.sub(pattern, replace_annotation, processed_text, flags=re.DOTALL)
+        processed_text, _ = render_annotations(text, annotations)
         
         return Markup(processed_text)
 
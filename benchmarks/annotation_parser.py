@@ -0,0 +1,87 @@
+"""
+Micro-benchmark: single-pass annotation parser vs. the old regex loop.
+
+Builds long schedule-style tables whose cells carry <fa>/<pa> tags: a flat
+table, the same table nested inside several amendment tags, and one with a
+stray unclosed tag per row. Times both implementations on each.
+
+    python benchmarks/annotation_parser.py [rows ...]
+"""
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from annotations import render_annotations
+
+PATTERN = r'<(fa|pa)\s+a=([^>\s]+)(?:\s+p=([^>\s]+))?[^>]*>(.*?)</\1>'
+
+def regex_loop(text, annotations):
+    """
+    The previous book-view implementation: match with a lazy DOTALL pattern,
+    recurse into every match, and re-scan the whole text until no tag is left
+    """
+    footnotes = []
+
+    def replace_annotation(match):
+        tag_type, a_value, p_value, content = match.groups()
+        ann_key = f"{a_value}_{p_value}" if p_value else a_value
+        footnote_text = annotations.get(ann_key, f"Annotation {a_value} not found")
+        processed_content, nested_footnotes = regex_loop(content, annotations)
+        footnotes.extend(nested_footnotes)
+        footnote_escaped = footnote_text.replace('"', '&quot;').replace("'", "&#39;")
+        footnotes.append({'number': a_value, 'page': p_value, 'text': footnote_text, 'type': tag_type})
+        return (f'<span class="annotated-text" title="{footnote_escaped}" data-annotation="{a_value}">'
+                f'<sup class="annotation-number">{a_value}</sup>[{processed_content}]</span>')
+
+    while re.search(PATTERN, text, re.DOTALL):
+        text = re.sub(PATTERN, replace_annotation, text, flags=re.DOTALL)
+    return text, footnotes
+
+def schedule_table(rows):
+    """A tariff-style table with an annotated cell or two on every row"""
+    lines = ['<table>']
+    for i in range(rows):
+        lines.append(
+            f'<tr><td>{i:04d}.10</td>'
+            f'<td><fa a={i % 40}>Goods of heading {i} <pa a={i % 7} p={i % 3 + 1}>excluding parts</pa></fa></td>'
+            f'<td>{i % 25}%</td><td><pa a={i % 11}>Subject to notification</pa></td></tr>'
+        )
+    lines.append('</table>')
+    return '\n'.join(lines)
+
+def nested_table(rows):
+    """The same table with the whole body wrapped in amendment upon amendment"""
+    depth = 6
+    opening = ''.join(f'<{"fa" if d % 2 else "pa"} a={d}>' for d in range(depth))
+    closing = ''.join(f'</{"fa" if d % 2 else "pa"}>' for d in reversed(range(depth)))
+    return opening + schedule_table(rows) + closing
+
+def unclosed_table(rows):
+    """The table with a stray, never-closed tag on every row (a half-typed edit)"""
+    return schedule_table(rows).replace('%</td>', '% <pa a=1></td>')
+
+CASES = [('flat', schedule_table), ('nested', nested_table), ('unclosed', unclosed_table)]
+
+def main(sizes):
+    annotations = {str(n): f'Inserted by Finance Act {2000 + n}' for n in range(40)}
+    annotations.update({f'{n}_{p}': f'Substituted by SRO {n}/{p}' for n in range(11) for p in range(1, 4)})
+
+    print(f"{'case':>8} {'rows':>8} {'chars':>10} {'regex loop':>12} {'single pass':>12} {'speedup':>8}")
+    for name, build in CASES:
+        for rows in sizes:
+            text = build(rows)
+            if name == 'flat':
+                # The old loop pairs an outer tag with the first inner closing tag of the
+                # same type, so only flat input is expected to render identically
+                assert regex_loop(text, annotations) == render_annotations(text, annotations)
+            runs = max(1, 200 // rows)
+            old = min(timeit.repeat(lambda: regex_loop(text, annotations), number=runs, repeat=3)) / runs
+            new = min(timeit.repeat(lambda: render_annotations(text, annotations), number=runs, repeat=3)) / runs
+            print(f"{name:>8} {rows:>8} {len(text):>10} {old * 1000:>10.2f}ms "
+                  f"{new * 1000:>10.2f}ms {old / new:>7.1f}x")
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [10, 100, 1000])
@@ -0,0 +1,55 @@
+"""
+Benchmark: rendering a whole statute in-process vs. in a process pool.
+
+Builds synthetic statutes of several sizes, split into parts the way
+database.render_stale_fragments batches them, and renders them with
+annotations.render_batches both ways. Use the results to pick
+RENDER_PARALLEL_THRESHOLD for the CPUs of the machine it will run on.
+
+    python benchmarks/parallel_render.py [subsections ...]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from annotations import render_batches, start_render_pool
+
+PARTS = 20
+
+def subsection_text(i):
+    """A paragraph of statute text with a few (partly nested) annotation tags"""
+    return (
+        f'({i % 9 + 1}) Where any goods specified in <fa a={i % 40}>column (2) of the Table</fa> are '
+        f'imported, the duty shall be levied <pa a={i % 11} p={i % 3 + 1}>at the rate specified '
+        f'<fa a={(i + 7) % 40}>in column (3)</fa></pa>, subject to the conditions in column (4). ' * 4
+    )
+
+def statute_batches(subsections):
+    """One batch of (key, fields) rows per part, as render_stale_fragments builds them"""
+    batches = [[] for _ in range(PARTS)]
+    for i in range(subsections):
+        batches[i % PARTS].append((('subsection', i), {'subsection_no': str(i), 'name': f'Heading {i}',
+                                                        'content': subsection_text(i)}))
+    return batches
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+def main(sizes):
+    print(f"CPUs: {os.cpu_count()}, parts per statute: {PARTS}")
+    start_render_pool()
+    render_batches(statute_batches(PARTS), parallel=True)  # start the pool's processes
+    print(f"{'subsections':>12} {'in-process':>12} {'pool':>12} {'speedup':>8}")
+    for size in sizes:
+        batches = statute_batches(size)
+        serial, expected = timed(lambda: render_batches(batches))
+        parallel, result = timed(lambda: render_batches(batches, parallel=True))
+        assert result == expected
+        print(f"{size:>12} {serial * 1000:>10.0f}ms {parallel * 1000:>10.0f}ms {serial / parallel:>7.2f}x")
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [500, 5000, 20000, 50000])
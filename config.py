@@ -31,6 +31,33 @@ class Config:
     STATUTES_PER_PAGE = 10
     ANNOTATIONS_PER_PAGE = 20
     
+    # Book view settings
+    BOOK_VIEW_STREAMING = os.environ.get('BOOK_VIEW_STREAMING', 'True').lower() in ('true', '1', 't')
+    BOOK_VIEW_BATCH_SIZE = 500  # Rows fetched per round trip while streaming
+    
+    # Annotation maps shared between workers (empty to keep them per worker only).
+    # Defaults to annotation-cache in the app's instance folder; the directory must
+    # belong to the app's user and not be writable by anyone else, or it is not used
+    ANNOTATION_CACHE_DIR = os.environ.get('ANNOTATION_CACHE_DIR')
+    ANNOTATION_MAP_CACHE_SIZE = 64  # Statutes whose maps each worker keeps in memory
+    
+    # Rendering a whole statute's annotations (first read after RENDER_VERSION changes):
+    # from this many rows on, parts are rendered in a process pool started with the app
+    # (0, the default, to always stay in-process; see benchmarks/parallel_render.py)
+    RENDER_PARALLEL_THRESHOLD = int(os.environ.get('RENDER_PARALLEL_THRESHOLD', 0))
+    RENDER_PARALLEL_WORKERS = None  # Defaults to one process per CPU
+    
+    # Inline editor saves with at least this many items (created, updated, deleted and
+    # reordered) run on a background thread, which the editor polls (0 to always run inline)
+    BULK_SAVE_ASYNC_THRESHOLD = int(os.environ.get('BULK_SAVE_ASYNC_THRESHOLD', 2000))
+    BULK_SAVE_WORKERS = 2  # Background saves run at once per process
+    BULK_SAVE_JOB_TIMEOUT = 600  # Seconds without progress after which a job counts as lost
+    
+    # Logging: phase timings are logged at INFO; the debug trace of a request
+    # (row by row detail of saves) is logged for this share of requests (0 to 1)
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+    TRACE_SAMPLE_RATE = float(os.environ.get('TRACE_SAMPLE_RATE', 0.0))
+    
     # Session settings
     SESSION_TYPE = 'filesystem'
     PERMANENT_SESSION_LIFETIME = 86400  # 24 hours in seconds
@@ -39,6 +66,7 @@ class DevelopmentConfig(Config):
     """Development configuration"""
     DEBUG = True
     SQLALCHEMY_ECHO = True  # Log SQL queries
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'DEBUG')
 
 class ProductionConfig(Config):
     """Production configuration"""
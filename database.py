@@ -1,9 +1,25 @@
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError, DisconnectionError, OperationalError
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
-from flask import current_app
-from models import db, Statute, Part, Chapter, Set, Section, Subsection, Annotation
+from sqlalchemy import event, inspect
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from flask import current_app, g
+from annotations import render_fields, render_batches, annotation_key, annotation_keys
+from models import db, Statute, Part, Chapter, Set, Section, Subsection, Annotation, AnnotationUsage, StatuteSnapshot
 from models import SchPart, SchChapter, SchSet, SchSection, SchSubsection
+from models import HIERARCHY_PARENTS, log_bulk_action, HierarchyNode, PartNode, ChapterNode, SetNode, SectionNode, SubsectionNode
+from models import SchPartNode, SchChapterNode, SchSetNode, SchSectionNode, SchSubsectionNode
+from timing import phase, trace
+from datetime import datetime
+from itertools import chain
+import pytz
 import time
+from bisect import bisect_left
+import os
+import json
+import stat
+import threading
+import tempfile
+from collections import OrderedDict, defaultdict, namedtuple
 
 def check_exists(model, **kwargs):
     """
@@ -22,9 +38,14 @@ def check_exists(model, **kwargs):
         current_app.logger.error(f"Error checking existence: {str(e)}")
         return None
 
+# Sibling order keys are sparse: neighbours are ORDER_GAP apart, so a row can be
+# placed between two others without renumbering the rest of its group
+ORDER_GAP = 1024
+ORDER_KEY_MAX = 2 ** 31 - 1  # order_no is an INTEGER column
+
 def get_next_order_no(parent_id, model, parent_field):
     """
-    Get the next order number for hierarchical items
+    Get the order key for a new last child of a hierarchical item
     
     Args:
         parent_id: ID of the parent record
@@ -32,22 +53,26 @@ def get_next_order_no(parent_id, model, parent_field):
         parent_field: Field name for the parent reference
         
     Returns:
-        Next order number (int)
+        Next order number (int), ORDER_GAP above the current last child
     """
     try:
-        # Query for the highest existing order_no and increment by 1
+        # Query for the highest existing order_no and leave a gap above it
         highest = db.session.query(db.func.max(model.order_no)).filter(
             getattr(model, parent_field) == parent_id
         ).scalar()
         
-        # If no records exist yet, start with 1
+        # If no records exist yet, start one gap up
         if highest is None:
-            return 1
+            return ORDER_GAP
+        
+        # Out of room at the top: spread the existing children out again first
+        if highest > ORDER_KEY_MAX - ORDER_GAP:
+            highest = rebalance_sibling_group(model, parent_field, parent_id)
             
-        return highest + 1
+        return highest + ORDER_GAP
     except SQLAlchemyError as e:
         current_app.logger.error(f"Error getting next order number: {str(e)}")
-        return 1  # Default to 1 if there's an error
+        return ORDER_GAP  # Default to the first key if there's an error
         
 def save_with_transaction(item):
     """
@@ -137,6 +162,327 @@ def save_with_transaction(item):
             return False, "Could not save due to an unexpected error."
     
     return False, f"Failed to save after {max_retries} attempts."
+def _load_annotation_map(statute_id):
+    """Read the footnotes of all annotations of a statute, keyed as in get_annotation_map"""
+    table = Annotation.__table__
+    rows = db.session.execute(
+        db.select(table.c.no, table.c.page_no, table.c.footnote)
+        .where(table.c.statute_id == statute_id)
+    )
+    return {annotation_key(no, page_no): footnote for no, page_no, footnote in rows}
+
+# ---------- Annotation map cache ----------
+
+# Maps already loaded by this worker: statute_id -> (annotation version, map), least
+# recently used first and at most ANNOTATION_MAP_CACHE_SIZE of them
+_worker_annotation_maps = OrderedDict()
+_worker_annotation_maps_lock = threading.Lock()  # Background saves share it with requests
+
+def get_annotation_version(statute_id):
+    """
+    Read the version of a statute's annotations that cached maps are checked against
+    
+    The revision counter is combined with the statute's creation time, so a
+    cache file left behind by a recreated database is never mistaken for
+    the current one.
+    
+    Returns:
+        Version string, or None if the statute does not exist
+    """
+    table = Statute.__table__
+    row = db.session.execute(
+        db.select(table.c.annotation_revision, table.c.created_at).where(table.c.id == statute_id)
+    ).first()
+    if row is None:
+        return None
+    revision, created_at = row
+    return f"{revision}@{created_at.isoformat() if created_at else ''}"
+
+def bump_annotation_revision(statute_id):
+    """Invalidate every cached annotation map of a statute, leaving updated_at alone"""
+    table = Statute.__table__
+    db.session.execute(
+        table.update()
+        .where(table.c.id == statute_id)
+        .values(annotation_revision=table.c.annotation_revision + 1,
+                updated_at=table.c.updated_at)
+    )
+
+# Cache directories checked by this process: {path: whether it is safe to use}
+_trusted_cache_dirs = {}
+
+def _annotation_cache_dir():
+    """
+    Get ANNOTATION_CACHE_DIR, created private to the app's user, or None
+    
+    Maps read from the directory end up in rendered pages, so it is only
+    used when it is a real directory owned by this user that nobody else
+    can write to; otherwise maps are kept per worker.
+    """
+    directory = current_app.config.get('ANNOTATION_CACHE_DIR')
+    if not directory:
+        return None
+    if directory not in _trusted_cache_dirs:
+        try:
+            os.makedirs(directory, mode=0o700, exist_ok=True)
+            info = os.lstat(directory)
+            trusted = (stat.S_ISDIR(info.st_mode) and info.st_uid == os.geteuid()
+                       and not info.st_mode & (stat.S_IWGRP | stat.S_IWOTH))
+        except OSError as e:
+            current_app.logger.warning(f"Could not create annotation cache: {str(e)}")
+            trusted = False
+        else:
+            if not trusted:
+                current_app.logger.warning(
+                    f"Not using annotation cache {directory}: it must be a directory owned by "
+                    f"this user and writable by no one else")
+        _trusted_cache_dirs[directory] = trusted
+    return directory if _trusted_cache_dirs[directory] else None
+
+def _annotation_cache_path(statute_id):
+    directory = _annotation_cache_dir()
+    return os.path.join(directory, f"{statute_id}.json") if directory else None
+
+def _read_cached_map(statute_id, version):
+    """Read a map another worker stored for this version, or None"""
+    path = _annotation_cache_path(statute_id)
+    if not path:
+        return None
+    try:
+        with open(path, encoding='utf-8') as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return cached.get('map') if cached.get('version') == version else None
+
+def _write_cached_map(statute_id, version, annotations):
+    """Store a map for other workers; replaced atomically so readers never see half a file"""
+    path = _annotation_cache_path(statute_id)
+    if not path:
+        return
+    try:
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump({'version': version, 'map': annotations}, f)
+        os.replace(temp_path, path)
+    except OSError as e:
+        current_app.logger.warning(f"Could not write annotation cache: {str(e)}")
+
+def _shared_annotation_map(statute_id):
+    """
+    Get the annotation map of a statute from the cheapest up-to-date source
+    
+    The statute's annotation version is read first; a map cached by this
+    worker or by another worker (in ANNOTATION_CACHE_DIR) is reused when it
+    was stored for the same version, otherwise it is read from the database.
+    """
+    version = get_annotation_version(statute_id)
+    if version is None:
+        return _load_annotation_map(statute_id)
+    
+    with _worker_annotation_maps_lock:
+        cached = _worker_annotation_maps.get(statute_id)
+        if cached and cached[0] == version:
+            _worker_annotation_maps.move_to_end(statute_id)
+            return cached[1]
+    
+    annotations = _read_cached_map(statute_id, version)
+    if annotations is None:
+        annotations = _load_annotation_map(statute_id)
+        _write_cached_map(statute_id, version, annotations)
+    with _worker_annotation_maps_lock:
+        _worker_annotation_maps[statute_id] = (version, annotations)
+        _worker_annotation_maps.move_to_end(statute_id)
+        while len(_worker_annotation_maps) > current_app.config.get('ANNOTATION_MAP_CACHE_SIZE', 64):
+            _worker_annotation_maps.popitem(last=False)
+    return annotations
+
+def get_annotation_map(statute_id):
+    """
+    Get the footnotes of all annotations of a statute, loaded once per request
+    
+    The map is cached on flask.g for the request and shared between
+    workers through _shared_annotation_map, so a request normally costs a
+    single version lookup per statute.
+    
+    Args:
+        statute_id: ID of the statute
+        
+    Returns:
+        Dictionary mapping annotation key ("no" or "no_page") to footnote text
+    """
+    cache = g.setdefault('annotation_maps', {})
+    if statute_id not in cache:
+        cache[statute_id] = _shared_annotation_map(statute_id)
+    return cache[statute_id]
+
+# ---------- Hierarchy levels ----------
+
+# One level of a statute tree; every traversal below is driven by TREE_LEVELS
+HierarchyLevel = namedtuple('HierarchyLevel', [
+    'name', 'model', 'parent_field', 'number_field', 'node_type', 'child_key', 'child_level'
+])
+
+TREE_LEVELS = {level.name: level for level in (
+    HierarchyLevel('part', Part, 'statute_id', 'part_no', PartNode, 'chapters', 'chapter'),
+    HierarchyLevel('chapter', Chapter, 'part_id', 'chapter_no', ChapterNode, 'sets', 'set'),
+    HierarchyLevel('set', Set, 'chapter_id', 'set_no', SetNode, 'sections', 'section'),
+    HierarchyLevel('section', Section, 'set_id', 'section_no', SectionNode, 'subsections', 'subsection'),
+    HierarchyLevel('subsection', Subsection, 'section_id', 'subsection_no', SubsectionNode, None, None),
+    HierarchyLevel('sch_part', SchPart, 'statute_id', 'part_no', SchPartNode, 'sch_chapters', 'sch_chapter'),
+    HierarchyLevel('sch_chapter', SchChapter, 'sch_part_id', 'chapter_no', SchChapterNode, 'sch_sets', 'sch_set'),
+    HierarchyLevel('sch_set', SchSet, 'sch_chapter_id', 'set_no', SchSetNode, 'sch_sections', 'sch_section'),
+    HierarchyLevel('sch_section', SchSection, 'sch_set_id', 'section_no', SchSectionNode, 'sch_subsections', 'sch_subsection'),
+    HierarchyLevel('sch_subsection', SchSubsection, 'sch_section_id', 'subsection_no', SchSubsectionNode, None, None),
+)}
+
+def _levels_from(name):
+    """List the levels of a tree from the given level down to its leaves"""
+    levels = []
+    while name:
+        levels.append(TREE_LEVELS[name])
+        name = TREE_LEVELS[name].child_level
+    return levels
+
+# The two trees of a statute, keyed by their key in the hierarchy document
+DOCUMENT_TREES = {
+    'parts': _levels_from('part'),
+    'sch_parts': _levels_from('sch_part'),
+}
+
+# Fields that may carry <fa>/<pa> annotation tags, per level
+ANNOTATED_FIELDS = {
+    'part': ('part_no', 'name'),
+    'chapter': ('chapter_no', 'name'),
+    'set': ('set_no', 'name'),
+    'section': ('section_no', 'name'),
+    'subsection': ('subsection_no', 'name', 'content'),
+    'sch_part': ('name',),
+    'sch_chapter': ('name',),
+    'sch_set': ('name',),
+    'sch_section': ('name',),
+    'sch_subsection': ('name', 'content'),
+}
+_ANNOTATED_LEVELS = {level.model: level.name for level in TREE_LEVELS.values()}
+
+# Column layout shared by every level so a whole statute can be read with one UNION ALL
+_UNIFORM_COLUMNS = ('id', 'parent_id', 'name', 'number', 'order_no', 'content')
+
+def _uniform_positions(level):
+    """Map the node fields of a level onto _UNIFORM_COLUMNS"""
+    renamed = {level.parent_field: 'parent_id', level.number_field: 'number'}
+    return [_UNIFORM_COLUMNS.index(renamed.get(name, name)) for name in level.node_type.columns]
+
+def _load_statute_nodes(statute_id):
+    """
+    Fetch every node of both trees of a statute in a single query
+    
+    Each level is one branch of a UNION ALL filtered on its indexed
+    statute_id column, so the body and the schedules cost one round trip
+    together no matter how the content is split between them.
+    
+    Args:
+        statute_id: ID of the statute
+        
+    Returns:
+        Dictionary mapping level name to its nodes ordered by order_no
+    """
+    levels = list(TREE_LEVELS.values())
+    branches = []
+    for index, level in enumerate(levels):
+        table = level.model.__table__
+        content = table.c.content if level.child_level is None else db.cast(db.null(), db.Text)
+        branches.append(
+            db.select(
+                db.literal(index).label('level'),
+                table.c.id,
+                table.c[level.parent_field].label('parent_id'),
+                table.c.name,
+                table.c[level.number_field].label('number'),
+                table.c.order_no,
+                content.label('content'),
+            ).where(table.c.statute_id == statute_id)
+        )
+    query = db.union_all(*branches)
+    query = query.order_by(query.selected_columns.level, query.selected_columns.order_no)
+    
+    positions = [_uniform_positions(level) for level in levels]
+    nodes = {level.name: [] for level in levels}
+    for row in db.session.execute(query):
+        index = row[0]
+        values = row[1:]
+        nodes[levels[index].name].append(
+            levels[index].node_type(*[values[i] for i in positions[index]])
+        )
+    return nodes
+
+def _children_by_parent(nodes, parent_field, children=None):
+    """
+    Group already-ordered nodes by their parent id, attaching their children
+    
+    Args:
+        nodes: Nodes ordered by order_no
+        parent_field: Field name for the parent reference
+        children: Mapping of node id to its list of child nodes
+        
+    Returns:
+        Dictionary mapping parent id to an ordered list of nodes
+    """
+    grouped = defaultdict(list)
+    for node in nodes:
+        if children is not None:
+            setattr(node, node.child_key, children.get(node.id, []))
+        grouped[getattr(node, parent_field)].append(node)
+    return grouped
+
+def _load_statute(statute_id):
+    """Fetch the statute fields shown with the hierarchy as a plain dict"""
+    table = Statute.__table__
+    row = db.session.execute(
+        db.select(table.c.id, table.c.name, table.c.act_no, table.c.date, table.c.preface)
+        .where(table.c.id == statute_id)
+    ).first()
+    if row is None:
+        return None
+    statute = dict(row._mapping)
+    statute['date'] = statute['date'].isoformat() if statute['date'] else None
+    return statute
+
+def _build_hierarchy(statute_id):
+    """
+    Build the full hierarchy of a statute, letting database errors propagate
+    
+    All nodes of the body and the schedules are fetched in one query and
+    both trees are assembled in memory by the same level-table driven loop.
+    
+    Args:
+        statute_id: ID of the statute
+        
+    Returns:
+        Dictionary with full hierarchy information, or None if not found
+    """
+    statute = _load_statute(statute_id)
+    if statute is None:
+        return None
+    
+    nodes = _load_statute_nodes(statute_id)
+    hierarchy = {'statute': statute}
+    for tree, levels in DOCUMENT_TREES.items():
+        # Assemble bottom-up so every row is visited exactly once
+        children = None
+        for level in reversed(levels):
+            children = _children_by_parent(nodes[level.name], level.parent_field, children)
+        hierarchy[tree] = children.get(statute_id, [])
+    return hierarchy
+
+def hierarchy_document(hierarchy):
+    """Convert a hierarchy built from nodes into plain JSON-ready dictionaries"""
+    return {
+        key: [node.to_dict() if isinstance(node, HierarchyNode) else node for node in value]
+        if isinstance(value, list) else value
+        for key, value in hierarchy.items()
+    }
+
 def get_full_hierarchy(statute_id):
     """
     Get the full hierarchy of a statute for display
@@ -148,122 +494,7 @@ def get_full_hierarchy(statute_id):
         Dictionary with full hierarchy information
     """
     try:
-        # Get the statute
-        statute = db.session.query(Statute).filter(Statute.id == statute_id).first()
-        if not statute:
-            return None
-        
-        # Get all parts with their children, ordered by order_no
-        parts = (db.session.query(Part)
-                .filter(Part.statute_id == statute_id)
-                .order_by(Part.order_no)
-                .all())
-        
-        parts_data = []
-        for part in parts:
-            chapters = (db.session.query(Chapter)
-                       .filter(Chapter.part_id == part.id)
-                       .order_by(Chapter.order_no)
-                       .all())
-            
-            chapters_data = []
-            for chapter in chapters:
-                sets = (db.session.query(Set)
-                       .filter(Set.chapter_id == chapter.id)
-                       .order_by(Set.order_no)
-                       .all())
-                
-                sets_data = []
-                for set_item in sets:
-                    sections = (db.session.query(Section)
-                              .filter(Section.set_id == set_item.id)
-                              .order_by(Section.order_no)
-                              .all())
-                    
-                    sections_data = []
-                    for section in sections:
-                        subsections = (db.session.query(Subsection)
-                                     .filter(Subsection.section_id == section.id)
-                                     .order_by(Subsection.order_no)
-                                     .all())
-                        
-                        subsections_data = [subsection.to_dict() for subsection in subsections]
-                        
-                        section_dict = section.to_dict()
-                        section_dict['subsections'] = subsections_data
-                        sections_data.append(section_dict)
-                    
-                    set_dict = set_item.to_dict()
-                    set_dict['sections'] = sections_data
-                    sets_data.append(set_dict)
-                
-                chapter_dict = chapter.to_dict()
-                chapter_dict['sets'] = sets_data
-                chapters_data.append(chapter_dict)
-            
-            part_dict = part.to_dict()
-            part_dict['chapters'] = chapters_data
-            parts_data.append(part_dict)
-        
-        # Get all schedule parts with their children, ordered by order_no
-        sch_parts = (db.session.query(SchPart)
-                    .filter(SchPart.statute_id == statute_id)
-                    .order_by(SchPart.order_no)
-                    .all())
-        
-        sch_parts_data = []
-        for sch_part in sch_parts:
-            sch_chapters = (db.session.query(SchChapter)
-                           .filter(SchChapter.sch_part_id == sch_part.id)
-                           .order_by(SchChapter.order_no)
-                           .all())
-            
-            sch_chapters_data = []
-            for sch_chapter in sch_chapters:
-                sch_sets = (db.session.query(SchSet)
-                           .filter(SchSet.sch_chapter_id == sch_chapter.id)
-                           .order_by(SchSet.order_no)
-                           .all())
-                
-                sch_sets_data = []
-                for sch_set in sch_sets:
-                    sch_sections = (db.session.query(SchSection)
-                                  .filter(SchSection.sch_set_id == sch_set.id)
-                                  .order_by(SchSection.order_no)
-                                  .all())
-                    
-                    sch_sections_data = []
-                    for sch_section in sch_sections:
-                        sch_subsections = (db.session.query(SchSubsection)
-                                         .filter(SchSubsection.sch_section_id == sch_section.id)
-                                         .order_by(SchSubsection.order_no)
-                                         .all())
-                        
-                        sch_subsections_data = [sch_subsection.to_dict() for sch_subsection in sch_subsections]
-                        
-                        sch_section_dict = sch_section.to_dict()
-                        sch_section_dict['sch_subsections'] = sch_subsections_data
-                        sch_sections_data.append(sch_section_dict)
-                    
-                    sch_set_dict = sch_set.to_dict()
-                    sch_set_dict['sch_sections'] = sch_sections_data
-                    sch_sets_data.append(sch_set_dict)
-                
-                sch_chapter_dict = sch_chapter.to_dict()
-                sch_chapter_dict['sch_sets'] = sch_sets_data
-                sch_chapters_data.append(sch_chapter_dict)
-            
-            sch_part_dict = sch_part.to_dict()
-            sch_part_dict['sch_chapters'] = sch_chapters_data
-            sch_parts_data.append(sch_part_dict)
-        
-        # Return the complete hierarchy
-        return {
-            'statute': statute.to_dict(),
-            'parts': parts_data,
-            'sch_parts': sch_parts_data
-        }
-        
+        return _build_hierarchy(statute_id)
     except SQLAlchemyError as e:
         db.session.rollback()
         current_app.logger.error(f"Database error getting hierarchy: {str(e)}")
@@ -272,6 +503,1186 @@ def get_full_hierarchy(statute_id):
         current_app.logger.error(f"Error getting hierarchy: {str(e)}")
         return None
 
+def get_with_ancestors(model, node_id):
+    """
+    Load a hierarchy row together with its whole ancestor chain in one query
+    
+    Args:
+        model: Hierarchy model class of the row (e.g. Subsection, SchSet)
+        node_id: ID of the row
+        
+    Returns:
+        Tuple of instances from the row itself up to its Statute
+        (e.g. subsection, section, set, chapter, part, statute), or None if not found
+    """
+    entities, joins = [model], []
+    child = model
+    while child in HIERARCHY_PARENTS:
+        parent, parent_field = HIERARCHY_PARENTS[child]
+        joins.append((parent, getattr(child, parent_field) == parent.id))
+        entities.append(parent)
+        child = parent
+    joins.append((Statute, child.statute_id == Statute.id))
+    entities.append(Statute)
+    
+    query = db.session.query(*entities)
+    for parent, onclause in joins:
+        query = query.join(parent, onclause)
+    return query.filter(model.id == node_id).first()
+
+# ---------- Lazy tree loading ----------
+
+def _load_tree_nodes(level, parent_ids, depth, with_content=True):
+    """
+    Load the nodes of one level for a batch of parents
+    
+    Args:
+        level: Key into TREE_LEVELS
+        parent_ids: IDs of the parent rows
+        depth: Number of levels to load, counting this one
+        with_content: Include subsection content, otherwise only a has_content flag
+        
+    Returns:
+        Dictionary mapping parent id to an ordered list of node dicts
+    """
+    descriptor = TREE_LEVELS[level]
+    model, parent_field, number_field = descriptor.model, descriptor.parent_field, descriptor.number_field
+    child_level = descriptor.child_level
+    table = model.__table__
+    columns = [table.c.id, table.c[parent_field], table.c.name, table.c[number_field], table.c.order_no]
+    if child_level is None and with_content:
+        columns.append(table.c.content)
+    elif child_level is None:
+        # Structure-only mode: leave the (large) content column on the server
+        columns.append((db.func.coalesce(db.func.length(table.c.content), 0) > 0).label('has_content'))
+    rows = db.session.execute(
+        db.select(*columns)
+        .where(table.c[parent_field].in_(parent_ids))
+        .order_by(table.c.order_no)
+    ).all()
+    ids = [row.id for row in rows]
+    
+    children, with_children = {}, set()
+    if child_level and ids:
+        child = TREE_LEVELS[child_level]
+        child_field = getattr(child.model, child.parent_field)
+        if depth > 1:
+            children = _load_tree_nodes(child_level, ids, depth - 1, with_content)
+            with_children = set(children)
+        else:
+            with_children = {pid for (pid,) in db.session.query(child_field)
+                             .filter(child_field.in_(ids)).distinct()}
+    
+    grouped = defaultdict(list)
+    for row in rows:
+        node = {
+            'id': row.id,
+            'level': level,
+            'name': row.name,
+            'number': row[3],
+            'order_no': row.order_no,
+            'has_children': row.id in with_children,
+        }
+        if child_level is None and with_content:
+            node['content'] = row.content
+        elif child_level is None:
+            node['has_content'] = row.has_content
+        if row.id in children:
+            node['children'] = children[row.id]
+        grouped[getattr(row, parent_field)].append(node)
+    return grouped
+
+def get_child_nodes(level, parent_id, depth=1, with_content=True):
+    """
+    Get the direct children of a node (and optionally deeper levels)
+    
+    Args:
+        level: Level of the children to load, a key of TREE_LEVELS
+        parent_id: ID of the parent node (statute ID for parts)
+        depth: Number of levels to load below the parent
+        with_content: Include subsection content; when False subsections
+            only carry has_content and the text is fetched with get_node_content
+        
+    Returns:
+        Ordered list of node dicts, each flagged with has_children
+    """
+    return _load_tree_nodes(level, [parent_id], depth, with_content).get(parent_id, [])
+
+def get_node_content(level, node_id):
+    """
+    Get the content of a single subsection
+    
+    Args:
+        level: 'subsection' or 'sch_subsection'
+        node_id: ID of the subsection
+        
+    Returns:
+        Dictionary with id, level and content, or None if not found
+    """
+    table = TREE_LEVELS[level].model.__table__
+    content = db.session.execute(
+        db.select(table.c.content).where(table.c.id == node_id)
+    ).first()
+    if content is None:
+        return None
+    return {'id': node_id, 'level': level, 'content': content[0]}
+
+# ---------- Document-order traversal ----------
+
+# One node of a statute in document order; index counts from 1 among its siblings
+DocumentBlock = namedtuple('DocumentBlock', ['level', 'node', 'index'])
+
+def iter_document_blocks(statute_id, tree='parts', batch_size=500, rendered=False):
+    """
+    Stream one tree of a statute in document order from a server-side cursor
+    
+    All levels are read in a single outer-joined query and fetched in
+    batches, so memory use does not depend on the size of the statute.
+    
+    Args:
+        statute_id: ID of the statute
+        tree: 'parts' for the body or 'sch_parts' for the schedules
+        batch_size: Number of rows fetched from the cursor at a time
+        rendered: Replace annotated fields with their pre-rendered HTML,
+            rendering (and storing) rows whose render is missing or stale
+        
+    Yields:
+        DocumentBlock tuples, each node before its children
+    """
+    levels = DOCUMENT_TREES[tree]
+    tables = [level.model.__table__ for level in levels]
+    columns, order_by = [], []
+    from_clause = tables[0]
+    for depth, level in enumerate(levels):
+        table = tables[depth]
+        if depth:
+            from_clause = from_clause.outerjoin(table, table.c[level.parent_field] == tables[depth - 1].c.id)
+        columns.extend(table.c[name] for name in level.node_type.columns)
+        if rendered:
+            columns.extend([table.c.rendered_html, table.c.render_version])
+        order_by.extend([table.c.order_no, table.c.id])
+    query = (db.select(*columns)
+             .select_from(from_clause)
+             .where(tables[0].c.statute_id == statute_id)
+             .order_by(*order_by)
+             .execution_options(yield_per=batch_size))
+    
+    widths = [len(level.node_type.columns) + (2 if rendered else 0) for level in levels]
+    current = [None] * len(levels)
+    counters = [0] * len(levels)
+    stale = []
+    for row in db.session.execute(query):
+        offset = 0
+        for depth, level in enumerate(levels):
+            values = row[offset:offset + widths[depth]]
+            offset += widths[depth]
+            if values[0] is None:
+                break
+            if values[0] == current[depth]:
+                continue
+            current[depth] = values[0]
+            counters[depth] += 1
+            # A new node restarts the sibling count of every level below it
+            for below in range(depth + 1, len(levels)):
+                current[below] = None
+                counters[below] = 0
+            node = level.node_type(*values)
+            if rendered:
+                html, version = values[-2:]
+                if version != RENDER_VERSION:
+                    html = render_annotated_fields(level.name, node)
+                    stale.append((level.name, node.id, html))
+                for field, value in (html or {}).items():
+                    node[field] = value
+            yield DocumentBlock(level.name, node, counters[depth])
+    
+    if stale:
+        store_rendered_fields(stale)
+
+# ---------- Pre-rendered annotations ----------
+
+# Bump whenever render_annotations changes its output; rows stamped with an
+# older version are re-rendered the next time they are read
+RENDER_VERSION = 2
+
+def render_annotated_fields(level, values):
+    """
+    Render the annotation tags in the annotated fields of one node
+    
+    Spans only reference their footnote by key, so stored fragments stay
+    valid when footnotes are edited; the book view sends the footnotes.
+    
+    Args:
+        level: Level name (a key of TREE_LEVELS)
+        values: Node, or mapping of field name to raw text
+        
+    Returns:
+        Dictionary of field name to HTML for the fields that carry tags,
+        or None when none do (the raw text is then shown as-is)
+    """
+    return render_fields({field: values.get(field) for field in ANNOTATED_FIELDS[level]})
+
+def _write_rendered(connection, level, rows):
+    """Store rendered fields for (id, html) rows of one level, leaving updated_at alone"""
+    table = TREE_LEVELS[level].model.__table__
+    connection.execute(
+        table.update()
+        .where(table.c.id == db.bindparam('node_id'))
+        .values(rendered_html=db.bindparam('html'),
+                render_version=RENDER_VERSION,
+                updated_at=table.c.updated_at),
+        [{'node_id': node_id, 'html': html} for node_id, html in rows]
+    )
+
+def store_rendered_fields(stale):
+    """
+    Save fields rendered on read, so later reads serve them as stored
+    
+    The rows are written on a connection of their own, so the reader's
+    transaction and its open cursors are left alone. A failure only costs
+    the next reader another render, so it is logged rather than raised.
+    
+    Args:
+        stale: List of (level name, node id, rendered fields) tuples
+    """
+    by_level = defaultdict(list)
+    for level, node_id, html in stale:
+        by_level[level].append((node_id, html))
+    try:
+        with db.engine.begin() as connection:
+            for level, rows in by_level.items():
+                _write_rendered(connection, level, rows)
+    except SQLAlchemyError as e:
+        current_app.logger.error(f"Database error storing rendered annotations: {str(e)}")
+
+def render_stale_fragments(statute_id):
+    """
+    Render every missing or stale fragment of a statute ahead of a read
+    
+    Rows are grouped by their top-level part (or schedule part). When the
+    number of rows to render reaches RENDER_PARALLEL_THRESHOLD the groups
+    are rendered in the shared process pool, otherwise in this process. The statute
+    is then stamped with RENDER_VERSION, so later reads skip this check.
+    The caller commits.
+    
+    Args:
+        statute_id: ID of the statute
+        
+    Returns:
+        Number of rows rendered
+    """
+    batches = []
+    for levels in DOCUMENT_TREES.values():
+        by_part = defaultdict(list)
+        for depth, level in enumerate(levels):
+            table = level.model.__table__
+            fields = ANNOTATED_FIELDS[level.name]
+            part_id = table.c.id if depth == 0 else table.c.path[1]
+            rows = db.session.execute(
+                db.select(table.c.id, part_id.label('part_id'), *[table.c[field] for field in fields])
+                .where(table.c.statute_id == statute_id,
+                       db.or_(table.c.render_version.is_(None), table.c.render_version != RENDER_VERSION))
+            )
+            for row in rows:
+                by_part[row.part_id].append(((level.name, row.id), {field: row[field] for field in fields}))
+        batches.extend(by_part[part_id] for part_id in sorted(by_part))
+    
+    count = sum(len(batch) for batch in batches)
+    if count:
+        threshold = current_app.config.get('RENDER_PARALLEL_THRESHOLD')
+        rendered = render_batches(
+            batches,
+            parallel=bool(threshold) and count >= threshold and len(batches) > 1
+        )
+        by_level = defaultdict(list)
+        for (level, node_id), html in rendered:
+            by_level[level].append((node_id, html))
+        for level, rows in by_level.items():
+            _write_rendered(db.session, level, rows)
+    
+    table = Statute.__table__
+    db.session.execute(
+        table.update()
+        .where(table.c.id == statute_id)
+        .values(render_version=RENDER_VERSION, updated_at=table.c.updated_at)
+    )
+    return count
+
+@event.listens_for(db.session, 'before_flush')
+def _render_changed_fields(session, flush_context, instances):
+    """Render annotated fields of new and edited hierarchy rows, and note changed annotations"""
+    annotated = session.info.setdefault('annotated_statutes', set())
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, Annotation):
+            if obj.statute_id is not None:
+                annotated.add(obj.statute_id)
+            continue
+        level = _ANNOTATED_LEVELS.get(type(obj))
+        if level is None or obj in session.deleted:
+            continue
+        fields = ANNOTATED_FIELDS[level]
+        if obj in session.dirty:
+            state = inspect(obj)
+            if not any(state.attrs[field].history.has_changes() for field in fields):
+                continue
+        obj.rendered_html = render_annotated_fields(level, {field: getattr(obj, field) for field in fields})
+        obj.render_version = RENDER_VERSION
+
+@event.listens_for(db.session, 'before_commit')
+def _refresh_annotated_statutes(session):
+    """Invalidate cached annotation maps of statutes whose annotations changed"""
+    session.flush()
+    for statute_id in session.info.pop('annotated_statutes', ()):
+        bump_annotation_revision(statute_id)
+
+@event.listens_for(db.session, 'after_rollback')
+def _discard_annotated_statutes(session):
+    session.info.pop('annotated_statutes', None)
+
+# ---------- Annotation usage index ----------
+
+# Text fields indexed for each model: model -> (node_table, fields)
+_USAGE_SOURCES = {level.model: (level.model.__tablename__, ANNOTATED_FIELDS[level.name])
+                  for level in TREE_LEVELS.values()}
+_USAGE_SOURCES[Statute] = ('statute', ('preface',))
+
+def get_annotation_usage_counts(annotations):
+    """
+    Count the places each annotation is referenced from
+    
+    Args:
+        annotations: Annotation instances
+        
+    Returns:
+        Dictionary mapping annotation id to the number of referencing rows
+    """
+    keyed = {(a.statute_id, annotation_key(a.no, a.page_no)): a.id for a in annotations}
+    if not keyed:
+        return {}
+    table = AnnotationUsage.__table__
+    rows = db.session.execute(
+        db.select(table.c.statute_id, table.c.annotation_key, db.func.count())
+        .where(db.tuple_(table.c.statute_id, table.c.annotation_key).in_(list(keyed)))
+        .group_by(table.c.statute_id, table.c.annotation_key)
+    )
+    counts = dict.fromkeys(keyed.values(), 0)
+    for statute_id, key, count in rows:
+        counts[keyed[(statute_id, key)]] = count
+    return counts
+
+def get_dangling_annotation_keys(statute_id):
+    """
+    List annotation keys referenced in a statute's text that have no annotation
+    
+    Args:
+        statute_id: ID of the statute
+        
+    Returns:
+        Sorted list of annotation keys
+    """
+    usage = AnnotationUsage.__table__
+    annotation = Annotation.__table__
+    defined = db.select(
+        db.case(
+            (db.func.coalesce(annotation.c.page_no, '') != '',
+             annotation.c.no + '_' + annotation.c.page_no),
+            else_=annotation.c.no
+        )
+    ).where(annotation.c.statute_id == statute_id)
+    rows = db.session.execute(
+        db.select(usage.c.annotation_key).distinct()
+        .where(usage.c.statute_id == statute_id, usage.c.annotation_key.not_in(defined))
+    )
+    return sorted(key for key, in rows)
+
+def annotation_usage_rows(node_table, node_id, statute_id, texts):
+    """annotation_usage rows for the annotations the text fields of one row refer to"""
+    keys = set().union(*(annotation_keys(text) for text in texts))
+    return [{'node_table': node_table, 'node_id': node_id, 'annotation_key': key, 'statute_id': statute_id}
+            for key in keys]
+
+@event.listens_for(db.session, 'after_flush')
+def _index_annotation_usage(session, flush_context):
+    """Replace the usage rows of every text field written in this flush"""
+    stale, usages = [], []
+    for obj in chain(session.new, session.dirty, session.deleted):
+        source = _USAGE_SOURCES.get(type(obj))
+        if source is None:
+            continue
+        node_table, fields = source
+        if obj in session.dirty:
+            state = inspect(obj)
+            if not any(state.attrs[field].history.has_changes() for field in fields):
+                continue
+        stale.append((node_table, obj.id))
+        if obj in session.deleted:
+            continue
+        statute_id = obj.id if isinstance(obj, Statute) else obj.statute_id
+        usages.extend(annotation_usage_rows(node_table, obj.id, statute_id,
+                                            [getattr(obj, field) for field in fields]))
+    
+    table = AnnotationUsage.__table__
+    if stale:
+        session.execute(table.delete().where(db.tuple_(table.c.node_table, table.c.node_id).in_(stale)))
+    if usages:
+        session.execute(table.insert(), usages)
+
+# ---------- Sibling order ----------
+
+def load_sibling_groups(level, statute_id, parent_ids=(), member_ids=()):
+    """
+    Read the current order of whole sibling groups of one level
+    
+    Args:
+        level: Level name, as in TREE_LEVELS
+        statute_id: Statute the groups belong to
+        parent_ids: Parents whose children to read
+        member_ids: Rows whose sibling groups to read as well
+        
+    Returns:
+        Dictionary of parent ID to a list of (id, order_no)
+    """
+    level = TREE_LEVELS[level]
+    table = level.model.__table__
+    parent = table.c[level.parent_field]
+    conditions = []
+    if parent_ids:
+        conditions.append(parent.in_(parent_ids))
+    if member_ids:
+        conditions.append(parent.in_(db.select(parent).where(table.c.id.in_(member_ids))))
+    groups = defaultdict(list)
+    if not conditions:
+        return groups
+    rows = db.session.execute(
+        db.select(table.c.id, parent, table.c.order_no)
+        .where(table.c.statute_id == statute_id, db.or_(*conditions))
+    )
+    for node_id, parent_id, order_no in rows:
+        groups[parent_id].append((node_id, order_no))
+    return groups
+
+def arrange_siblings(rows, requested):
+    """
+    Work out the new order of one sibling group
+    
+    Args:
+        rows: List of (id, order_no) of the group as it stands
+        requested: Dictionary of row ID to the position (from 1) the client
+            put it at; the other rows keep their order around them
+            
+    Returns:
+        List of row IDs in their new order
+    """
+    sequence = [node_id for node_id, _ in sorted(rows, key=lambda row: row[1]) if node_id not in requested]
+    for position, node_id in sorted((requested[node_id], node_id) for node_id, _ in rows if node_id in requested):
+        sequence.insert(max(0, min(position - 1, len(sequence))), node_id)
+    return sequence
+
+def _longest_increasing(sequence, keys):
+    """IDs of the longest run of rows, in sequence order, whose keys already increase"""
+    tails, tail_ids, previous = [], [], {}
+    for node_id in sequence:
+        key = keys.get(node_id)
+        if key is None:
+            continue
+        i = bisect_left(tails, key)
+        previous[node_id] = tail_ids[i - 1] if i else None
+        if i == len(tails):
+            tails.append(key)
+            tail_ids.append(node_id)
+        else:
+            tails[i] = key
+            tail_ids[i] = node_id
+    kept = set()
+    node_id = tail_ids[-1] if tail_ids else None
+    while node_id is not None:
+        kept.add(node_id)
+        node_id = previous[node_id]
+    return kept
+
+def order_keys_for(sequence, keys):
+    """
+    Choose order keys that sort a sibling group as sequence, moving as few rows as possible
+    
+    The longest run of rows whose keys are already in order keeps them; every
+    other row gets a key in the gap between its kept neighbours. When a gap
+    is too narrow the whole group is respaced ORDER_GAP apart.
+    
+    Args:
+        sequence: Row IDs in their new order
+        keys: Dictionary of row ID to its current order_no (None for new rows)
+        
+    Returns:
+        Dictionary of row ID to new order_no, for the rows that change
+    """
+    kept = _longest_increasing(sequence, keys)
+    new_keys = {}
+    lower, pending = 0, []
+    for node_id in sequence + [None]:
+        if node_id is not None and node_id not in kept:
+            pending.append(node_id)
+            continue
+        if pending:
+            upper = keys[node_id] if node_id is not None else lower + ORDER_GAP * (len(pending) + 1)
+            step = (upper - lower) // (len(pending) + 1)
+            if step < 1 or upper > ORDER_KEY_MAX:
+                break
+            new_keys.update((moved, lower + step * i) for i, moved in enumerate(pending, 1))
+            pending = []
+        if node_id is not None:
+            lower = keys[node_id]
+    else:
+        return new_keys
+    
+    # Out of room: respace the whole group
+    return {node_id: ORDER_GAP * i for i, node_id in enumerate(sequence, 1) if keys.get(node_id) != ORDER_GAP * i}
+
+def write_sibling_orders(level, positions, statute_id):
+    """
+    Give rows of one level new order numbers with a single UPDATE ... FROM (VALUES ...)
+    
+    The unique (parent, order_no) constraints are deferred to commit, so rows
+    can swap places without being parked on temporary numbers first.
+    
+    Args:
+        level: Level name, as in TREE_LEVELS
+        positions: Dictionary of row ID to its new order_no
+        statute_id: Statute the rows belong to
+    """
+    if not positions:
+        return
+    table = TREE_LEVELS[level].model.__table__
+    new_order = db.values(
+        db.column('node_id', db.Integer), db.column('order_no', db.Integer), name='new_order'
+    ).data(list(positions.items()))
+    db.session.execute(
+        table.update()
+        .where(table.c.id == new_order.c.node_id)
+        .values(order_no=new_order.c.order_no)
+    )
+    log_bulk_action(db.session, table.name, list(positions), "UPDATE")
+    mark_snapshot_stale(statute_id)
+
+def rebalance_sibling_group(model, parent_field, parent_id):
+    """
+    Respace the order keys of one sibling group ORDER_GAP apart, keeping their order
+    
+    Args:
+        model: SQLAlchemy model class
+        parent_field: Field name for the parent reference
+        parent_id: ID of the parent record
+        
+    Returns:
+        The highest order key in the group afterwards (0 when it is empty)
+    """
+    table = model.__table__
+    ranked = (
+        db.select(table.c.id, (db.func.row_number().over(order_by=table.c.order_no) * ORDER_GAP).label('order_no'))
+        .where(table.c[parent_field] == parent_id)
+        .subquery()
+    )
+    rows = db.session.execute(
+        table.update()
+        .where(table.c.id == ranked.c.id)
+        .values(order_no=ranked.c.order_no)
+        .returning(table.c.id, table.c.statute_id, table.c.order_no)
+    ).all()
+    if not rows:
+        return 0
+    log_bulk_action(db.session, table.name, [row.id for row in rows], "UPDATE")
+    mark_snapshot_stale(rows[0].statute_id)
+    return max(row.order_no for row in rows)
+
+# ---------- Subtrees ----------
+
+def _tree_of(level):
+    """The levels of the tree a level belongs to, top first"""
+    return next(levels for levels in DOCUMENT_TREES.values() if TREE_LEVELS[level] in levels)
+
+def _delete_rows(level, *conditions):
+    """Delete rows of a level with Core, keeping the audit log and usage index in step"""
+    table = level.model.__table__
+    ids = [node_id for node_id, in db.session.execute(
+        table.delete().where(*conditions).returning(table.c.id)
+    )]
+    if not ids:
+        return ids
+    log_bulk_action(db.session, table.name, ids, "DELETE")
+    usage = AnnotationUsage.__table__
+    db.session.execute(usage.delete().where(usage.c.node_table == table.name, usage.c.node_id.in_(ids)))
+    # Instances already loaded stay readable, but are no longer tracked by the session
+    mapper = inspect(level.model)
+    for node_id in ids:
+        obj = db.session.identity_map.get(mapper.identity_key_from_primary_key((node_id,)))
+        if obj is not None:
+            db.session.expunge(obj)
+    return ids
+
+def delete_subtrees(level, ids, statute_id):
+    """
+    Delete rows of one level and everything below them, without committing
+    
+    Each level below is cleared with one DELETE that selects the rows by
+    their materialized path (path && ids, served by the GIN index on path),
+    deepest level first, so no descendant is loaded through the ORM cascade.
+    
+    Args:
+        level: Level name, as in TREE_LEVELS
+        ids: IDs of the rows to delete
+        statute_id: Statute the rows belong to
+        
+    Returns:
+        Dictionary of level name to the IDs deleted
+    """
+    ids = list(ids)
+    if not ids:
+        return {}
+    tree = _tree_of(level)
+    depth = tree.index(TREE_LEVELS[level])
+    deleted = {}
+    for below in reversed(tree[depth + 1:]):
+        table = below.model.__table__
+        deleted[below.name] = _delete_rows(
+            below,
+            table.c.statute_id == statute_id,
+            table.c.path.overlap(ids),
+            table.c.path[depth + 1].in_(ids)  # the ancestor at this level, not an equal id of another
+        )
+    table = TREE_LEVELS[level].model.__table__
+    deleted[level] = _delete_rows(TREE_LEVELS[level], table.c.statute_id == statute_id, table.c.id.in_(ids))
+    mark_snapshot_stale(statute_id)
+    return deleted
+
+def delete_statute_trees(statute_id):
+    """Delete both trees of a statute by path, so deleting the statute itself has nothing left to cascade to"""
+    for levels in DOCUMENT_TREES.values():
+        table = levels[0].model.__table__
+        ids = db.session.execute(db.select(table.c.id).where(table.c.statute_id == statute_id)).scalars().all()
+        delete_subtrees(levels[0].name, ids, statute_id)
+
+# ---------- Inline editor saves ----------
+
+def allocate_ids(model, count):
+    """Take count IDs from the sequence of a table's id column in one round trip"""
+    table = model.__table__
+    sequence = db.func.pg_get_serial_sequence(table.name, 'id')
+    rows = db.session.execute(
+        db.select(db.func.nextval(sequence)).select_from(db.func.generate_series(1, count))
+    )
+    return [node_id for node_id, in rows]
+
+def load_child_paths(parent_level, parent_ids, statute_id):
+    """
+    Work out the statute_id and path children of existing rows inherit
+    
+    The batch form of models.hierarchy_path_for, for rows written with Core.
+    
+    Args:
+        parent_level: Level of the parents (a TREE_LEVELS value)
+        parent_ids: IDs of the parent rows
+        statute_id: Statute the parents must belong to
+        
+    Returns:
+        Dictionary of parent ID to (statute_id, path); parents that do not
+        exist in the statute are left out
+    """
+    table = parent_level.model.__table__
+    if parent_level.parent_field == 'statute_id':
+        rows = db.session.execute(
+            db.select(table.c.id).where(table.c.id.in_(parent_ids), table.c.statute_id == statute_id)
+        )
+        return {parent_id: (statute_id, [parent_id]) for parent_id, in rows}
+    rows = db.session.execute(
+        db.select(table.c.id, table.c.path).where(table.c.id.in_(parent_ids), table.c.statute_id == statute_id)
+    )
+    return {parent_id: (statute_id, list(path) + [parent_id]) for parent_id, path in rows}
+
+def insert_nodes(level, rows, statute_id):
+    """
+    Insert new rows of one level with a single multi-row INSERT
+    
+    Does what the ORM events do for rows added to the session: renders the
+    annotated fields, indexes annotation usage, writes the audit rows and
+    marks the statute's snapshot stale. statute_id and path must be set.
+    
+    Args:
+        level: Level of the rows (a TREE_LEVELS value)
+        rows: Column values of each row, including its id
+        statute_id: Statute the rows belong to
+    """
+    if not rows:
+        return
+    table = level.model.__table__
+    fields = ANNOTATED_FIELDS[level.name]
+    usages = []
+    for row in rows:
+        row['rendered_html'] = render_annotated_fields(level.name, row)
+        row['render_version'] = RENDER_VERSION
+        usages.extend(annotation_usage_rows(table.name, row['id'], statute_id, [row.get(field) for field in fields]))
+    db.session.execute(table.insert().values(rows))
+    if usages:
+        db.session.execute(AnnotationUsage.__table__.insert(), usages)
+    log_bulk_action(db.session, table.name, [row['id'] for row in rows], "INSERT")
+    mark_snapshot_stale(statute_id)
+
+def bulk_save_size(payload):
+    """Number of items in an inline editor save: created, updated, deleted and reordered"""
+    return sum(len(payload.get(key) or []) for key in ("created", "updated", "deleted", "order"))
+
+# Keys every item of each part of an inline editor save must carry
+BULK_SAVE_ITEM_KEYS = {
+    "created": ("level", "temp_id"),
+    "updated": ("level", "id"),
+    "deleted": ("level", "id"),
+    "order": ("level", "id", "order_no"),
+}
+
+def check_bulk_save(payload, tree):
+    """
+    Reject an inline editor save that is malformed or names levels of another tree
+    
+    Raises:
+        ValueError: When an item lacks a key it needs, names an existing row
+            by something other than its numeric ID, or names a level that
+            is not in the tree
+    """
+    levels = {level.name for level in DOCUMENT_TREES[tree]}
+    unknown = set()
+    for key, required in BULK_SAVE_ITEM_KEYS.items():
+        for item in payload.get(key) or []:
+            if not isinstance(item, dict) or any(item.get(field) is None for field in required):
+                raise ValueError(f"Malformed {key} item: {item!r}")
+            if key in ("updated", "deleted"):
+                try:
+                    int(item["id"])
+                except (TypeError, ValueError):
+                    raise ValueError(f"Malformed {key} item: {item!r}")
+            unknown.add(item["level"])
+    unknown -= levels
+    if unknown:
+        raise ValueError(f"Unknown levels for this tree: {', '.join(sorted(unknown))}")
+
+def apply_bulk_save(statute_id, payload, tree='parts', progress=None):
+    """
+    Apply one save of the inline editor to a statute tree, without committing
+    
+    Handles create / update / delete / reorder across all levels of the tree
+    and keeps order_no unique within every sibling group.
+    
+    Args:
+        statute_id: ID of the statute
+        payload: Dictionary with the created, updated and deleted items, the
+            requested order and the revision the client last saw, as posted
+            by statute-edit.js
+        tree: Key of the tree in DOCUMENT_TREES ('parts' or 'sch_parts')
+        progress: Called with the current phase and the number of payload
+            items processed so far (see bulk_save_size), e.g. by a job
+        
+    Returns:
+        Delta for the client: ids (temporary client ID -> ID of the created
+        row), nodes (final parent, number, name and order_no of every node
+        created, edited or moved), deleted, and stale (whether the statute
+        changed since the revision the client sent)
+        
+    Raises:
+        ValueError: When an item names a level that is not in the tree, or
+            a created or moved item a parent that is not in the statute or
+            that the save deletes (with its subtree)
+    """
+    check_bulk_save(payload, tree)
+    levels = {level.name: level for level in DOCUMENT_TREES[tree]}
+    parent_levels = {child.name: parent for parent, child in zip(DOCUMENT_TREES[tree], DOCUMENT_TREES[tree][1:])}
+    created = payload.get("created", [])
+    updated = payload.get("updated", [])
+    deleted = payload.get("deleted", [])
+    order_req = {(o["level"], o["id"]): o["order_no"] for o in payload.get("order", [])}
+    
+    base_revision = payload.get("revision")
+    with phase("load"):
+        stale = base_revision is not None and base_revision != get_statute_revision(statute_id)
+    
+    temp2real = {}
+    touched = defaultdict(set)  # {lvl: ids of rows created, edited or moved}
+    processed = 0
+    
+    def advance(current_phase, rows=0):
+        nonlocal processed
+        processed += rows
+        if progress:
+            progress(current_phase, processed)
+    
+    def load_rows(items):
+        """Fetch the rows named by items with one IN query per level, all of this statute"""
+        ids = defaultdict(set)
+        for item in items:
+            ids[item["level"]].add(int(item["id"]))
+        rows = {}
+        with phase("load"):
+            for lvl, level_ids in ids.items():
+                model = levels[lvl].model
+                for row in model.query.filter(model.id.in_(level_ids), model.statute_id == statute_id):
+                    rows[(lvl, row.id)] = row
+                missing = level_ids - {row_id for row_lvl, row_id in rows if row_lvl == lvl}
+                if missing:
+                    raise ValueError(f"Unknown {lvl} {', '.join(map(str, sorted(missing)))} in this statute")
+        return rows
+    
+    with db.session.no_autoflush:
+        # ---------- deletes ----------
+        # The requested rows and everything below them, by path, one DELETE per level
+        advance("delete")
+        removed = set()  # {(lvl, id)}
+        with phase("delete"):
+            delete_ids = defaultdict(set)
+            for item in deleted:
+                delete_ids[item["level"]].add(int(item["id"]))
+            for lvl, ids in delete_ids.items():
+                for below, below_ids in delete_subtrees(lvl, ids, statute_id).items():
+                    removed.update((below, node_id) for node_id in below_ids)
+                trace("bulk-save %s: delete %s %s", tree, lvl, sorted(ids))
+        
+        # ---------- creates ----------
+        # IDs come from one nextval batch per level, so temp IDs resolve before
+        # anything is written; each level is then one INSERT, parents first
+        new_ids = set()  # {(lvl, id)}
+        advance("create", len(deleted))
+        with phase("create"):
+            by_level = defaultdict(list)
+            for item in created:
+                by_level[item["level"]].append(item)
+            for level in levels.values():
+                items = by_level[level.name]
+                for item, node_id in zip(items, allocate_ids(level.model, len(items)) if items else ()):
+                    temp2real[item["temp_id"]] = node_id
+            
+            paths = {}  # {(lvl, id): (statute_id, path)} of the rows created so far
+            parent_level = None
+            for level in levels.values():
+                items = by_level[level.name]
+                if not items:
+                    parent_level = level
+                    continue
+                parent_ids = {}
+                for item in items:
+                    parent_id = temp2real.get(item.get("parent_id"), item.get("parent_id"))
+                    try:
+                        parent_ids[item["temp_id"]] = statute_id if parent_level is None else int(parent_id)
+                    except (TypeError, ValueError):
+                        raise ValueError(f"Unknown parent {item.get('parent_id')} for {item['temp_id']}")
+                if parent_level is not None:
+                    # A parent deleted above, itself or with its subtree, is gone by now;
+                    # say so rather than report it unknown
+                    for temp_id, parent_id in parent_ids.items():
+                        if (parent_level.name, parent_id) in removed:
+                            raise ValueError(f"Parent {parent_level.name} {parent_id} of {temp_id} is deleted by this save")
+                    existing = {parent_id for parent_id in parent_ids.values()
+                                if (parent_level.name, parent_id) not in paths}
+                    if existing:
+                        for parent_id, path in load_child_paths(parent_level, existing, statute_id).items():
+                            paths[(parent_level.name, parent_id)] = path
+                
+                rows = []
+                for item in items:
+                    node_id, parent_id = temp2real[item["temp_id"]], parent_ids[item["temp_id"]]
+                    row = {
+                        "id": node_id,
+                        level.parent_field: parent_id,
+                        level.number_field: item.get("number"),
+                        "name": item.get("name"),
+                        "order_no": 0,  # placeholder, given a key by the reorder below
+                    }
+                    if parent_level is not None:
+                        if (parent_level.name, parent_id) not in paths:
+                            raise ValueError(f"Unknown parent {item.get('parent_id')} for {item['temp_id']}")
+                        row["statute_id"], path = paths[(parent_level.name, parent_id)]
+                        row["path"] = path
+                        paths[(level.name, node_id)] = (row["statute_id"], path + [node_id])
+                    else:
+                        paths[(level.name, node_id)] = (statute_id, [node_id])
+                    if level.child_level is None:
+                        row["content"] = item.get("content")
+                    rows.append(row)
+                    new_ids.add((level.name, node_id))
+                    touched[level.name].add(node_id)
+                    trace("bulk-save %s: create %s %s as %s", tree, level.name, item["temp_id"], node_id)
+                insert_nodes(level, rows, statute_id)
+                advance("create", len(rows))
+                parent_level = level
+        
+        # ---------- updates ----------
+        advance("update")
+        # Rows the deletes above removed (edited, then deleted with an ancestor) are skipped
+        to_update = load_rows([item for item in updated if (item["level"], int(item["id"])) not in removed])
+        reparented = set()  # {(lvl, id)} of rows dropped under another parent
+        with phase("update"):
+            moves = defaultdict(list)  # {lvl: [(row, new parent ID)]}
+            for item in updated:
+                row = to_update.get((item["level"], int(item["id"])))
+                if not row:
+                    continue
+                level = levels[item["level"]]
+                touched[level.name].add(row.id)
+                if "name" in item:
+                    row.name = item["name"]
+                if "number" in item and item["number"] is not None:
+                    setattr(row, level.number_field, item["number"])
+                if level.child_level is None and "content" in item:
+                    row.content = item["content"]
+                if level.parent_field != "statute_id" and item.get("parent_id") is not None:
+                    parent_id = temp2real.get(item["parent_id"], item["parent_id"])
+                    try:
+                        parent_id = int(parent_id)
+                    except (TypeError, ValueError):
+                        raise ValueError(f"Unknown parent {item['parent_id']} for {level.name} {row.id}")
+                    if parent_id != getattr(row, level.parent_field):
+                        moves[level.name].append((row, parent_id))
+                trace("bulk-save %s: update %s %s", tree, level.name, row.id)
+            
+            # Parents are checked to be in the statute; moving a row re-roots its
+            # path and its descendants' (see the path events in models.py)
+            for lvl, rows in moves.items():
+                parent_level = parent_levels[lvl]
+                found = load_child_paths(parent_level, {parent_id for _, parent_id in rows}, statute_id)
+                for row, parent_id in rows:
+                    if (parent_level.name, parent_id) in removed:
+                        raise ValueError(f"Parent {parent_level.name} {parent_id} of {lvl} {row.id} is deleted by this save")
+                    if parent_id not in found:
+                        raise ValueError(f"Unknown parent {parent_id} for {lvl} {row.id}")
+                    setattr(row, levels[lvl].parent_field, parent_id)
+                    reparented.add((lvl, row.id))
+        
+        advance("reorder", len(updated))
+        
+        # ---------- translate temp IDs in order request ----------
+        orders = {(lvl, int(temp2real.get(node_id, node_id))): v
+                  for (lvl, node_id), v in order_req.items()}
+        
+        # Write deletes and edits so sibling groups are read as they now stand
+        with phase("flush"):
+            db.session.flush()
+        
+        # ---------- reorder only the sibling groups the request touched ----------
+        # Order keys have gaps, so deletes leave their groups alone; only the
+        # groups of moved and new rows are read, and only rows out of place move
+        # Rows new to their group get a fresh key; unplaced ones go last
+        arrived = new_ids | reparented
+        for key in arrived:
+            orders.setdefault(key, float("inf"))
+        moved = defaultdict(set)  # {lvl: row ids}
+        for lvl, node_id in orders:
+            moved[lvl].add(node_id)
+        
+        with phase("reorder"):
+            for lvl in levels:
+                with phase("load"):
+                    groups = load_sibling_groups(lvl, statute_id, member_ids=moved[lvl])
+                new_keys = {}
+                for parent_id, rows in groups.items():
+                    requested = {node_id: orders[(lvl, node_id)] for node_id, _ in rows if (lvl, node_id) in orders}
+                    sequence = arrange_siblings(rows, requested)
+                    keys = {node_id: None if (lvl, node_id) in arrived else order_no for node_id, order_no in rows}
+                    changed = order_keys_for(sequence, keys)
+                    trace("bulk-save %s: %s group %s order %s, %d keys changed",
+                          tree, lvl, parent_id, sequence, len(changed))
+                    new_keys.update(changed)
+                write_sibling_orders(lvl, new_keys, statute_id)
+                touched[lvl].update(new_keys)
+                advance("reorder", sum(1 for requested_lvl, _ in order_req if requested_lvl == lvl))
+        
+        advance("flush")
+        with phase("flush"):
+            db.session.flush()
+    
+    # Values as stored, so the client can show them without reloading
+    nodes = []
+    with phase("load"):
+        for lvl, ids in touched.items():
+            level = levels[lvl]
+            table = level.model.__table__
+            rows = db.session.execute(
+                db.select(
+                    table.c.id, table.c[level.parent_field].label('parent_id'),
+                    table.c[level.number_field].label('number'), table.c.name, table.c.order_no
+                ).where(table.c.id.in_(ids))
+            )
+            nodes.extend({'level': lvl, **row._asdict()} for row in rows)
+    
+    return {
+        'ids': temp2real,
+        'nodes': nodes,
+        'deleted': [{'level': lvl, 'id': node_id}
+                    for lvl, ids in delete_ids.items() for node_id in sorted(ids) if (lvl, node_id) in removed],
+        'stale': stale,
+    }
+
+# ---------- Statute snapshots ----------
+
+# How to reach the statute from each hierarchy model: (relationship, parent model, parent FK)
+_SNAPSHOT_PARENTS = {
+    Chapter: ('part', Part, 'part_id'),
+    Set: ('chapter', Chapter, 'chapter_id'),
+    Section: ('set', Set, 'set_id'),
+    Subsection: ('section', Section, 'section_id'),
+    SchChapter: ('sch_part', SchPart, 'sch_part_id'),
+    SchSet: ('sch_chapter', SchChapter, 'sch_chapter_id'),
+    SchSection: ('sch_set', SchSet, 'sch_set_id'),
+    SchSubsection: ('sch_section', SchSection, 'sch_section_id'),
+}
+_SNAPSHOT_MODELS = (Statute, Part, SchPart) + tuple(_SNAPSHOT_PARENTS)
+
+def _statute_id_of(session, obj):
+    """Walk up from a hierarchy row to the ID of the statute it belongs to"""
+    if isinstance(obj, Statute):
+        return obj.id
+    if obj.statute_id is not None:
+        return obj.statute_id
+    # Rows not flushed yet have no denormalized statute_id
+    while type(obj) in _SNAPSHOT_PARENTS:
+        rel, parent_model, parent_field = _SNAPSHOT_PARENTS[type(obj)]
+        parent = getattr(obj, rel)
+        if parent is None and getattr(obj, parent_field) is not None:
+            parent = session.get(parent_model, getattr(obj, parent_field))
+        obj = parent
+    return getattr(obj, 'statute_id', None)
+
+def mark_snapshot_stale(statute_id, session=None):
+    """
+    Flag a statute so its snapshot is invalidated when the current transaction commits.
+    Call this after writes that bypass the ORM unit of work (Core UPDATE/INSERT).
+    """
+    session = session or db.session
+    session.info.setdefault('stale_statutes', set()).add(statute_id)
+
+def invalidate_snapshot(statute_id, session=None):
+    """
+    Discard the stored document and bump the revision, so the next read rebuilds it
+    
+    The row is created when the statute has none yet, so the first change
+    still moves the revision on from 0 (nothing is written for a statute
+    deleted in the same transaction).
+    """
+    session = session or db.session
+    table = StatuteSnapshot.__table__
+    statute = Statute.__table__
+    stmt = pg_insert(table).from_select(
+        ['statute_id', 'revision', 'document'],
+        db.select(statute.c.id, db.literal(1), db.null()).where(statute.c.id == statute_id)
+    )
+    session.execute(stmt.on_conflict_do_update(
+        index_elements=[table.c.statute_id],
+        set_={'document': db.null(), 'revision': table.c.revision + 1}
+    ))
+
+def rebuild_snapshot(statute_id, revision):
+    """
+    Build the hierarchy document for a statute and store it in statute_snapshot
+    
+    The document is only stored while the snapshot is still at the given
+    revision; a change committed meanwhile invalidated it again. It is
+    written on a connection of its own, so the reader's session and
+    anything pending in it are left alone; a failed write only costs the
+    next reader another build, so it is logged rather than raised.
+    
+    Args:
+        statute_id: ID of the statute
+        revision: Revision the snapshot had when it was found stale
+        
+    Returns:
+        The hierarchy document as plain dicts, or None if the statute no longer exists
+    """
+    hierarchy = _build_hierarchy(statute_id)
+    if hierarchy is None:
+        return None
+    document = hierarchy_document(hierarchy)
+    
+    table = StatuteSnapshot.__table__
+    stmt = pg_insert(table).values(
+        statute_id=statute_id,
+        revision=revision,
+        document=document,
+        built_at=datetime.now(pytz.UTC)
+    )
+    try:
+        with db.engine.begin() as connection:
+            connection.execute(stmt.on_conflict_do_update(
+                index_elements=[table.c.statute_id],
+                set_={'document': stmt.excluded.document, 'built_at': stmt.excluded.built_at},
+                where=table.c.revision == revision
+            ))
+    except SQLAlchemyError as e:
+        current_app.logger.error(f"Database error storing snapshot: {str(e)}")
+    return document
+
+def get_hierarchy_snapshot(statute_id):
+    """
+    Get the full hierarchy of a statute from its snapshot
+    
+    Reads the stored document with a single primary-key lookup; a missing
+    or invalidated document is built here, on first read, and stored.
+    
+    Args:
+        statute_id: ID of the statute
+        
+    Returns:
+        Dictionary with full hierarchy information
+    """
+    table = StatuteSnapshot.__table__
+    try:
+        row = db.session.execute(
+            db.select(table.c.revision, table.c.document).where(table.c.statute_id == statute_id)
+        ).first()
+        if row is not None and row.document is not None:
+            return row.document
+        
+        # A statute without a row is at revision 0, as editors were told
+        return rebuild_snapshot(statute_id, row.revision if row is not None else 0)
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        current_app.logger.error(f"Database error reading snapshot: {str(e)}")
+        hierarchy = get_full_hierarchy(statute_id)
+        return hierarchy_document(hierarchy) if hierarchy else None
+
+def get_statute_revision(statute_id):
+    """Revision of a statute's snapshot, bumped by every committed change (0 before the first)"""
+    table = StatuteSnapshot.__table__
+    return db.session.execute(
+        db.select(table.c.revision).where(table.c.statute_id == statute_id)
+    ).scalar() or 0
+
+@event.listens_for(db.session, 'before_flush')
+def _collect_stale_statutes(session, flush_context, instances):
+    """Record which statutes are touched by the pending changes"""
+    stale = session.info.setdefault('stale_statutes', set())
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if not isinstance(obj, _SNAPSHOT_MODELS):
+            continue
+        if obj in session.dirty and not session.is_modified(obj):
+            continue
+        statute_id = _statute_id_of(session, obj)
+        if statute_id is not None:
+            stale.add(statute_id)
+
+def invalidate_stale_snapshots(session=None):
+    """
+    Invalidate the snapshots of the statutes changed so far in this transaction
+    
+    Runs before every commit; call it earlier to read the revisions the
+    commit will leave (see jobs.run_bulk_save_job).
+    """
+    session = session or db.session
+    session.flush()
+    for statute_id in session.info.pop('stale_statutes', ()):
+        invalidate_snapshot(statute_id, session)
+
+@event.listens_for(db.session, 'before_commit')
+def _invalidate_stale_snapshots(session):
+    """Invalidate snapshots of changed statutes inside the committing transaction"""
+    invalidate_stale_snapshots(session)
+
+@event.listens_for(db.session, 'after_rollback')
+def _discard_stale_statutes(session):
+    session.info.pop('stale_statutes', None)
+
 def delete_with_transaction(item):
     """
     Delete an item using database transaction
@@ -0,0 +1,166 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import threading
+import time
+
+import pytz
+from flask import current_app, g
+
+from models import db, BulkSaveJob
+from database import apply_bulk_save, bulk_save_size, check_bulk_save, get_statute_revision, invalidate_stale_snapshots
+from timing import current_timer, phase
+
+# Started on first use, so each gunicorn worker gets its own after the fork
+_executor = None
+_executor_lock = threading.Lock()
+
+# Progress is written at most this often (seconds), and whenever the phase changes
+PROGRESS_INTERVAL = 0.5
+
+def _get_executor(app):
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=app.config.get('BULK_SAVE_WORKERS', 2),
+                                           thread_name_prefix='bulk-save')
+        return _executor
+
+def is_large_save(payload):
+    """Whether a save is big enough to be run as a background job (see BULK_SAVE_ASYNC_THRESHOLD)"""
+    threshold = current_app.config.get('BULK_SAVE_ASYNC_THRESHOLD')
+    return bool(threshold) and bulk_save_size(payload) >= threshold
+
+def _update_job(job_id, statuses=('running',), **values):
+    """
+    Write job fields on a connection of their own
+    
+    The job's save runs in one long transaction; its progress has to be
+    visible to the requests polling it before that commits. Only a job in
+    one of statuses is changed, so a finished or failed job stays as it is.
+    
+    Returns:
+        Whether the job was updated
+    """
+    table = BulkSaveJob.__table__
+    with db.engine.begin() as connection:
+        result = connection.execute(
+            table.update().where(table.c.id == job_id, table.c.status.in_(statuses))
+            .values(updated_at=datetime.now(pytz.UTC), **values)
+        )
+    return result.rowcount > 0
+
+def queue_bulk_save(statute_id, tree, payload, user_id=None):
+    """
+    Store an inline editor save as a job and start it on a worker thread
+    
+    Args:
+        statute_id: ID of the statute
+        tree: Key of the tree in DOCUMENT_TREES ('parts' or 'sch_parts')
+        payload: The save, as posted by statute-edit.js
+        user_id: User the audit log records the changes for
+    
+    Returns:
+        ID of the job
+        
+    Raises:
+        ValueError: When the save names levels of another tree
+    """
+    check_bulk_save(payload, tree)
+    table = BulkSaveJob.__table__
+    job_id = db.session.execute(
+        table.insert().values(statute_id=statute_id, tree=tree, user_id=user_id, payload=payload,
+                              status='queued', rows_total=bulk_save_size(payload))
+        .returning(table.c.id)
+    ).scalar_one()
+    db.session.commit()
+    app = current_app._get_current_object()
+    _get_executor(app).submit(run_bulk_save_job, app, job_id)
+    return job_id
+
+def run_bulk_save_job(app, job_id):
+    """Apply a queued save in one transaction, recording its progress on the job row"""
+    with app.app_context():
+        job = db.session.get(BulkSaveJob, job_id)
+        if job is None or job.status != 'queued':
+            return
+        statute_id, tree, payload, rows_total = job.statute_id, job.tree, job.payload, job.rows_total
+        g.acting_user_id = job.user_id
+        if not _update_job(job_id, statuses=('queued',), status='running', phase='load'):
+            return  # timed out while it waited for a worker
+
+        last = {'phase': 'load', 'at': time.monotonic()}
+
+        def report(current_phase, rows_done):
+            now = time.monotonic()
+            if current_phase == last['phase'] and now - last['at'] < PROGRESS_INTERVAL:
+                return
+            last.update(phase=current_phase, at=now)
+            _update_job(job_id, phase=current_phase, rows_done=rows_done)
+
+        table = BulkSaveJob.__table__
+        try:
+            delta = apply_bulk_save(statute_id, payload, tree, progress=report)
+            report('commit', rows_total)
+            with phase('commit'):
+                # The job is marked done in the save's own transaction, and only while
+                # it is still running: a job get_bulk_save_job has reported failed
+                # is rolled back instead, so a client is never told both
+                invalidate_stale_snapshots()
+                delta['revision'] = get_statute_revision(statute_id)
+                finished = db.session.execute(
+                    table.update().where(table.c.id == job_id, table.c.status == 'running')
+                    .values(status='done', phase='done', rows_done=rows_total, result=delta,
+                            updated_at=datetime.now(pytz.UTC))
+                ).rowcount
+                if finished:
+                    db.session.commit()
+                else:
+                    db.session.rollback()
+            status = 'done' if finished else 'abandoned'
+        except Exception as e:
+            # Nothing else reports a failure on a worker thread, so catch everything
+            db.session.rollback()
+            current_app.logger.error(f"Bulk-save job {job_id} failed: {str(e)}")
+            # The driver's message, without the statement a database error carries
+            _update_job(job_id, status='failed', error=str(getattr(e, 'orig', None) or e))
+            status = 'failed'
+        current_app.logger.info(f"bulk-save job {job_id} {tree} {status} {current_timer().summary()}")
+
+def get_bulk_save_job(job_id):
+    """
+    Get the progress of a background save
+    
+    A job that has not moved for BULK_SAVE_JOB_TIMEOUT seconds lost its
+    worker (e.g. the process was restarted); it is stored, and reported,
+    as failed. Failed is final: a worker that was only slow finds the job
+    failed when it comes to commit and rolls its save back.
+    
+    Args:
+        job_id: ID of the job
+    
+    Returns:
+        Dictionary with the job's status, phase, rows_done, rows_total, and
+        result (the delta) or error once finished; None if there is no such job
+    """
+    job = db.session.get(BulkSaveJob, job_id)
+    if job is None:
+        return None
+    if job.status in ('queued', 'running'):
+        timeout = timedelta(seconds=current_app.config.get('BULK_SAVE_JOB_TIMEOUT', 600))
+        if datetime.now(pytz.UTC) - job.updated_at > timeout:
+            # Waits for a job that is committing right now; whichever of the two
+            # gets the row first decides, and the job row is read back as it stands
+            _update_job(job_id, statuses=('queued', 'running'),
+                        status='failed', error="The save was interrupted")
+            db.session.refresh(job)
+    return {
+        'job': job.id,
+        'statute_id': job.statute_id,
+        'tree': job.tree,
+        'status': job.status,
+        'phase': job.phase,
+        'rows_done': job.rows_done,
+        'rows_total': job.rows_total,
+        'result': job.result,
+        'error': job.error,
+    }
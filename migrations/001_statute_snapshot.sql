@@ -0,0 +1,9 @@
+-- Per-statute snapshot of the assembled hierarchy document.
+-- document is NULL while the snapshot is stale; readers then rebuild it.
+CREATE TABLE IF NOT EXISTS statute_snapshot (
+    statute_id INTEGER PRIMARY KEY,
+    revision INTEGER NOT NULL DEFAULT 0,
+    document JSONB,
+    built_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT fk_statute_snapshot_statute FOREIGN KEY (statute_id) REFERENCES statute(id) ON DELETE CASCADE
+);
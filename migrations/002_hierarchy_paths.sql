@@ -0,0 +1,59 @@
+-- Denormalized statute_id and materialized ancestor path on every nested hierarchy table.
+-- path holds the ids of the ancestors from the top-level part down to the parent,
+-- so everything under a node at depth d is found with path[d] = node id.
+BEGIN;
+
+ALTER TABLE chapter ADD COLUMN IF NOT EXISTS statute_id INTEGER, ADD COLUMN IF NOT EXISTS path INTEGER[];
+ALTER TABLE set ADD COLUMN IF NOT EXISTS statute_id INTEGER, ADD COLUMN IF NOT EXISTS path INTEGER[];
+ALTER TABLE section ADD COLUMN IF NOT EXISTS statute_id INTEGER, ADD COLUMN IF NOT EXISTS path INTEGER[];
+ALTER TABLE subsection ADD COLUMN IF NOT EXISTS statute_id INTEGER, ADD COLUMN IF NOT EXISTS path INTEGER[];
+ALTER TABLE sch_chapter ADD COLUMN IF NOT EXISTS statute_id INTEGER, ADD COLUMN IF NOT EXISTS path INTEGER[];
+ALTER TABLE sch_set ADD COLUMN IF NOT EXISTS statute_id INTEGER, ADD COLUMN IF NOT EXISTS path INTEGER[];
+ALTER TABLE sch_section ADD COLUMN IF NOT EXISTS statute_id INTEGER, ADD COLUMN IF NOT EXISTS path INTEGER[];
+ALTER TABLE sch_subsection ADD COLUMN IF NOT EXISTS statute_id INTEGER, ADD COLUMN IF NOT EXISTS path INTEGER[];
+
+-- Backfill top-down so each level can copy from its parent
+UPDATE chapter c SET statute_id = p.statute_id, path = ARRAY[p.id] FROM part p WHERE c.part_id = p.id;
+UPDATE set c SET statute_id = p.statute_id, path = p.path || p.id FROM chapter p WHERE c.chapter_id = p.id;
+UPDATE section c SET statute_id = p.statute_id, path = p.path || p.id FROM set p WHERE c.set_id = p.id;
+UPDATE subsection c SET statute_id = p.statute_id, path = p.path || p.id FROM section p WHERE c.section_id = p.id;
+UPDATE sch_chapter c SET statute_id = p.statute_id, path = ARRAY[p.id] FROM sch_part p WHERE c.sch_part_id = p.id;
+UPDATE sch_set c SET statute_id = p.statute_id, path = p.path || p.id FROM sch_chapter p WHERE c.sch_chapter_id = p.id;
+UPDATE sch_section c SET statute_id = p.statute_id, path = p.path || p.id FROM sch_set p WHERE c.sch_set_id = p.id;
+UPDATE sch_subsection c SET statute_id = p.statute_id, path = p.path || p.id FROM sch_section p WHERE c.sch_section_id = p.id;
+
+ALTER TABLE chapter ALTER COLUMN statute_id SET NOT NULL, ALTER COLUMN path SET NOT NULL,
+    ADD CONSTRAINT fk_chapter_statute FOREIGN KEY (statute_id) REFERENCES statute(id) ON DELETE CASCADE;
+ALTER TABLE set ALTER COLUMN statute_id SET NOT NULL, ALTER COLUMN path SET NOT NULL,
+    ADD CONSTRAINT fk_set_statute FOREIGN KEY (statute_id) REFERENCES statute(id) ON DELETE CASCADE;
+ALTER TABLE section ALTER COLUMN statute_id SET NOT NULL, ALTER COLUMN path SET NOT NULL,
+    ADD CONSTRAINT fk_section_statute FOREIGN KEY (statute_id) REFERENCES statute(id) ON DELETE CASCADE;
+ALTER TABLE subsection ALTER COLUMN statute_id SET NOT NULL, ALTER COLUMN path SET NOT NULL,
+    ADD CONSTRAINT fk_subsection_statute FOREIGN KEY (statute_id) REFERENCES statute(id) ON DELETE CASCADE;
+ALTER TABLE sch_chapter ALTER COLUMN statute_id SET NOT NULL, ALTER COLUMN path SET NOT NULL,
+    ADD CONSTRAINT fk_sch_chapter_statute FOREIGN KEY (statute_id) REFERENCES statute(id) ON DELETE CASCADE;
+ALTER TABLE sch_set ALTER COLUMN statute_id SET NOT NULL, ALTER COLUMN path SET NOT NULL,
+    ADD CONSTRAINT fk_sch_set_statute FOREIGN KEY (statute_id) REFERENCES statute(id) ON DELETE CASCADE;
+ALTER TABLE sch_section ALTER COLUMN statute_id SET NOT NULL, ALTER COLUMN path SET NOT NULL,
+    ADD CONSTRAINT fk_sch_section_statute FOREIGN KEY (statute_id) REFERENCES statute(id) ON DELETE CASCADE;
+ALTER TABLE sch_subsection ALTER COLUMN statute_id SET NOT NULL, ALTER COLUMN path SET NOT NULL,
+    ADD CONSTRAINT fk_sch_subsection_statute FOREIGN KEY (statute_id) REFERENCES statute(id) ON DELETE CASCADE;
+
+CREATE INDEX IF NOT EXISTS idx_chapter_statute_id ON chapter(statute_id);
+CREATE INDEX IF NOT EXISTS idx_chapter_path ON chapter USING GIN (path);
+CREATE INDEX IF NOT EXISTS idx_set_statute_id ON set(statute_id);
+CREATE INDEX IF NOT EXISTS idx_set_path ON set USING GIN (path);
+CREATE INDEX IF NOT EXISTS idx_section_statute_id ON section(statute_id);
+CREATE INDEX IF NOT EXISTS idx_section_path ON section USING GIN (path);
+CREATE INDEX IF NOT EXISTS idx_subsection_statute_id ON subsection(statute_id);
+CREATE INDEX IF NOT EXISTS idx_subsection_path ON subsection USING GIN (path);
+CREATE INDEX IF NOT EXISTS idx_sch_chapter_statute_id ON sch_chapter(statute_id);
+CREATE INDEX IF NOT EXISTS idx_sch_chapter_path ON sch_chapter USING GIN (path);
+CREATE INDEX IF NOT EXISTS idx_sch_set_statute_id ON sch_set(statute_id);
+CREATE INDEX IF NOT EXISTS idx_sch_set_path ON sch_set USING GIN (path);
+CREATE INDEX IF NOT EXISTS idx_sch_section_statute_id ON sch_section(statute_id);
+CREATE INDEX IF NOT EXISTS idx_sch_section_path ON sch_section USING GIN (path);
+CREATE INDEX IF NOT EXISTS idx_sch_subsection_statute_id ON sch_subsection(statute_id);
+CREATE INDEX IF NOT EXISTS idx_sch_subsection_path ON sch_subsection USING GIN (path);
+
+COMMIT;
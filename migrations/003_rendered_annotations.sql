@@ -0,0 +1,18 @@
+-- Pre-rendered annotation markup on every hierarchy table.
+-- rendered_html maps each annotated field that carries <fa>/<pa> tags to its HTML
+-- (NULL when no field has tags); render_version records the renderer that produced
+-- it. Rows are left unrendered here and are rendered on first read.
+BEGIN;
+
+ALTER TABLE part ADD COLUMN IF NOT EXISTS rendered_html JSONB, ADD COLUMN IF NOT EXISTS render_version INTEGER;
+ALTER TABLE chapter ADD COLUMN IF NOT EXISTS rendered_html JSONB, ADD COLUMN IF NOT EXISTS render_version INTEGER;
+ALTER TABLE set ADD COLUMN IF NOT EXISTS rendered_html JSONB, ADD COLUMN IF NOT EXISTS render_version INTEGER;
+ALTER TABLE section ADD COLUMN IF NOT EXISTS rendered_html JSONB, ADD COLUMN IF NOT EXISTS render_version INTEGER;
+ALTER TABLE subsection ADD COLUMN IF NOT EXISTS rendered_html JSONB, ADD COLUMN IF NOT EXISTS render_version INTEGER;
+ALTER TABLE sch_part ADD COLUMN IF NOT EXISTS rendered_html JSONB, ADD COLUMN IF NOT EXISTS render_version INTEGER;
+ALTER TABLE sch_chapter ADD COLUMN IF NOT EXISTS rendered_html JSONB, ADD COLUMN IF NOT EXISTS render_version INTEGER;
+ALTER TABLE sch_set ADD COLUMN IF NOT EXISTS rendered_html JSONB, ADD COLUMN IF NOT EXISTS render_version INTEGER;
+ALTER TABLE sch_section ADD COLUMN IF NOT EXISTS rendered_html JSONB, ADD COLUMN IF NOT EXISTS render_version INTEGER;
+ALTER TABLE sch_subsection ADD COLUMN IF NOT EXISTS rendered_html JSONB, ADD COLUMN IF NOT EXISTS render_version INTEGER;
+
+COMMIT;
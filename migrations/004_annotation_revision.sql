@@ -0,0 +1,3 @@
+-- Per-statute annotation revision, bumped whenever an annotation of the statute changes.
+-- Workers compare it with the revision their cached annotation maps were built from.
+ALTER TABLE statute ADD COLUMN IF NOT EXISTS annotation_revision INTEGER NOT NULL DEFAULT 0;
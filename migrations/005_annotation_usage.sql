@@ -0,0 +1,81 @@
+-- Reverse index of annotation references, backfilled from the tags already in the text.
+-- The pattern matches the opening tags recognised by annotations.ANNOTATION_TAG.
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS annotation_usage (
+    node_table TEXT NOT NULL,
+    node_id INTEGER NOT NULL,
+    annotation_key TEXT NOT NULL,
+    statute_id INTEGER NOT NULL,
+    PRIMARY KEY (node_table, node_id, annotation_key),
+    CONSTRAINT fk_annotation_usage_statute FOREIGN KEY (statute_id) REFERENCES statute(id) ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS idx_annotation_usage_statute_key ON annotation_usage(statute_id, annotation_key);
+
+INSERT INTO annotation_usage (node_table, node_id, annotation_key, statute_id)
+SELECT DISTINCT 'part', t.id, CASE WHEN COALESCE(m[3], '') <> '' THEN m[2] || '_' || m[3] ELSE m[2] END, t.statute_id
+FROM part t, unnest(ARRAY[part_no, name]) AS f(text),
+     regexp_matches(f.text, '<(fa|pa)\s+a=([^>\s]+)(?:\s+p=([^>\s]+))?[^>]*>', 'g') AS m
+ON CONFLICT DO NOTHING;
+
+INSERT INTO annotation_usage (node_table, node_id, annotation_key, statute_id)
+SELECT DISTINCT 'chapter', t.id, CASE WHEN COALESCE(m[3], '') <> '' THEN m[2] || '_' || m[3] ELSE m[2] END, t.statute_id
+FROM chapter t, unnest(ARRAY[chapter_no, name]) AS f(text),
+     regexp_matches(f.text, '<(fa|pa)\s+a=([^>\s]+)(?:\s+p=([^>\s]+))?[^>]*>', 'g') AS m
+ON CONFLICT DO NOTHING;
+
+INSERT INTO annotation_usage (node_table, node_id, annotation_key, statute_id)
+SELECT DISTINCT 'set', t.id, CASE WHEN COALESCE(m[3], '') <> '' THEN m[2] || '_' || m[3] ELSE m[2] END, t.statute_id
+FROM set t, unnest(ARRAY[set_no, name]) AS f(text),
+     regexp_matches(f.text, '<(fa|pa)\s+a=([^>\s]+)(?:\s+p=([^>\s]+))?[^>]*>', 'g') AS m
+ON CONFLICT DO NOTHING;
+
+INSERT INTO annotation_usage (node_table, node_id, annotation_key, statute_id)
+SELECT DISTINCT 'section', t.id, CASE WHEN COALESCE(m[3], '') <> '' THEN m[2] || '_' || m[3] ELSE m[2] END, t.statute_id
+FROM section t, unnest(ARRAY[section_no, name]) AS f(text),
+     regexp_matches(f.text, '<(fa|pa)\s+a=([^>\s]+)(?:\s+p=([^>\s]+))?[^>]*>', 'g') AS m
+ON CONFLICT DO NOTHING;
+
+INSERT INTO annotation_usage (node_table, node_id, annotation_key, statute_id)
+SELECT DISTINCT 'subsection', t.id, CASE WHEN COALESCE(m[3], '') <> '' THEN m[2] || '_' || m[3] ELSE m[2] END, t.statute_id
+FROM subsection t, unnest(ARRAY[subsection_no, name, content]) AS f(text),
+     regexp_matches(f.text, '<(fa|pa)\s+a=([^>\s]+)(?:\s+p=([^>\s]+))?[^>]*>', 'g') AS m
+ON CONFLICT DO NOTHING;
+
+INSERT INTO annotation_usage (node_table, node_id, annotation_key, statute_id)
+SELECT DISTINCT 'sch_part', t.id, CASE WHEN COALESCE(m[3], '') <> '' THEN m[2] || '_' || m[3] ELSE m[2] END, t.statute_id
+FROM sch_part t, unnest(ARRAY[name]) AS f(text),
+     regexp_matches(f.text, '<(fa|pa)\s+a=([^>\s]+)(?:\s+p=([^>\s]+))?[^>]*>', 'g') AS m
+ON CONFLICT DO NOTHING;
+
+INSERT INTO annotation_usage (node_table, node_id, annotation_key, statute_id)
+SELECT DISTINCT 'sch_chapter', t.id, CASE WHEN COALESCE(m[3], '') <> '' THEN m[2] || '_' || m[3] ELSE m[2] END, t.statute_id
+FROM sch_chapter t, unnest(ARRAY[name]) AS f(text),
+     regexp_matches(f.text, '<(fa|pa)\s+a=([^>\s]+)(?:\s+p=([^>\s]+))?[^>]*>', 'g') AS m
+ON CONFLICT DO NOTHING;
+
+INSERT INTO annotation_usage (node_table, node_id, annotation_key, statute_id)
+SELECT DISTINCT 'sch_set', t.id, CASE WHEN COALESCE(m[3], '') <> '' THEN m[2] || '_' || m[3] ELSE m[2] END, t.statute_id
+FROM sch_set t, unnest(ARRAY[name]) AS f(text),
+     regexp_matches(f.text, '<(fa|pa)\s+a=([^>\s]+)(?:\s+p=([^>\s]+))?[^>]*>', 'g') AS m
+ON CONFLICT DO NOTHING;
+
+INSERT INTO annotation_usage (node_table, node_id, annotation_key, statute_id)
+SELECT DISTINCT 'sch_section', t.id, CASE WHEN COALESCE(m[3], '') <> '' THEN m[2] || '_' || m[3] ELSE m[2] END, t.statute_id
+FROM sch_section t, unnest(ARRAY[name]) AS f(text),
+     regexp_matches(f.text, '<(fa|pa)\s+a=([^>\s]+)(?:\s+p=([^>\s]+))?[^>]*>', 'g') AS m
+ON CONFLICT DO NOTHING;
+
+INSERT INTO annotation_usage (node_table, node_id, annotation_key, statute_id)
+SELECT DISTINCT 'sch_subsection', t.id, CASE WHEN COALESCE(m[3], '') <> '' THEN m[2] || '_' || m[3] ELSE m[2] END, t.statute_id
+FROM sch_subsection t, unnest(ARRAY[name, content]) AS f(text),
+     regexp_matches(f.text, '<(fa|pa)\s+a=([^>\s]+)(?:\s+p=([^>\s]+))?[^>]*>', 'g') AS m
+ON CONFLICT DO NOTHING;
+
+INSERT INTO annotation_usage (node_table, node_id, annotation_key, statute_id)
+SELECT DISTINCT 'statute', t.id, CASE WHEN COALESCE(m[3], '') <> '' THEN m[2] || '_' || m[3] ELSE m[2] END, t.id
+FROM statute t, unnest(ARRAY[preface]) AS f(text),
+     regexp_matches(f.text, '<(fa|pa)\s+a=([^>\s]+)(?:\s+p=([^>\s]+))?[^>]*>', 'g') AS m
+ON CONFLICT DO NOTHING;
+
+COMMIT;
@@ -0,0 +1,3 @@
+-- RENDER_VERSION all pre-rendered fragments of a statute were rendered with.
+-- NULL until the statute is first read; the book view then renders it in one go.
+ALTER TABLE statute ADD COLUMN IF NOT EXISTS render_version INTEGER;
@@ -0,0 +1,27 @@
+-- Check the sibling order constraints at commit instead of after every row, so a
+-- group can be renumbered with one UPDATE whatever order its rows are written in.
+-- (ALTER CONSTRAINT only applies to foreign keys, so each one is dropped and re-added.)
+BEGIN;
+
+ALTER TABLE part DROP CONSTRAINT uq_part_statute_order,
+    ADD CONSTRAINT uq_part_statute_order UNIQUE (statute_id, order_no) DEFERRABLE INITIALLY DEFERRED;
+ALTER TABLE chapter DROP CONSTRAINT uq_chapter_part_order,
+    ADD CONSTRAINT uq_chapter_part_order UNIQUE (part_id, order_no) DEFERRABLE INITIALLY DEFERRED;
+ALTER TABLE set DROP CONSTRAINT uq_set_chapter_order,
+    ADD CONSTRAINT uq_set_chapter_order UNIQUE (chapter_id, order_no) DEFERRABLE INITIALLY DEFERRED;
+ALTER TABLE section DROP CONSTRAINT uq_section_set_order,
+    ADD CONSTRAINT uq_section_set_order UNIQUE (set_id, order_no) DEFERRABLE INITIALLY DEFERRED;
+ALTER TABLE subsection DROP CONSTRAINT uq_subsection_section_order,
+    ADD CONSTRAINT uq_subsection_section_order UNIQUE (section_id, order_no) DEFERRABLE INITIALLY DEFERRED;
+ALTER TABLE sch_part DROP CONSTRAINT uq_sch_part_statute_order,
+    ADD CONSTRAINT uq_sch_part_statute_order UNIQUE (statute_id, order_no) DEFERRABLE INITIALLY DEFERRED;
+ALTER TABLE sch_chapter DROP CONSTRAINT uq_sch_chapter_part_order,
+    ADD CONSTRAINT uq_sch_chapter_part_order UNIQUE (sch_part_id, order_no) DEFERRABLE INITIALLY DEFERRED;
+ALTER TABLE sch_set DROP CONSTRAINT uq_sch_set_chapter_order,
+    ADD CONSTRAINT uq_sch_set_chapter_order UNIQUE (sch_chapter_id, order_no) DEFERRABLE INITIALLY DEFERRED;
+ALTER TABLE sch_section DROP CONSTRAINT uq_sch_section_set_order,
+    ADD CONSTRAINT uq_sch_section_set_order UNIQUE (sch_set_id, order_no) DEFERRABLE INITIALLY DEFERRED;
+ALTER TABLE sch_subsection DROP CONSTRAINT uq_sch_subsection_section_order,
+    ADD CONSTRAINT uq_sch_subsection_section_order UNIQUE (sch_section_id, order_no) DEFERRABLE INITIALLY DEFERRED;
+
+COMMIT;
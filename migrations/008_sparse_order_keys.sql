@@ -0,0 +1,37 @@
+-- Sparse sibling order keys: respace every group 1024 apart (ORDER_GAP in database.py),
+-- keeping its order, so rows can be placed between two siblings without renumbering.
+-- Relies on the deferred order constraints from 007.
+BEGIN;
+
+UPDATE part t SET order_no = r.rank * 1024
+    FROM (SELECT id, row_number() OVER (PARTITION BY statute_id ORDER BY order_no) AS rank FROM part) r
+    WHERE t.id = r.id;
+UPDATE chapter t SET order_no = r.rank * 1024
+    FROM (SELECT id, row_number() OVER (PARTITION BY part_id ORDER BY order_no) AS rank FROM chapter) r
+    WHERE t.id = r.id;
+UPDATE set t SET order_no = r.rank * 1024
+    FROM (SELECT id, row_number() OVER (PARTITION BY chapter_id ORDER BY order_no) AS rank FROM set) r
+    WHERE t.id = r.id;
+UPDATE section t SET order_no = r.rank * 1024
+    FROM (SELECT id, row_number() OVER (PARTITION BY set_id ORDER BY order_no) AS rank FROM section) r
+    WHERE t.id = r.id;
+UPDATE subsection t SET order_no = r.rank * 1024
+    FROM (SELECT id, row_number() OVER (PARTITION BY section_id ORDER BY order_no) AS rank FROM subsection) r
+    WHERE t.id = r.id;
+UPDATE sch_part t SET order_no = r.rank * 1024
+    FROM (SELECT id, row_number() OVER (PARTITION BY statute_id ORDER BY order_no) AS rank FROM sch_part) r
+    WHERE t.id = r.id;
+UPDATE sch_chapter t SET order_no = r.rank * 1024
+    FROM (SELECT id, row_number() OVER (PARTITION BY sch_part_id ORDER BY order_no) AS rank FROM sch_chapter) r
+    WHERE t.id = r.id;
+UPDATE sch_set t SET order_no = r.rank * 1024
+    FROM (SELECT id, row_number() OVER (PARTITION BY sch_chapter_id ORDER BY order_no) AS rank FROM sch_set) r
+    WHERE t.id = r.id;
+UPDATE sch_section t SET order_no = r.rank * 1024
+    FROM (SELECT id, row_number() OVER (PARTITION BY sch_set_id ORDER BY order_no) AS rank FROM sch_section) r
+    WHERE t.id = r.id;
+UPDATE sch_subsection t SET order_no = r.rank * 1024
+    FROM (SELECT id, row_number() OVER (PARTITION BY sch_section_id ORDER BY order_no) AS rank FROM sch_subsection) r
+    WHERE t.id = r.id;
+
+COMMIT;
@@ -0,0 +1,23 @@
+-- Inline editor saves too large to run inside a request are queued here and
+-- applied by a background worker (see jobs.py); the editor polls the row for progress.
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS bulk_save_job (
+    id SERIAL PRIMARY KEY,
+    statute_id INTEGER NOT NULL,
+    tree TEXT NOT NULL,
+    user_id INTEGER REFERENCES "user"(id),
+    payload JSONB NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',
+    phase TEXT,
+    rows_done INTEGER NOT NULL DEFAULT 0,
+    rows_total INTEGER NOT NULL DEFAULT 0,
+    result JSONB,
+    error TEXT,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT fk_bulk_save_job_statute FOREIGN KEY (statute_id) REFERENCES statute(id) ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS idx_bulk_save_job_statute_id ON bulk_save_job(statute_id);
+
+COMMIT;
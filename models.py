@@ -1,4 +1,5 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB
 from datetime import datetime
 import pytz
 
@@ -36,6 +37,10 @@ class Statute(db.Model):
     act_no = db.Column(db.Text, unique=True)
     date = db.Column(db.Date)
     preface = db.Column(db.Text)
+    # Bumped whenever an annotation of the statute changes; keys the shared annotation map cache
+    annotation_revision = db.Column(db.Integer, nullable=False, default=0)
+    # RENDER_VERSION every fragment of the statute was last rendered with (see database.py)
+    render_version = db.Column(db.Integer)
     created_at = db.Column(db.DateTime(timezone=True), default=lambda: datetime.now(pytz.UTC))
     updated_at = db.Column(db.DateTime(timezone=True), default=lambda: datetime.now(pytz.UTC), 
                            onupdate=lambda: datetime.now(pytz.UTC))
@@ -68,6 +73,9 @@ class Part(db.Model):
     name = db.Column(db.Text, nullable=False)
     part_no = db.Column(db.Text)
     order_no = db.Column(db.Integer, nullable=False)
+    # Annotated fields with their tags rendered to HTML, stamped with database.RENDER_VERSION
+    rendered_html = db.Column(JSONB(none_as_null=True))
+    render_version = db.Column(db.Integer)
     created_at = db.Column(db.DateTime(timezone=True), default=lambda: datetime.now(pytz.UTC))
     updated_at = db.Column(db.DateTime(timezone=True), default=lambda: datetime.now(pytz.UTC), 
                            onupdate=lambda: datetime.now(pytz.UTC))
@@ -76,7 +84,8 @@ class Part(db.Model):
     chapters = db.relationship('Chapter', backref='part', cascade='all, delete-orphan')
     
     __table_args__ = (
-        db.UniqueConstraint('statute_id', 'order_no', name='uq_part_statute_order'),
+        db.UniqueConstraint('statute_id', 'order_no', name='uq_part_statute_order',
+                            deferrable=True, initially='DEFERRED'),
     )
     
     def __repr__(self):
@@ -100,9 +109,15 @@ class Chapter(db.Model):
     
     id = db.Column(db.Integer, primary_key=True)
     part_id = db.Column(db.Integer, db.ForeignKey('part.id', ondelete='CASCADE'), nullable=False)
+    # Denormalized owner and ancestor ids (top level first); maintained by the path events below
+    statute_id = db.Column(db.Integer, db.ForeignKey('statute.id', ondelete='CASCADE'), nullable=False)
+    path = db.Column(ARRAY(db.Integer), nullable=False)
     name = db.Column(db.Text, nullable=False)
     chapter_no = db.Column(db.Text)
     order_no = db.Column(db.Integer, nullable=False)
+    # Annotated fields with their tags rendered to HTML, stamped with database.RENDER_VERSION
+    rendered_html = db.Column(JSONB(none_as_null=True))
+    render_version = db.Column(db.Integer)
     created_at = db.Column(db.DateTime(timezone=True), default=lambda: datetime.now(pytz.UTC))
     updated_at = db.Column(db.DateTime(timezone=True), default=lambda: datetime.now(pytz.UTC), 
                            onupdate=lambda: datetime.now(pytz.UTC))
@@ -111,7 +126,8 @@ class Chapter(db.Model):
     sets = db.relationship('Set', backref='chapter', cascade='all, delete-orphan')
     
     __table_args__ = (
-        db.UniqueConstraint('part_id', 'order_no', name='uq_chapter_part_order'),
+        db.UniqueConstraint('part_id', 'order_no', name='uq_chapter_part_order',
+                            deferrable=True, initially='DEFERRED'),
     )
     
     def __repr__(self):
@@ -135,9 +151,15 @@ class Set(db.Model):
     
     id = db.Column(db.Integer, primary_key=True)
     chapter_id = db.Column(db.Integer, db.ForeignKey('chapter.id', ondelete='CASCADE'), nullable=False)
+    # Denormalized owner and ancestor ids (top level first); maintained by the path events below
+    statute_id = db.Column(db.Integer, db.ForeignKey('statute.id', ondelete='CASCADE'), nullable=False)
+    path = db.Column(ARRAY(db.Integer), nullable=False)
     name = db.Column(db.Text, nullable=False)
     set_no = db.Column(db.Text)
     order_no = db.Column(db.Integer, nullable=False)
+    # Annotated fields with their tags rendered to HTML, stamped with database.RENDER_VERSION
+    rendered_html = db.Column(JSONB(none_as_null=True))
+    render_version = db.Column(db.Integer)
     created_at = db.Column(db.DateTime(timezone=True), default=lambda: datetime.now(pytz.UTC))
     updated_at = db.Column(db.DateTime(timezone=True), default=lambda: datetime.now(pytz.UTC), 
                            onupdate=lambda: datetime.now(pytz.UTC))
@@ -146,7 +168,8 @@ class Set(db.Model):
     sections = db.relationship('Section', backref='set', cascade='all, delete-orphan')
     
     __table_args__ = (
-        db.UniqueConstraint('chapter_id', 'order_no', name='uq_set_chapter_order'),
+        db.UniqueConstraint('chapter_id', 'order_no', name='uq_set_chapter_order',
+                            deferrable=True, initially='DEFERRED'),
     )
     
     def __repr__(self):
@@ -170,9 +193,15 @@ class Section(db.Model):
     
     id = db.Column(db.Integer, primary_key=True)
     set_id = db.Column(db.Integer, db.ForeignKey('set.id', ondelete='CASCADE'), nullable=False)
+    # Denormalized owner and ancestor ids (top level first); maintained by the path events below
+    statute_id = db.Column(db.Integer, db.ForeignKey('statute.id', ondelete='CASCADE'), nullable=False)
+    path = db.Column(ARRAY(db.Integer), nullable=False)
     name = db.Column(db.Text, nullable=False)
     section_no = db.Column(db.Text)
     order_no = db.Column(db.Integer, nullable=False)
+    # Annotated fields with their tags rendered to HTML, stamped with database.RENDER_VERSION
+    rendered_html = db.Column(JSONB(none_as_null=True))
+    render_version = db.Column(db.Integer)
     created_at = db.Column(db.DateTime(timezone=True), default=lambda: datetime.now(pytz.UTC))
     updated_at = db.Column(db.DateTime(timezone=True), default=lambda: datetime.now(pytz.UTC), 
                            onupdate=lambda: datetime.now(pytz.UTC))
@@ -181,7 +210,8 @@ class Section(db.Model):
     subsections = db.relationship('Subsection', backref='section', cascade='all, delete-orphan')
     
     __table_args__ = (
-        db.UniqueConstraint('set_id', 'order_no', name='uq_section_set_order'),
+        db.UniqueConstraint('set_id', 'order_no', name='uq_section_set_order',
+                            deferrable=True, initially='DEFERRED'),
     )
     
     def __repr__(self):
@@ -205,16 +235,23 @@ class Subsection(db.Model):
     
     id = db.Column(db.Integer, primary_key=True)
     section_id = db.Column(db.Integer, db.ForeignKey('section.id', ondelete='CASCADE'), nullable=False)
+    # Denormalized owner and ancestor ids (top level first); maintained by the path events below
+    statute_id = db.Column(db.Integer, db.ForeignKey('statute.id', ondelete='CASCADE'), nullable=False)
+    path = db.Column(ARRAY(db.Integer), nullable=False)
     name = db.Column(db.Text)
     subsection_no = db.Column(db.Text)
     content = db.Column(db.Text, nullable=False)
     order_no = db.Column(db.Integer, nullable=False)
+    # Annotated fields with their tags rendered to HTML, stamped with database.RENDER_VERSION
+    rendered_html = db.Column(JSONB(none_as_null=True))
+    render_version = db.Column(db.Integer)
     created_at = db.Column(db.DateTime(timezone=True), default=lambda: datetime.now(pytz.UTC))
     updated_at = db.Column(db.DateTime(timezone=True), default=lambda: datetime.now(pytz.UTC), 
                            onupdate=lambda: datetime.now(pytz.UTC))
     
     __table_args__ = (
-        db.UniqueConstraint('section_id', 'order_no', name='uq_subsection_section_order'),
+        db.UniqueConstraint('section_id', 'order_no', name='uq_subsection_section_order',
+                            deferrable=True, initially='DEFERRED'),
     )
     
     def __repr__(self):
@@ -272,6 +309,9 @@ class SchPart(db.Model):
     name = db.Column(db.Text, nullable=False)
     part_no = db.Column(db.Text)
     order_no = db.Column(db.Integer, nullable=False)
+    # Annotated fields with their tags rendered to HTML, stamped with database.RENDER_VERSION
+    rendered_html = db.Column(JSONB(none_as_null=True))
+    render_version = db.Column(db.Integer)
     created_at = db.Column(db.DateTime(timezone=True), default=lambda: datetime.now(pytz.UTC))
     updated_at = db.Column(db.DateTime(timezone=True), default=lambda: datetime.now(pytz.UTC), 
                            onupdate=lambda: datetime.now(pytz.UTC))
@@ -280,7 +320,8 @@ class SchPart(db.Model):
     sch_chapters = db.relationship('SchChapter', backref='sch_part', cascade='all, delete-orphan')
     
     __table_args__ = (
-        db.UniqueConstraint('statute_id', 'order_no', name='uq_sch_part_statute_order'),
+        db.UniqueConstraint('statute_id', 'order_no', name='uq_sch_part_statute_order',
+                            deferrable=True, initially='DEFERRED'),
     )
     
     def __repr__(self):
@@ -304,9 +345,15 @@ class SchChapter(db.Model):
     
     id = db.Column(db.Integer, primary_key=True)
     sch_part_id = db.Column(db.Integer, db.ForeignKey('sch_part.id', ondelete='CASCADE'), nullable=False)
+    # Denormalized owner and ancestor ids (top level first); maintained by the path events below
+    statute_id = db.Column(db.Integer, db.ForeignKey('statute.id', ondelete='CASCADE'), nullable=False)
+    path = db.Column(ARRAY(db.Integer), nullable=False)
     name = db.Column(db.Text, nullable=False)
     chapter_no = db.Column(db.Text)
     order_no = db.Column(db.Integer, nullable=False)
+    # Annotated fields with their tags rendered to HTML, stamped with database.RENDER_VERSION
+    rendered_html = db.Column(JSONB(none_as_null=True))
+    render_version = db.Column(db.Integer)
     created_at = db.Column(db.DateTime(timezone=True), default=lambda: datetime.now(pytz.UTC))
     updated_at = db.Column(db.DateTime(timezone=True), default=lambda: datetime.now(pytz.UTC), 
                            onupdate=lambda: datetime.now(pytz.UTC))
@@ -315,7 +362,8 @@ class SchChapter(db.Model):
     sch_sets = db.relationship('SchSet', backref='sch_chapter', cascade='all, delete-orphan')
     
     __table_args__ = (
-        db.UniqueConstraint('sch_part_id', 'order_no', name='uq_sch_chapter_part_order'),
+        db.UniqueConstraint('sch_part_id', 'order_no', name='uq_sch_chapter_part_order',
+                            deferrable=True, initially='DEFERRED'),
     )
     
     def __repr__(self):
@@ -337,9 +385,15 @@ class SchSet(db.Model):
     
     id = db.Column(db.Integer, primary_key=True)
     sch_chapter_id = db.Column(db.Integer, db.ForeignKey('sch_chapter.id', ondelete='CASCADE'), nullable=False)
+    # Denormalized owner and ancestor ids (top level first); maintained by the path events below
+    statute_id = db.Column(db.Integer, db.ForeignKey('statute.id', ondelete='CASCADE'), nullable=False)
+    path = db.Column(ARRAY(db.Integer), nullable=False)
     name = db.Column(db.Text, nullable=False)
     set_no = db.Column(db.Text)
     order_no = db.Column(db.Integer, nullable=False)
+    # Annotated fields with their tags rendered to HTML, stamped with database.RENDER_VERSION
+    rendered_html = db.Column(JSONB(none_as_null=True))
+    render_version = db.Column(db.Integer)
     created_at = db.Column(db.DateTime(timezone=True), default=lambda: datetime.now(pytz.UTC))
     updated_at = db.Column(db.DateTime(timezone=True), default=lambda: datetime.now(pytz.UTC), 
                            onupdate=lambda: datetime.now(pytz.UTC))
@@ -348,7 +402,8 @@ class SchSet(db.Model):
     sch_sections = db.relationship('SchSection', backref='sch_set', cascade='all, delete-orphan')
     
     __table_args__ = (
-        db.UniqueConstraint('sch_chapter_id', 'order_no', name='uq_sch_set_chapter_order'),
+        db.UniqueConstraint('sch_chapter_id', 'order_no', name='uq_sch_set_chapter_order',
+                            deferrable=True, initially='DEFERRED'),
     )
     
     def __repr__(self):
@@ -370,9 +425,15 @@ class SchSection(db.Model):
     
     id = db.Column(db.Integer, primary_key=True)
     sch_set_id = db.Column(db.Integer, db.ForeignKey('sch_set.id', ondelete='CASCADE'), nullable=False)
+    # Denormalized owner and ancestor ids (top level first); maintained by the path events below
+    statute_id = db.Column(db.Integer, db.ForeignKey('statute.id', ondelete='CASCADE'), nullable=False)
+    path = db.Column(ARRAY(db.Integer), nullable=False)
     name = db.Column(db.Text, nullable=False)
     section_no = db.Column(db.Text)
     order_no = db.Column(db.Integer, nullable=False)
+    # Annotated fields with their tags rendered to HTML, stamped with database.RENDER_VERSION
+    rendered_html = db.Column(JSONB(none_as_null=True))
+    render_version = db.Column(db.Integer)
     created_at = db.Column(db.DateTime(timezone=True), default=lambda: datetime.now(pytz.UTC))
     updated_at = db.Column(db.DateTime(timezone=True), default=lambda: datetime.now(pytz.UTC), 
                            onupdate=lambda: datetime.now(pytz.UTC))
@@ -381,7 +442,8 @@ class SchSection(db.Model):
     sch_subsections = db.relationship('SchSubsection', backref='sch_section', cascade='all, delete-orphan')
     
     __table_args__ = (
-        db.UniqueConstraint('sch_set_id', 'order_no', name='uq_sch_section_set_order'),
+        db.UniqueConstraint('sch_set_id', 'order_no', name='uq_sch_section_set_order',
+                            deferrable=True, initially='DEFERRED'),
     )
     
     def __repr__(self):
@@ -403,16 +465,23 @@ class SchSubsection(db.Model):
     
     id = db.Column(db.Integer, primary_key=True)
     sch_section_id = db.Column(db.Integer, db.ForeignKey('sch_section.id', ondelete='CASCADE'), nullable=False)
+    # Denormalized owner and ancestor ids (top level first); maintained by the path events below
+    statute_id = db.Column(db.Integer, db.ForeignKey('statute.id', ondelete='CASCADE'), nullable=False)
+    path = db.Column(ARRAY(db.Integer), nullable=False)
     name = db.Column(db.Text)
     subsection_no = db.Column(db.Text)
     content = db.Column(db.Text, nullable=False)
     order_no = db.Column(db.Integer, nullable=False)
+    # Annotated fields with their tags rendered to HTML, stamped with database.RENDER_VERSION
+    rendered_html = db.Column(JSONB(none_as_null=True))
+    render_version = db.Column(db.Integer)
     created_at = db.Column(db.DateTime(timezone=True), default=lambda: datetime.now(pytz.UTC))
     updated_at = db.Column(db.DateTime(timezone=True), default=lambda: datetime.now(pytz.UTC), 
                            onupdate=lambda: datetime.now(pytz.UTC))
     
     __table_args__ = (
-        db.UniqueConstraint('sch_section_id', 'order_no', name='uq_sch_subsection_section_order'),
+        db.UniqueConstraint('sch_section_id', 'order_no', name='uq_sch_subsection_section_order',
+                            deferrable=True, initially='DEFERRED'),
     )
     
     def __repr__(self):
@@ -428,26 +497,274 @@ class SchSubsection(db.Model):
             'updated_at': self.updated_at.isoformat()
         }
 
-from sqlalchemy import event
+class StatuteSnapshot(db.Model):
+    """Pre-assembled hierarchy document for a statute, rebuilt whenever its content changes"""
+    __tablename__ = 'statute_snapshot'
+    
+    statute_id = db.Column(db.Integer, db.ForeignKey('statute.id', ondelete='CASCADE'), primary_key=True)
+    revision = db.Column(db.Integer, nullable=False, default=0)
+    document = db.Column(JSONB)  # NULL when stale
+    built_at = db.Column(db.DateTime(timezone=True), default=lambda: datetime.now(pytz.UTC))
+    
+    def __repr__(self):
+        return f'<StatuteSnapshot {self.statute_id} r{self.revision}>'
+
+class AnnotationUsage(db.Model):
+    """Reverse index of the annotation keys referenced by each text field; maintained by database.py"""
+    __tablename__ = 'annotation_usage'
+    
+    node_table = db.Column(db.Text, primary_key=True)
+    node_id = db.Column(db.Integer, primary_key=True)
+    annotation_key = db.Column(db.Text, primary_key=True)  # "no" or "no_page"
+    statute_id = db.Column(db.Integer, db.ForeignKey('statute.id', ondelete='CASCADE'), nullable=False)
+    
+    __table_args__ = (
+        db.Index('idx_annotation_usage_statute_key', 'statute_id', 'annotation_key'),
+    )
+    
+    def __repr__(self):
+        return f'<AnnotationUsage {self.annotation_key} in {self.node_table} {self.node_id}>'
+
+class BulkSaveJob(db.Model):
+    """An inline editor save run in the background, with its progress; maintained by jobs.py"""
+    __tablename__ = 'bulk_save_job'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    statute_id = db.Column(db.Integer, db.ForeignKey('statute.id', ondelete='CASCADE'), nullable=False)
+    tree = db.Column(db.Text, nullable=False)  # key of database.DOCUMENT_TREES
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    payload = db.Column(JSONB, nullable=False)
+    status = db.Column(db.Text, nullable=False, default='queued')  # queued / running / done / failed
+    phase = db.Column(db.Text)
+    rows_done = db.Column(db.Integer, nullable=False, default=0)
+    rows_total = db.Column(db.Integer, nullable=False, default=0)
+    result = db.Column(JSONB)  # the delta apply_bulk_save returned, once done
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime(timezone=True), default=lambda: datetime.now(pytz.UTC))
+    updated_at = db.Column(db.DateTime(timezone=True), default=lambda: datetime.now(pytz.UTC),
+                           onupdate=lambda: datetime.now(pytz.UTC))
+    
+    def __repr__(self):
+        return f'<BulkSaveJob {self.id} {self.status}>'
+
+# Lightweight read-only node types, built straight from Core rows on read paths
+class HierarchyNode:
+    """
+    Slotted node holding only the columns the views need.
+    Supports item access so templates and helpers can treat it like a dict.
+    """
+    __slots__ = ()
+    columns = ()
+    child_key = None
+    
+    def __init__(self, *values):
+        for name, value in zip(self.columns, values):
+            setattr(self, name, value)
+        if self.child_key:
+            setattr(self, self.child_key, [])
+    
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key)
+    
+    def __setitem__(self, key, value):
+        setattr(self, key, value)
+    
+    def __contains__(self, key):
+        return hasattr(self, key)
+    
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+    
+    def keys(self):
+        return self.__slots__
+    
+    def to_dict(self):
+        """Convert node (and its children) to plain dictionaries"""
+        data = {name: getattr(self, name) for name in self.columns}
+        if self.child_key:
+            data[self.child_key] = [child.to_dict() for child in getattr(self, self.child_key)]
+        return data
+
+class PartNode(HierarchyNode):
+    __slots__ = ('id', 'statute_id', 'name', 'part_no', 'order_no', 'chapters')
+    columns = __slots__[:-1]
+    child_key = 'chapters'
+
+class ChapterNode(HierarchyNode):
+    __slots__ = ('id', 'part_id', 'name', 'chapter_no', 'order_no', 'sets')
+    columns = __slots__[:-1]
+    child_key = 'sets'
+
+class SetNode(HierarchyNode):
+    __slots__ = ('id', 'chapter_id', 'name', 'set_no', 'order_no', 'sections')
+    columns = __slots__[:-1]
+    child_key = 'sections'
+
+class SectionNode(HierarchyNode):
+    __slots__ = ('id', 'set_id', 'name', 'section_no', 'order_no', 'subsections')
+    columns = __slots__[:-1]
+    child_key = 'subsections'
+
+class SubsectionNode(HierarchyNode):
+    __slots__ = ('id', 'section_id', 'name', 'subsection_no', 'content', 'order_no')
+    columns = __slots__
+
+class SchPartNode(HierarchyNode):
+    __slots__ = ('id', 'statute_id', 'name', 'part_no', 'order_no', 'sch_chapters')
+    columns = __slots__[:-1]
+    child_key = 'sch_chapters'
+
+class SchChapterNode(HierarchyNode):
+    __slots__ = ('id', 'sch_part_id', 'name', 'chapter_no', 'order_no', 'sch_sets')
+    columns = __slots__[:-1]
+    child_key = 'sch_sets'
+
+class SchSetNode(HierarchyNode):
+    __slots__ = ('id', 'sch_chapter_id', 'name', 'set_no', 'order_no', 'sch_sections')
+    columns = __slots__[:-1]
+    child_key = 'sch_sections'
+
+class SchSectionNode(HierarchyNode):
+    __slots__ = ('id', 'sch_set_id', 'name', 'section_no', 'order_no', 'sch_subsections')
+    columns = __slots__[:-1]
+    child_key = 'sch_subsections'
+
+class SchSubsectionNode(HierarchyNode):
+    __slots__ = ('id', 'sch_section_id', 'name', 'subsection_no', 'content', 'order_no')
+    columns = __slots__
+
+from sqlalchemy import event, cast, func, inspect, select
+from flask import g, has_app_context, has_request_context
 from flask_login import current_user
 
+# ---------- Materialized ancestor paths ----------
+
+# Each tree from the top level down, with the FK that points at the level above
+HIERARCHY_CHAINS = (
+    ((Part, 'statute_id'), (Chapter, 'part_id'), (Set, 'chapter_id'),
+     (Section, 'set_id'), (Subsection, 'section_id')),
+    ((SchPart, 'statute_id'), (SchChapter, 'sch_part_id'), (SchSet, 'sch_chapter_id'),
+     (SchSection, 'sch_set_id'), (SchSubsection, 'sch_section_id')),
+)
+# model -> (parent model, parent FK); top-level models are not included
+HIERARCHY_PARENTS = {
+    model: (chain[depth - 1][0], parent_field)
+    for chain in HIERARCHY_CHAINS
+    for depth, (model, parent_field) in enumerate(chain) if depth
+}
+# model -> models below it, nearest first
+HIERARCHY_DESCENDANTS = {
+    model: [below for below, _ in chain[depth + 1:]]
+    for chain in HIERARCHY_CHAINS
+    for depth, (model, _) in enumerate(chain)
+}
+
+def hierarchy_path_for(connection, parent_model, parent_id):
+    """
+    Work out the statute_id and path a child of the given row inherits
+    
+    Args:
+        connection: Connection to read the parent row with (parents inserted
+            earlier in the same flush are visible on it)
+        parent_model: Model class of the parent
+        parent_id: ID of the parent row
+        
+    Returns:
+        Tuple of (statute_id, path)
+    """
+    table = parent_model.__table__
+    if parent_model in HIERARCHY_PARENTS:
+        statute_id, path = connection.execute(
+            select(table.c.statute_id, table.c.path).where(table.c.id == parent_id)
+        ).one()
+    else:
+        statute_id = connection.execute(
+            select(table.c.statute_id).where(table.c.id == parent_id)
+        ).scalar_one()
+        path = []
+    return statute_id, list(path) + [parent_id]
+
+def _parent_changed(target, parent_field):
+    return inspect(target).attrs[parent_field].history.has_changes()
+
+def _assign_path(mapper, connection, target):
+    parent_model, parent_field = HIERARCHY_PARENTS[type(target)]
+    target.statute_id, target.path = hierarchy_path_for(connection, parent_model, getattr(target, parent_field))
+
+def _assign_path_on_move(mapper, connection, target):
+    if _parent_changed(target, HIERARCHY_PARENTS[type(target)][1]):
+        _assign_path(mapper, connection, target)
+
+def _reroot_descendants(mapper, connection, target):
+    """Rewrite the path prefix of everything below a row that moved to a new parent"""
+    if not _parent_changed(target, HIERARCHY_PARENTS[type(target)][1]):
+        return
+    prefix = list(target.path) + [target.id]
+    depth = len(prefix)
+    # Descendants still carry the statute the row was in before the move
+    moved_from = inspect(target).attrs['statute_id'].history.deleted
+    statute_id = moved_from[0] if moved_from else target.statute_id
+    for offset, model in enumerate(HIERARCHY_DESCENDANTS[type(target)]):
+        table = model.__table__
+        # Rows `offset` levels further down keep the part of their path below the moved row
+        new_path = cast(prefix, ARRAY(db.Integer))
+        if offset:
+            new_path = func.array_cat(new_path, table.c.path[depth + 1:depth + offset])
+        connection.execute(
+            table.update()
+            .where(table.c.statute_id == statute_id,
+                   table.c.path.contains([target.id]),  # served by the GIN index on path
+                   table.c.path[depth] == target.id)    # the row itself, not an equal id of another level
+            .values(statute_id=target.statute_id, path=new_path)
+        )
+
+for _model in HIERARCHY_PARENTS:
+    event.listen(_model, 'before_insert', _assign_path)
+    event.listen(_model, 'before_update', _assign_path_on_move)
+    if HIERARCHY_DESCENDANTS[_model]:
+        event.listen(_model, 'after_update', _reroot_descendants)
+
+
+def _current_user_id():
+    if not has_request_context():
+        # Background jobs act for the user who queued them (see jobs.py)
+        return g.get('acting_user_id') if has_app_context() else None
+    return current_user.get_id() if current_user.is_authenticated else None
+
 def _log_action(mapper, connection, target, action):
     # skip if the model *is* the Log table
     if target.__tablename__ == "log":
         return
-    try:
-        user_id = current_user.get_id() if current_user.is_authenticated else None
-    except RuntimeError:
-        user_id = None  # outside request ctx (e.g. CLI)
     connection.execute(
         Log.__table__.insert().values(
-            user_id=user_id,
+            user_id=_current_user_id(),
             table_name=target.__tablename__,
             record_id=getattr(target, "id", None),
             action=action
         )
     )
 
+def log_bulk_action(connection, table_name, record_ids, action):
+    """
+    Write the audit rows for a Core statement, which the mapper events below never see
+    
+    Args:
+        connection: Connection (or session) the statement ran on
+        table_name: Table that was written
+        record_ids: IDs of the rows it changed
+        action: INSERT / UPDATE / DELETE
+    """
+    if not record_ids:
+        return
+    user_id = _current_user_id()
+    connection.execute(Log.__table__.insert(), [
+        {"user_id": user_id, "table_name": table_name, "record_id": record_id, "action": action}
+        for record_id in record_ids
+    ])
+
 for act, sa_event in [("INSERT", "after_insert"),
                       ("UPDATE", "after_update"),
                       ("DELETE", "after_delete")]:
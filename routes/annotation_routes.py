@@ -3,7 +3,7 @@ from sqlalchemy.exc import SQLAlchemyError
 from extensions import db
 from models import Annotation, Statute
 from forms import AnnotationForm
-from database import save_with_transaction
+from database import save_with_transaction, get_annotation_usage_counts, get_dangling_annotation_keys
 from datetime import datetime
 import pytz
 from flask_login import login_required
@@ -205,7 +205,12 @@ def list_statute_annotations(statute_id):
         # Paginate results
         annotations = query.paginate(page=page, per_page=per_page)
         
-        return render_template('annotation/list.html', annotations=annotations, search=search, statute=statute)
+        # Where each annotation is used, and tags that point at no annotation
+        usage_counts = get_annotation_usage_counts(annotations.items)
+        dangling_keys = get_dangling_annotation_keys(statute_id)
+        
+        return render_template('annotation/list.html', annotations=annotations, search=search, statute=statute,
+                               usage_counts=usage_counts, dangling_keys=dangling_keys)
     except Exception as e:
         current_app.logger.error(f"Error listing annotations: {str(e)}")
         flash("An error occurred while retrieving annotations.", "danger")
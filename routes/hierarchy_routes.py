@@ -2,10 +2,13 @@ from flask import Blueprint, render_template, request, redirect, url_for, flash,
 from sqlalchemy.exc import SQLAlchemyError
 from models import db, Statute, Part, Chapter, Set, Section, Subsection
 from forms import PartForm, ChapterForm, SetForm, SectionForm, SubsectionForm
-from database import save_with_transaction, get_next_order_no
+from database import save_with_transaction, get_next_order_no, get_child_nodes, get_node_content, get_with_ancestors, TREE_LEVELS
+from database import apply_bulk_save, delete_subtrees, get_statute_revision, invalidate_stale_snapshots
+from jobs import is_large_save, queue_bulk_save, get_bulk_save_job
+from timing import phase, trace
 from datetime import datetime
 import pytz
-from flask_login import login_required
+from flask_login import login_required, current_user
 # Create blueprint
 hierarchy_bp = Blueprint('hierarchy', __name__)
 
@@ -71,14 +74,13 @@ def add_part(statute_id):
 def edit_part(part_id):
     """Edit an existing part"""
     try:
-        # Get the part
-        part = db.session.query(Part).filter(Part.id == part_id).first()
-        if not part:
+        # Get the part and its ancestors up to the statute for breadcrumb
+        loaded = get_with_ancestors(Part, part_id)
+        if not loaded:
             flash("Part not found.", "danger")
             return redirect(url_for('statute.list_statutes'))
         
-        # Get the statute for breadcrumb
-        statute = db.session.query(Statute).filter(Statute.id == part.statute_id).first()
+        part, statute = loaded
         
         # Create form and populate with existing data
         form = PartForm(obj=part)
@@ -121,8 +123,8 @@ def delete_part(part_id):
         
         statute_id = part.statute_id
         
-        # Delete the part (cascade will delete all children)
-        db.session.delete(part)
+        # Delete the part and everything below it, by path
+        delete_subtrees('part', [part.id], statute_id)
         db.session.commit()
         
         flash(f"Part '{part.name}' and all its components have been deleted.", "success")
@@ -142,14 +144,13 @@ def delete_part(part_id):
 def add_chapter(part_id):
     """Add a new chapter to a part"""
     try:
-        # Get the part
-        part = db.session.query(Part).filter(Part.id == part_id).first()
-        if not part:
+        # Get the part and its ancestors up to the statute for breadcrumb
+        loaded = get_with_ancestors(Part, part_id)
+        if not loaded:
             flash("Part not found.", "danger")
             return redirect(url_for('statute.list_statutes'))
         
-        # Get the statute for breadcrumb
-        statute = db.session.query(Statute).filter(Statute.id == part.statute_id).first()
+        part, statute = loaded
         
         # Create form
         form = ChapterForm()
@@ -202,15 +203,13 @@ def add_chapter(part_id):
 def edit_chapter(chapter_id):
     """Edit an existing chapter"""
     try:
-        # Get the chapter
-        chapter = db.session.query(Chapter).filter(Chapter.id == chapter_id).first()
-        if not chapter:
+        # Get the chapter and its ancestors up to the statute for breadcrumb
+        loaded = get_with_ancestors(Chapter, chapter_id)
+        if not loaded:
             flash("Chapter not found.", "danger")
             return redirect(url_for('statute.list_statutes'))
         
-        # Get the part and statute for breadcrumb
-        part = db.session.query(Part).filter(Part.id == chapter.part_id).first()
-        statute = db.session.query(Statute).filter(Statute.id == part.statute_id).first()
+        chapter, part, statute = loaded
         
         # Create form and populate with existing data
         form = ChapterForm(obj=chapter)
@@ -252,11 +251,10 @@ def delete_chapter(chapter_id):
             flash("Chapter not found.", "danger")
             return redirect(url_for('statute.list_statutes'))
         
-        part = db.session.query(Part).filter(Part.id == chapter.part_id).first()
-        statute_id = part.statute_id
+        statute_id = chapter.statute_id
         
-        # Delete the chapter (cascade will delete all children)
-        db.session.delete(chapter)
+        # Delete the chapter and everything below it, by path
+        delete_subtrees('chapter', [chapter.id], statute_id)
         db.session.commit()
         
         flash(f"Chapter '{chapter.name}' and all its components have been deleted.", "success")
@@ -276,15 +274,13 @@ def delete_chapter(chapter_id):
 def add_set(chapter_id):
     """Add a new set to a chapter"""
     try:
-        # Get the chapter
-        chapter = db.session.query(Chapter).filter(Chapter.id == chapter_id).first()
-        if not chapter:
+        # Get the chapter and its ancestors up to the statute for breadcrumb
+        loaded = get_with_ancestors(Chapter, chapter_id)
+        if not loaded:
             flash("Chapter not found.", "danger")
             return redirect(url_for('statute.list_statutes'))
         
-        # Get the part and statute for breadcrumb
-        part = db.session.query(Part).filter(Part.id == chapter.part_id).first()
-        statute = db.session.query(Statute).filter(Statute.id == part.statute_id).first()
+        chapter, part, statute = loaded
         
         # Create form
         form = SetForm()
@@ -338,16 +334,13 @@ def add_set(chapter_id):
 def edit_set(set_id):
     """Edit an existing set"""
     try:
-        # Get the set
-        set_item = db.session.query(Set).filter(Set.id == set_id).first()
-        if not set_item:
+        # Get the set and its ancestors up to the statute for breadcrumb
+        loaded = get_with_ancestors(Set, set_id)
+        if not loaded:
             flash("Set not found.", "danger")
             return redirect(url_for('statute.list_statutes'))
         
-        # Get the chapter, part and statute for breadcrumb
-        chapter = db.session.query(Chapter).filter(Chapter.id == set_item.chapter_id).first()
-        part = db.session.query(Part).filter(Part.id == chapter.part_id).first()
-        statute = db.session.query(Statute).filter(Statute.id == part.statute_id).first()
+        set_item, chapter, part, statute = loaded
         
         # Create form and populate with existing data
         form = SetForm(obj=set_item)
@@ -390,12 +383,10 @@ def delete_set(set_id):
             flash("Set not found.", "danger")
             return redirect(url_for('statute.list_statutes'))
         
-        chapter = db.session.query(Chapter).filter(Chapter.id == set_item.chapter_id).first()
-        part = db.session.query(Part).filter(Part.id == chapter.part_id).first()
-        statute_id = part.statute_id
+        statute_id = set_item.statute_id
         
-        # Delete the set (cascade will delete all children)
-        db.session.delete(set_item)
+        # Delete the set and everything below it, by path
+        delete_subtrees('set', [set_item.id], statute_id)
         db.session.commit()
         
         flash(f"Set '{set_item.name}' and all its components have been deleted.", "success")
@@ -415,16 +406,13 @@ def delete_set(set_id):
 def add_section(set_id):
     """Add a new section to a set"""
     try:
-        # Get the set
-        set_item = db.session.query(Set).filter(Set.id == set_id).first()
-        if not set_item:
+        # Get the set and its ancestors up to the statute for breadcrumb
+        loaded = get_with_ancestors(Set, set_id)
+        if not loaded:
             flash("Set not found.", "danger")
             return redirect(url_for('statute.list_statutes'))
         
-        # Get the chapter, part and statute for breadcrumb
-        chapter = db.session.query(Chapter).filter(Chapter.id == set_item.chapter_id).first()
-        part = db.session.query(Part).filter(Part.id == chapter.part_id).first()
-        statute = db.session.query(Statute).filter(Statute.id == part.statute_id).first()
+        set_item, chapter, part, statute = loaded
         
         # Create form
         form = SectionForm()
@@ -451,8 +439,7 @@ def add_section(set_id):
                 
                 # Handle different actions
                 action = request.form.get('action', 'save')
-                print('=====================================', request.form)
-                print(action)
+                trace("add_section: section %s saved, action %s", section.id, action)
                 if action == 'save_add_another':
                     return redirect(url_for('hierarchy.add_section', set_id=set_id))
                 elif action == 'save_add_subsection':
@@ -481,17 +468,13 @@ def add_section(set_id):
 def edit_section(section_id):
     """Edit an existing section"""
     try:
-        # Get the section
-        section = db.session.query(Section).filter(Section.id == section_id).first()
-        if not section:
+        # Get the section and its ancestors up to the statute for breadcrumb
+        loaded = get_with_ancestors(Section, section_id)
+        if not loaded:
             flash("Section not found.", "danger")
             return redirect(url_for('statute.list_statutes'))
         
-        # Get the set, chapter, part and statute for breadcrumb
-        set_item = db.session.query(Set).filter(Set.id == section.set_id).first()
-        chapter = db.session.query(Chapter).filter(Chapter.id == set_item.chapter_id).first()
-        part = db.session.query(Part).filter(Part.id == chapter.part_id).first()
-        statute = db.session.query(Statute).filter(Statute.id == part.statute_id).first()
+        section, set_item, chapter, part, statute = loaded
         
         # Create form and populate with existing data
         form = SectionForm(obj=section)
@@ -535,13 +518,10 @@ def delete_section(section_id):
             flash("Section not found.", "danger")
             return redirect(url_for('statute.list_statutes'))
         
-        set_item = db.session.query(Set).filter(Set.id == section.set_id).first()
-        chapter = db.session.query(Chapter).filter(Chapter.id == set_item.chapter_id).first()
-        part = db.session.query(Part).filter(Part.id == chapter.part_id).first()
-        statute_id = part.statute_id
+        statute_id = section.statute_id
         
-        # Delete the section (cascade will delete all children)
-        db.session.delete(section)
+        # Delete the section and everything below it, by path
+        delete_subtrees('section', [section.id], statute_id)
         db.session.commit()
         
         flash(f"Section '{section.name}' and all its subsections have been deleted.", "success")
@@ -562,17 +542,13 @@ def delete_section(section_id):
 def add_subsection(section_id):
     """Add a new subsection to a section"""
     try:
-        # Get the section
-        section = db.session.query(Section).filter(Section.id == section_id).first()
-        if not section:
+        # Get the section and its ancestors up to the statute for breadcrumb
+        loaded = get_with_ancestors(Section, section_id)
+        if not loaded:
             flash("Section not found.", "danger")
             return redirect(url_for('statute.list_statutes'))
         
-        # Get the set, chapter, part and statute for breadcrumb
-        set_item = db.session.query(Set).filter(Set.id == section.set_id).first()
-        chapter = db.session.query(Chapter).filter(Chapter.id == set_item.chapter_id).first()
-        part = db.session.query(Part).filter(Part.id == chapter.part_id).first()
-        statute = db.session.query(Statute).filter(Statute.id == part.statute_id).first()
+        section, set_item, chapter, part, statute = loaded
         
         # Create form
         form = SubsectionForm()
@@ -630,18 +606,13 @@ def add_subsection(section_id):
 def edit_subsection(subsection_id):
     """Edit an existing subsection"""
     try:
-        # Get the subsection
-        subsection = db.session.query(Subsection).filter(Subsection.id == subsection_id).first()
-        if not subsection:
+        # Get the subsection and its ancestors up to the statute for breadcrumb
+        loaded = get_with_ancestors(Subsection, subsection_id)
+        if not loaded:
             flash("Subsection not found.", "danger")
             return redirect(url_for('statute.list_statutes'))
         
-        # Get the section, set, chapter, part and statute for breadcrumb
-        section = db.session.query(Section).filter(Section.id == subsection.section_id).first()
-        set_item = db.session.query(Set).filter(Set.id == section.set_id).first()
-        chapter = db.session.query(Chapter).filter(Chapter.id == set_item.chapter_id).first()
-        part = db.session.query(Part).filter(Part.id == chapter.part_id).first()
-        statute = db.session.query(Statute).filter(Statute.id == part.statute_id).first()
+        subsection, section, set_item, chapter, part, statute = loaded
         
         # Create form and populate with existing data
         form = SubsectionForm(obj=subsection)
@@ -687,11 +658,7 @@ def delete_subsection(subsection_id):
             flash("Subsection not found.", "danger")
             return redirect(url_for('statute.list_statutes'))
         
-        section = db.session.query(Section).filter(Section.id == subsection.section_id).first()
-        set_item = db.session.query(Set).filter(Set.id == section.set_id).first()
-        chapter = db.session.query(Chapter).filter(Chapter.id == set_item.chapter_id).first()
-        part = db.session.query(Part).filter(Part.id == chapter.part_id).first()
-        statute_id = part.statute_id
+        statute_id = subsection.statute_id
         
         # Delete the subsection
         db.session.delete(subsection)
@@ -709,147 +676,78 @@ def delete_subsection(subsection_id):
         flash("An error occurred while deleting the subsection.", "danger")
         return redirect(url_for('statute.list_statutes'))
     
+@hierarchy_bp.route('/<any(part, chapter, set, section):level>/<int:node_id>/children', methods=['GET'])
+@login_required
+def node_children(level, node_id):
+    """Return the children of a node as JSON for the expand-on-demand tree"""
+    try:
+        depth = min(max(request.args.get('depth', 1, type=int), 1), 4)
+        # Subsection text is left out unless asked for; see node_content
+        with_content = bool(request.args.get('content', 0, type=int))
+        child_level = TREE_LEVELS[level].child_level
+        nodes = get_child_nodes(child_level, node_id, depth, with_content)
+        return jsonify({'level': child_level, 'parent_id': node_id, 'nodes': nodes})
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        current_app.logger.error(f"Database error loading {level} children: {str(e)}")
+        return jsonify({"error": "load-failed"}), 500
+
+@hierarchy_bp.route('/subsection/<int:subsection_id>/content', methods=['GET'])
+@login_required
+def node_content(subsection_id):
+    """Return the content of one subsection for the content dialog"""
+    try:
+        node = get_node_content('subsection', subsection_id)
+        if node is None:
+            return jsonify({"error": "not-found"}), 404
+        return jsonify(node)
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        current_app.logger.error(f"Database error loading subsection content: {str(e)}")
+        return jsonify({"error": "load-failed"}), 500
+
 @hierarchy_bp.route("/statute/<int:statute_id>/bulk-save", methods=["POST"])
 @login_required
 def bulk_save(statute_id):
     """
-    Atomic save for the inline editor. Handles create / update / delete /
-    reorder across all hierarchy levels and guarantees unique sequential
-    order_no within every sibling group.
+    Atomic save for the inline editor's body tree. Handles create / update /
+    delete / reorder across all hierarchy levels (see database.apply_bulk_save).
+    Large saves are queued as a job instead and answered with 202 and the
+    URL to poll for its progress (see jobs.py).
     """
-    from flask import request, jsonify, current_app
-    from sqlalchemy.exc import SQLAlchemyError
-    from extensions import db
-    from models import Part, Chapter, Set, Section, Subsection
-    from collections import defaultdict
-
-    level_to_model = {
-        "part": Part, "chapter": Chapter,
-        "set": Set, "section": Section, "subsection": Subsection,
-    }
-    num_col = {
-        "part": "part_no", "chapter": "chapter_no", "set": "set_no",
-        "section": "section_no", "subsection": "subsection_no",
-    }
-    parent_fk = {
-        "part": "statute_id",
-        "chapter": "part_id",
-        "set": "chapter_id",
-        "section": "set_id",
-        "subsection": "section_id",
-    }
-
-    payload   = request.get_json(force=True) or {}
-    created   = payload.get("created",  [])
-    updated   = payload.get("updated",  [])
-    deleted   = payload.get("deleted",  [])
-    order_req = {o["id"]: o["order_no"] for o in payload.get("order", [])}
-
-    temp2real = {}
-
     try:
-        with db.session.no_autoflush:
-            # ---------- deletes ----------
-            for item in deleted:
-                mdl = level_to_model[item["level"]]
-                row = mdl.query.get(item["id"])
-                if row:
-                    db.session.delete(row)
-
-            # ---------- creates ----------
-            for item in created:
-                lvl, mdl = item["level"], level_to_model[item["level"]]
-                row = mdl()
-                pk = parent_fk[lvl]
-                setattr(row, pk, statute_id if pk == "statute_id" else item["parent_id"])
-                setattr(row, num_col[lvl], item.get("number"))
-                row.name      = item.get("name")
-                row.order_no  = 0  # placeholder
-                if lvl == "subsection":
-                    row.content = item.get("content")
-                db.session.add(row)
-                db.session.flush()  # get real PK
-                temp2real[item["temp_id"]] = row.id
-
-            # ---------- updates ----------
-            for item in updated:
-                row = level_to_model[item["level"]].query.get(item["id"])
-                if not row:
-                    continue
-                if "name" in item:
-                    row.name = item["name"]
-                if "number" in item and item["number"] is not None:
-                    setattr(row, num_col[item["level"]], item["number"])
-                if item["level"] == "subsection" and "content" in item:
-                    row.content = item["content"]
-
-            # ---------- translate temp IDs in order request ----------
-            orders = {temp2real.get(k, k): v for k, v in order_req.items()}
-
-            # ---------- bucket rows by sibling group ----------
-            buckets = defaultdict(list)  # {(lvl,parent): [rows]}
-            def bucket_row(row, lvl):
-                parent_id = statute_id if parent_fk[lvl] == "statute_id" \
-                    else getattr(row, parent_fk[lvl])
-                buckets[(lvl, parent_id)].append(row)
-
-            # Gather every row of this statute, all levels
-            parts = Part.query.filter_by(statute_id=statute_id).all()
-            for p in parts:
-                bucket_row(p, "part")
-                for ch in p.chapters:
-                    bucket_row(ch, "chapter")
-                    for s in ch.sets:
-                        bucket_row(s, "set")
-                        for sec in s.sections:
-                            bucket_row(sec, "section")
-                            for sub in sec.subsections:
-                                bucket_row(sub, "subsection")
-
-            # ----- LOGGING: Show the bucket contents before sort -----
-            print("======== BEFORE SORTING BUCKETS =========")
-            for bucket_key, rows in buckets.items():
-                print("Bucket:", bucket_key, "| Count:", len(rows))
-                for r in rows:
-                    print(f"    id={r.id}, name={getattr(r, 'name', '')}, order_no={r.order_no}")
-
-            for bucket_key, rows in buckets.items():
-                print(f"\n[Bucket {bucket_key}] Assigning temp order_no to avoid conflicts")
-                for r in rows:
-                    r.order_no = 10000 + r.id
-                    print(f"    id={r.id}, temp_order_no={r.order_no}, name={getattr(r, 'name', '')}")
-
-                db.session.flush()  # THIS IS THE KEY LINE
-                # Build orders dict AFTER all creates and temp2real is populated
-                orders = {}
-                for k, v in order_req.items():
-                    real_id = temp2real.get(k, k)
-                    orders[str(real_id)] = v
-                # Now, sort by intended order and re-assign
-                rows.sort(key=lambda r: orders.get(str(r.id), r.order_no))
-                print(f"[Bucket {bucket_key}] After sorting by orders (request):")
-                for r in rows:
-                    print(f"    id={r.id}, NEW order (request)={orders.get(str(r.id))}, CURRENT order_no={r.order_no}, name={getattr(r, 'name', '')}")
-
-                for i, r in enumerate(rows, 1):
-                    r.order_no = i
-                print(f"[Bucket {bucket_key}] After re-assigning order_no (final):")
-                for r in rows:
-                    print(f"    id={r.id}, order_no={r.order_no}, name={getattr(r, 'name', '')}")
-
-
-            print("======== COMMITTING =========")
-            db.session.flush()
-            # Show what will be committed for parts
-            for p in Part.query.filter_by(statute_id=statute_id).order_by(Part.order_no):
-                print(f"[COMMIT PART] id={p.id}, name={p.name}, order_no={p.order_no}")
-
-        db.session.commit()
-        print("======== COMMIT DONE =========")
-        return jsonify(temp2real), 200
+        payload = request.get_json(force=True) or {}
+        # Saves that could outlast the worker timeout run in the background
+        if is_large_save(payload):
+            job_id = queue_bulk_save(statute_id, 'parts', payload, current_user.id)
+            return jsonify({"job": job_id, "status": "queued",
+                            "progress_url": url_for('hierarchy.bulk_save_progress', job_id=job_id)}), 202
+        delta = apply_bulk_save(statute_id, payload, 'parts')
+        with phase('commit'):
+            # The revision this save writes, read before another editor can commit
+            invalidate_stale_snapshots()
+            delta['revision'] = get_statute_revision(statute_id)
+            db.session.commit()
+        return jsonify(delta), 200
 
     except SQLAlchemyError as exc:
         db.session.rollback()
         current_app.logger.exception("bulk-save failed")
         return jsonify({"error": "save-failed", "detail": str(exc)}), 400
+    except ValueError as exc:
+        db.session.rollback()
+        return jsonify({"error": "bad-request", "detail": str(exc)}), 400
 
+@hierarchy_bp.route("/bulk-save/jobs/<int:job_id>", methods=["GET"])
+@login_required
+def bulk_save_progress(job_id):
+    """Progress of a background save of either tree, and its delta once done"""
+    try:
+        job = get_bulk_save_job(job_id)
+        if job is None:
+            return jsonify({"error": "not-found"}), 404
+        return jsonify(job)
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        current_app.logger.error(f"Database error loading bulk-save job: {str(e)}")
+        return jsonify({"error": "load-failed"}), 500
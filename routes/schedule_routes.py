@@ -2,12 +2,76 @@ from flask import Blueprint, render_template, request, redirect, url_for, flash,
 from sqlalchemy.exc import SQLAlchemyError
 from models import db, Statute, SchPart, SchChapter, SchSet, SchSection, SchSubsection
 from forms import SchPartForm, SchChapterForm, SchSetForm, SchSectionForm, SchSubsectionForm
-from database import save_with_transaction, get_next_order_no
+from database import save_with_transaction, get_next_order_no, get_child_nodes, get_node_content, get_with_ancestors, TREE_LEVELS
+from database import apply_bulk_save, delete_subtrees, get_statute_revision, invalidate_stale_snapshots
+from jobs import is_large_save, queue_bulk_save
+from timing import phase
 from datetime import datetime
 import pytz
-from flask_login import login_required
+from flask_login import login_required, current_user
 schedule_bp = Blueprint('schedule', __name__, url_prefix='/schedule')
 
+@schedule_bp.route('/<any(part, chapter, set, section):level>/<int:node_id>/children', methods=['GET'])
+@login_required
+def node_children(level, node_id):
+    """Return the children of a schedule node as JSON for the expand-on-demand tree"""
+    try:
+        depth = min(max(request.args.get('depth', 1, type=int), 1), 4)
+        # Subsection text is left out unless asked for; see node_content
+        with_content = bool(request.args.get('content', 0, type=int))
+        child_level = TREE_LEVELS[f'sch_{level}'].child_level
+        nodes = get_child_nodes(child_level, node_id, depth, with_content)
+        return jsonify({'level': child_level, 'parent_id': node_id, 'nodes': nodes})
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        current_app.logger.error(f"Database error loading schedule {level} children: {str(e)}")
+        return jsonify({"error": "load-failed"}), 500
+
+@schedule_bp.route('/subsection/<int:sch_subsection_id>/content', methods=['GET'])
+@login_required
+def node_content(sch_subsection_id):
+    """Return the content of one schedule subsection"""
+    try:
+        node = get_node_content('sch_subsection', sch_subsection_id)
+        if node is None:
+            return jsonify({"error": "not-found"}), 404
+        return jsonify(node)
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        current_app.logger.error(f"Database error loading schedule subsection content: {str(e)}")
+        return jsonify({"error": "load-failed"}), 500
+
+@schedule_bp.route('/statute/<int:statute_id>/bulk-save', methods=['POST'])
+@login_required
+def bulk_save(statute_id):
+    """
+    Atomic save for the inline editor's schedule tree. Handles create / update /
+    delete / reorder across all schedule levels (see database.apply_bulk_save).
+    Large saves are queued as a job instead and answered with 202 and the
+    URL to poll for its progress (see jobs.py).
+    """
+    try:
+        payload = request.get_json(force=True) or {}
+        # Saves that could outlast the worker timeout run in the background
+        if is_large_save(payload):
+            job_id = queue_bulk_save(statute_id, 'sch_parts', payload, current_user.id)
+            return jsonify({"job": job_id, "status": "queued",
+                            "progress_url": url_for('hierarchy.bulk_save_progress', job_id=job_id)}), 202
+        delta = apply_bulk_save(statute_id, payload, 'sch_parts')
+        with phase('commit'):
+            # The revision this save writes, read before another editor can commit
+            invalidate_stale_snapshots()
+            delta['revision'] = get_statute_revision(statute_id)
+            db.session.commit()
+        return jsonify(delta), 200
+    except SQLAlchemyError as exc:
+        db.session.rollback()
+        current_app.logger.exception("schedule bulk-save failed")
+        return jsonify({"error": "save-failed", "detail": str(exc)}), 400
+    except ValueError as exc:
+        db.session.rollback()
+        return jsonify({"error": "bad-request", "detail": str(exc)}), 400
+
 # Schedule Part routes
 @schedule_bp.route('/statute/<int:statute_id>/part/new', methods=['GET', 'POST'])
 @login_required
@@ -70,14 +134,13 @@ def add_sch_part(statute_id):
 def edit_sch_part(sch_part_id):
     """Edit an existing schedule part"""
     try:
-        # Get the schedule part
-        sch_part = db.session.query(SchPart).filter(SchPart.id == sch_part_id).first()
-        if not sch_part:
+        # Get the schedule part and its ancestors up to the statute for breadcrumb
+        loaded = get_with_ancestors(SchPart, sch_part_id)
+        if not loaded:
             flash("Schedule part not found.", "danger")
             return redirect(url_for('statute.list_statutes'))
         
-        # Get the statute for breadcrumb
-        statute = db.session.query(Statute).filter(Statute.id == sch_part.statute_id).first()
+        sch_part, statute = loaded
         
         # Create form and populate with existing data
         form = SchPartForm(obj=sch_part)
@@ -120,8 +183,8 @@ def delete_sch_part(sch_part_id):
         
         statute_id = sch_part.statute_id
         
-        # Delete the schedule part (cascade will delete all children)
-        db.session.delete(sch_part)
+        # Delete the schedule part and everything below it, by path
+        delete_subtrees('sch_part', [sch_part.id], statute_id)
         db.session.commit()
         
         flash(f"Schedule part '{sch_part.name}' and all its components have been deleted.", "success")
@@ -142,14 +205,13 @@ def delete_sch_part(sch_part_id):
 def add_sch_chapter(sch_part_id):
     """Add a new schedule chapter to a part"""
     try:
-        # Get the schedule part
-        sch_part = db.session.query(SchPart).filter(SchPart.id == sch_part_id).first()
-        if not sch_part:
+        # Get the schedule part and its ancestors up to the statute for breadcrumb
+        loaded = get_with_ancestors(SchPart, sch_part_id)
+        if not loaded:
             flash("Schedule part not found.", "danger")
             return redirect(url_for('statute.list_statutes'))
         
-        # Get the statute for breadcrumb
-        statute = db.session.query(Statute).filter(Statute.id == sch_part.statute_id).first()
+        sch_part, statute = loaded
         
         # Create form
         form = SchChapterForm()
@@ -201,15 +263,13 @@ def add_sch_chapter(sch_part_id):
 def edit_sch_chapter(sch_chapter_id):
     """Edit an existing schedule chapter"""
     try:
-        # Get the schedule chapter
-        sch_chapter = db.session.query(SchChapter).filter(SchChapter.id == sch_chapter_id).first()
-        if not sch_chapter:
+        # Get the schedule chapter and its ancestors up to the statute for breadcrumb
+        loaded = get_with_ancestors(SchChapter, sch_chapter_id)
+        if not loaded:
             flash("Schedule chapter not found.", "danger")
             return redirect(url_for('statute.list_statutes'))
         
-        # Get the schedule part and statute for breadcrumb
-        sch_part = db.session.query(SchPart).filter(SchPart.id == sch_chapter.sch_part_id).first()
-        statute = db.session.query(Statute).filter(Statute.id == sch_part.statute_id).first()
+        sch_chapter, sch_part, statute = loaded
         
         # Create form and populate with existing data
         form = SchChapterForm(obj=sch_chapter)
@@ -251,11 +311,10 @@ def delete_sch_chapter(sch_chapter_id):
             flash("Schedule chapter not found.", "danger")
             return redirect(url_for('statute.list_statutes'))
         
-        sch_part = db.session.query(SchPart).filter(SchPart.id == sch_chapter.sch_part_id).first()
-        statute_id = sch_part.statute_id
+        statute_id = sch_chapter.statute_id
         
-        # Delete the schedule chapter (cascade will delete all children)
-        db.session.delete(sch_chapter)
+        # Delete the schedule chapter and everything below it, by path
+        delete_subtrees('sch_chapter', [sch_chapter.id], statute_id)
         db.session.commit()
         
         flash(f"Schedule chapter '{sch_chapter.name}' and all its components have been deleted.", "success")
@@ -276,15 +335,13 @@ def delete_sch_chapter(sch_chapter_id):
 def add_sch_set(sch_chapter_id):
     """Add a new schedule set to a chapter"""
     try:
-        # Get the schedule chapter
-        sch_chapter = db.session.query(SchChapter).filter(SchChapter.id == sch_chapter_id).first()
-        if not sch_chapter:
+        # Get the schedule chapter and its ancestors up to the statute for breadcrumb
+        loaded = get_with_ancestors(SchChapter, sch_chapter_id)
+        if not loaded:
             flash("Schedule chapter not found.", "danger")
             return redirect(url_for('statute.list_statutes'))
         
-        # Get the schedule part and statute for breadcrumb
-        sch_part = db.session.query(SchPart).filter(SchPart.id == sch_chapter.sch_part_id).first()
-        statute = db.session.query(Statute).filter(Statute.id == sch_part.statute_id).first()
+        sch_chapter, sch_part, statute = loaded
         
         # Create form
         form = SchSetForm()
@@ -337,16 +394,13 @@ def add_sch_set(sch_chapter_id):
 def edit_sch_set(sch_set_id):
     """Edit an existing schedule set"""
     try:
-        # Get the schedule set
-        sch_set = db.session.query(SchSet).filter(SchSet.id == sch_set_id).first()
-        if not sch_set:
+        # Get the schedule set and its ancestors up to the statute for breadcrumb
+        loaded = get_with_ancestors(SchSet, sch_set_id)
+        if not loaded:
             flash("Schedule set not found.", "danger")
             return redirect(url_for('statute.list_statutes'))
         
-        # Get the schedule chapter, part and statute for breadcrumb
-        sch_chapter = db.session.query(SchChapter).filter(SchChapter.id == sch_set.sch_chapter_id).first()
-        sch_part = db.session.query(SchPart).filter(SchPart.id == sch_chapter.sch_part_id).first()
-        statute = db.session.query(Statute).filter(Statute.id == sch_part.statute_id).first()
+        sch_set, sch_chapter, sch_part, statute = loaded
         
         # Create form and populate with existing data
         form = SchSetForm(obj=sch_set)
@@ -389,12 +443,10 @@ def delete_sch_set(sch_set_id):
             flash("Schedule set not found.", "danger")
             return redirect(url_for('statute.list_statutes'))
         
-        sch_chapter = db.session.query(SchChapter).filter(SchChapter.id == sch_set.sch_chapter_id).first()
-        sch_part = db.session.query(SchPart).filter(SchPart.id == sch_chapter.sch_part_id).first()
-        statute_id = sch_part.statute_id
+        statute_id = sch_set.statute_id
         
-        # Delete the schedule set (cascade will delete all children)
-        db.session.delete(sch_set)
+        # Delete the schedule set and everything below it, by path
+        delete_subtrees('sch_set', [sch_set.id], statute_id)
         db.session.commit()
         
         flash(f"Schedule set '{sch_set.name}' and all its components have been deleted.", "success")
@@ -415,16 +467,13 @@ def delete_sch_set(sch_set_id):
 def add_sch_section(sch_set_id):
     """Add a new schedule section to a set"""
     try:
-        # Get the schedule set
-        sch_set = db.session.query(SchSet).filter(SchSet.id == sch_set_id).first()
-        if not sch_set:
+        # Get the schedule set and its ancestors up to the statute for breadcrumb
+        loaded = get_with_ancestors(SchSet, sch_set_id)
+        if not loaded:
             flash("Schedule set not found.", "danger")
             return redirect(url_for('statute.list_statutes'))
         
-        # Get the schedule chapter, part and statute for breadcrumb
-        sch_chapter = db.session.query(SchChapter).filter(SchChapter.id == sch_set.sch_chapter_id).first()
-        sch_part = db.session.query(SchPart).filter(SchPart.id == sch_chapter.sch_part_id).first()
-        statute = db.session.query(Statute).filter(Statute.id == sch_part.statute_id).first()
+        sch_set, sch_chapter, sch_part, statute = loaded
         
         # Create form
         form = SchSectionForm()
@@ -479,17 +528,13 @@ def add_sch_section(sch_set_id):
 def edit_sch_section(sch_section_id):
     """Edit an existing schedule section"""
     try:
-        # Get the schedule section
-        sch_section = db.session.query(SchSection).filter(SchSection.id == sch_section_id).first()
-        if not sch_section:
+        # Get the schedule section and its ancestors up to the statute for breadcrumb
+        loaded = get_with_ancestors(SchSection, sch_section_id)
+        if not loaded:
             flash("Schedule section not found.", "danger")
             return redirect(url_for('statute.list_statutes'))
         
-        # Get the schedule set, chapter, part and statute for breadcrumb
-        sch_set = db.session.query(SchSet).filter(SchSet.id == sch_section.sch_set_id).first()
-        sch_chapter = db.session.query(SchChapter).filter(SchChapter.id == sch_set.sch_chapter_id).first()
-        sch_part = db.session.query(SchPart).filter(SchPart.id == sch_chapter.sch_part_id).first()
-        statute = db.session.query(Statute).filter(Statute.id == sch_part.statute_id).first()
+        sch_section, sch_set, sch_chapter, sch_part, statute = loaded
         
         # Create form and populate with existing data
         form = SchSectionForm(obj=sch_section)
@@ -533,13 +578,10 @@ def delete_sch_section(sch_section_id):
             flash("Schedule section not found.", "danger")
             return redirect(url_for('statute.list_statutes'))
         
-        sch_set = db.session.query(SchSet).filter(SchSet.id == sch_section.sch_set_id).first()
-        sch_chapter = db.session.query(SchChapter).filter(SchChapter.id == sch_set.sch_chapter_id).first()
-        sch_part = db.session.query(SchPart).filter(SchPart.id == sch_chapter.sch_part_id).first()
-        statute_id = sch_part.statute_id
+        statute_id = sch_section.statute_id
         
-        # Delete the schedule section (cascade will delete all children)
-        db.session.delete(sch_section)
+        # Delete the schedule section and everything below it, by path
+        delete_subtrees('sch_section', [sch_section.id], statute_id)
         db.session.commit()
         
         flash(f"Schedule section '{sch_section.name}' and all its subsections have been deleted.", "success")
@@ -560,17 +602,13 @@ def delete_sch_section(sch_section_id):
 def add_sch_subsection(sch_section_id):
     """Add a new schedule subsection to a section"""
     try:
-        # Get the schedule section
-        sch_section = db.session.query(SchSection).filter(SchSection.id == sch_section_id).first()
-        if not sch_section:
+        # Get the schedule section and its ancestors up to the statute for breadcrumb
+        loaded = get_with_ancestors(SchSection, sch_section_id)
+        if not loaded:
             flash("Schedule section not found.", "danger")
             return redirect(url_for('statute.list_statutes'))
         
-        # Get the schedule set, chapter, part and statute for breadcrumb
-        sch_set = db.session.query(SchSet).filter(SchSet.id == sch_section.sch_set_id).first()
-        sch_chapter = db.session.query(SchChapter).filter(SchChapter.id == sch_set.sch_chapter_id).first()
-        sch_part = db.session.query(SchPart).filter(SchPart.id == sch_chapter.sch_part_id).first()
-        statute = db.session.query(Statute).filter(Statute.id == sch_part.statute_id).first()
+        sch_section, sch_set, sch_chapter, sch_part, statute = loaded
         
         # Create form
         form = SchSubsectionForm()
@@ -624,18 +662,13 @@ def add_sch_subsection(sch_section_id):
 def edit_sch_subsection(sch_subsection_id):
     """Edit an existing schedule subsection"""
     try:
-        # Get the schedule subsection
-        sch_subsection = db.session.query(SchSubsection).filter(SchSubsection.id == sch_subsection_id).first()
-        if not sch_subsection:
+        # Get the schedule subsection and its ancestors up to the statute for breadcrumb
+        loaded = get_with_ancestors(SchSubsection, sch_subsection_id)
+        if not loaded:
             flash("Schedule subsection not found.", "danger")
             return redirect(url_for('statute.list_statutes'))
         
-        # Get the schedule section, set, chapter, schedule part and statute for breadcrumb
-        sch_section = db.session.query(SchSection).filter(SchSection.id == sch_subsection.sch_section_id).first()
-        sch_set = db.session.query(SchSet).filter(SchSet.id == sch_section.sch_set_id).first()
-        sch_chapter = db.session.query(SchChapter).filter(SchChapter.id == sch_set.sch_chapter_id).first()
-        schedule_part = db.session.query(SchPart).filter(SchPart.id == sch_chapter.sch_part_id).first()
-        statute = db.session.query(Statute).filter(Statute.id == schedule_part.statute_id).first()
+        sch_subsection, sch_section, sch_set, sch_chapter, schedule_part, statute = loaded
         
         # Create form and populate with existing data        
         form = SchSubsectionForm(obj=sch_subsection)
@@ -681,11 +714,7 @@ def delete_sch_subsection(sch_subsection_id):
             flash("Schedule subsection not found.", "danger")
             return redirect(url_for('statute.list_statutes'))
         
-        sch_section = db.session.query(SchSection).filter(SchSection.id == sch_subsection.sch_section_id).first()
-        sch_set = db.session.query(SchSet).filter(SchSet.id == sch_section.sch_set_id).first()
-        sch_chapter = db.session.query(SchChapter).filter(SchChapter.id == sch_set.sch_chapter_id).first()
-        schedule_part = db.session.query(SchPart).filter(SchPart.id == sch_chapter.sch_part_id).first()
-        statute_id = schedule_part.statute_id
+        statute_id = sch_subsection.statute_id
         
         # Delete the schedule subsection
         db.session.delete(sch_subsection)
@@ -1,11 +1,14 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, session, jsonify, current_app
+from flask import Blueprint, render_template, stream_template, request, redirect, url_for, flash, session, jsonify, current_app
 from sqlalchemy.exc import SQLAlchemyError
-from models import db, Statute, Annotation
+from models import db, Statute
 from forms import StatuteForm
-from database import check_exists, save_with_transaction, get_full_hierarchy
+from database import check_exists, save_with_transaction, get_hierarchy_snapshot, get_child_nodes, get_statute_revision
+from database import iter_document_blocks, render_stale_fragments, get_annotation_map, RENDER_VERSION
+from database import delete_statute_trees
+from timing import current_timer
 from datetime import datetime
+from itertools import chain
 import pytz
-import re 
 from flask_login import login_required
 statute_bp = Blueprint('statute', __name__, url_prefix='/statute')
 
@@ -62,29 +65,46 @@ def list_statutes():
 @statute_bp.route('/<int:statute_id>/book-view', methods=['GET'])
 def book_view(statute_id):
     """View statute in book/PDF-like format"""
+    timer = current_timer()
     try:
         # Get the statute
-        statute = db.session.query(Statute).filter(Statute.id == statute_id).first()
+        with timer.phase('fetch'):
+            statute = db.session.query(Statute).filter(Statute.id == statute_id).first()
         
         if not statute:
             flash("Statute not found.", "danger")
             return redirect(url_for('statute.list_statutes'))
         
-        # Get the full hierarchy for this statute
-        hierarchy = get_full_hierarchy(statute_id)
-        
-        if not hierarchy:
-            flash("Error loading statute content.", "danger")
-            return redirect(url_for('statute.view_statute', statute_id=statute_id))
-        
-        # Process annotations in the content
-        processed_hierarchy = process_hierarchy_annotations(hierarchy, statute_id)
+        # Render whatever a migration or a renderer change left stale in one go
+        # (split over processes for very large statutes)
+        if statute.render_version != RENDER_VERSION:
+            with timer.phase('annotate'):
+                render_stale_fragments(statute_id)
+                db.session.commit()
+        
+        # Annotated fields are served pre-rendered, so no annotation processing happens here.
+        # Blocks are read while the page renders; that time still counts as fetch
+        batch_size = current_app.config.get('BOOK_VIEW_BATCH_SIZE', 500)
+        with timer.phase('fetch'):
+            context = dict(
+                statute=statute,
+                # Each footnote is sent once; annotated spans refer to it by key
+                footnotes=get_annotation_map(statute_id),
+                parts=peek_blocks(timer.iterate('fetch', guard_blocks(
+                    iter_document_blocks(statute_id, 'parts', batch_size, rendered=True)))),
+                sch_parts=peek_blocks(timer.iterate('fetch', guard_blocks(
+                    iter_document_blocks(statute_id, 'sch_parts', batch_size, rendered=True))))
+            )
         
-        return render_template(
-            'statute/book_view.html',
-            statute=statute,
-            hierarchy=processed_hierarchy
-        )
+        # Stream pages as they render, or render the whole page at once
+        streaming = request.args.get('stream', current_app.config.get('BOOK_VIEW_STREAMING', True), type=int)
+        if streaming:
+            return current_app.response_class(
+                timer.iterate('render', buffered(stream_template('statute/book_view.html', **context))),
+                mimetype='text/html'
+            )
+        with timer.phase('render'):
+            return render_template('statute/book_view.html', **context)
         
     except SQLAlchemyError as e:
         db.session.rollback()
@@ -96,156 +116,50 @@ def book_view(statute_id):
         flash("An error occurred while retrieving the statute.", "danger")
         return redirect(url_for('statute.view_statute', statute_id=statute_id))
 
-def process_hierarchy_annotations(hierarchy, statute_id):
-    """Process annotations throughout the entire hierarchy"""
-    processed = hierarchy.copy()
-    
-    if processed['statute'].get('name'):
-        processed['statute']['name'], _ = process_annotations(
-            processed['statute']['name'], statute_id
-        )
-    if processed['statute'].get('act_no'):
-        processed['statute']['act_no'], _ = process_annotations(
-            processed['statute']['act_no'], statute_id
-        )
-    if processed['statute'].get('date'):
-        processed['statute']['date'], _ = process_annotations(
-            processed['statute']['date'], statute_id
-        )
-    # Process statute preface
-    if processed['statute'].get('preface'):
-        processed['statute']['preface'], _ = process_annotations(
-            processed['statute']['preface'], statute_id
-        )
-    
-    # Process parts
-    for part in processed.get('parts', []):
-        # Process part name (skip if pseudo)
-        if part.get('part_no') and part['part_no'].lower() != 'pseudo':
-            part['part_no'], _ = process_annotations(part['part_no'], statute_id)
-        if part.get('name') and part['name'].lower() != 'pseudo':
-            part['name'], _ = process_annotations(part['name'], statute_id)
-        
-        # Process chapters
-        for chapter in part.get('chapters', []):
-            if chapter.get('chapter_no') and chapter['chapter_no'].lower() != 'pseudo':
-                chapter['chapter_no'], _ = process_annotations(chapter['chapter_no'], statute_id)
-            if chapter.get('name') and chapter['name'].lower() != 'pseudo':
-                chapter['name'], _ = process_annotations(chapter['name'], statute_id)
-            
-            # Process sets
-            for set_item in chapter.get('sets', []):
-                if set_item.get('set_no') and set_item['set_no'].lower() != 'pseudo':
-                    set_item['set_no'], _ = process_annotations(set_item['set_no'], statute_id)
-                if set_item.get('name') and set_item['name'].lower() != 'pseudo':
-                    set_item['name'], _ = process_annotations(set_item['name'], statute_id)
-                
-                # Process sections
-                for section in set_item.get('sections', []):
-                    print(section.get('section_no'))
-                    if section.get('section_no') and section['section_no'].lower() != 'pseudo':
-                        section['section_no'], _ = process_annotations(section['section_no'], statute_id)
-                    if section.get('name') and section['name'].lower() != 'pseudo':
-                        section['name'], _ = process_annotations(section['name'], statute_id)
-                    
-                    # Process subsections
-                    for subsection in section.get('subsections', []):
-                        if subsection.get('subsection_no') and subsection['subsection_no'].lower() != 'pseudo':
-                            subsection['subsection_no'], _ = process_annotations(subsection['subsection_no'], statute_id)
-                        if subsection.get('name') and subsection['name'].lower() != 'pseudo':
-                            subsection['name'], _ = process_annotations(subsection['name'], statute_id)
-                        
-                        if subsection.get('content'):
-                            subsection['content'], _ = process_annotations(subsection['content'], statute_id)
-    
-    # Process schedule parts (similar structure)
-    for sch_part in processed.get('sch_parts', []):
-        if sch_part.get('name') and sch_part['name'].lower() != 'pseudo':
-            sch_part['name'], _ = process_annotations(sch_part['name'], statute_id)
-        
-        for sch_chapter in sch_part.get('sch_chapters', []):
-            if sch_chapter.get('name') and sch_chapter['name'].lower() != 'pseudo':
-                sch_chapter['name'], _ = process_annotations(sch_chapter['name'], statute_id)
-            
-            for sch_set in sch_chapter.get('sch_sets', []):
-                if sch_set.get('name') and sch_set['name'].lower() != 'pseudo':
-                    sch_set['name'], _ = process_annotations(sch_set['name'], statute_id)
-                
-                for sch_section in sch_set.get('sch_sections', []):
-                    if sch_section.get('name') and sch_section['name'].lower() != 'pseudo':
-                        sch_section['name'], _ = process_annotations(sch_section['name'], statute_id)
-                    
-                    for sch_subsection in sch_section.get('sch_subsections', []):
-                        if sch_subsection.get('name') and sch_subsection['name'].lower() != 'pseudo':
-                            sch_subsection['name'], _ = process_annotations(sch_subsection['name'], statute_id)
-                        
-                        if sch_subsection.get('content'):
-                            sch_subsection['content'], _ = process_annotations(sch_subsection['content'], statute_id)
-    
-    return processed
-
-def process_annotations(text, statute_id):
-    """
-    Process annotation tags in text and convert them to formatted text with tooltips.
-    Handles both <fa> (full annotation) and <pa> (partial annotation) tags.
-    Supports nested tags.
-    """
-    if not text:
-        return text, []
-    
-    # Get all annotations for this statute
-    annotations = {}
+@statute_bp.route('/<int:statute_id>/export.json', methods=['GET'])
+@login_required
+def export_statute(statute_id):
+    """Export the full statute hierarchy as JSON"""
     try:
-        statute_annotations = db.session.query(Annotation).filter(
-            Annotation.statute_id == statute_id
-        ).all()
-        
-        for ann in statute_annotations:
-            key = f"{ann.no}_{ann.page_no}" if ann.page_no else ann.no
-            annotations[key] = ann.footnote
+        hierarchy = get_hierarchy_snapshot(statute_id)
+        if not hierarchy:
+            return jsonify({"error": "not-found"}), 404
+        return jsonify(hierarchy)
     except Exception as e:
-        current_app.logger.error(f"Error fetching annotations: {str(e)}")
-    
-    processed_text = text
-    footnotes = []
-    
-    # Pattern to match both fa and pa tags with their attributes
-    pattern = r'<(fa|pa)\s+a=([^>\s]+)(?:\s+p=([^>\s]+))?[^>]*>(.*?)</\1>'
-    
-    def replace_annotation(match):
-        tag_type = match.group(1)  # 'fa' or 'pa'
-        a_value = match.group(2)   # annotation number
-        p_value = match.group(3)   # page number (optional)
-        content = match.group(4)   # text content
-        
-        # Create annotation key
-        ann_key = f"{a_value}_{p_value}" if p_value else a_value
-        
-        # Get footnote text
-        footnote_text = annotations.get(ann_key, f"Annotation {a_value} not found")
-        
-        # Process nested annotations recursively
-        processed_content, nested_footnotes = process_annotations(content, statute_id)
-        footnotes.extend(nested_footnotes)
-        
-        # Create formatted text with superscript and tooltip
-        formatted = f'<span class="annotated-text" title="{footnote_text}" data-annotation="{a_value}"><sup class="annotation-number">{a_value}</sup>[{processed_content}]</span>'
-        
-        # Add to footnotes list
-        footnotes.append({
-            'number': a_value,
-            'page': p_value,
-            'text': footnote_text,
-            'type': tag_type
-        })
-        
-        return formatted
-    
-    # Process all annotation tags
-    while re.search(pattern, processed_text, re.DOTALL):
-        processed_text = re.sub(pattern, replace_annotation, processed_text, flags=re.DOTALL)
+        current_app.logger.error(f"Error exporting statute: {str(e)}")
+        return jsonify({"error": "export-failed"}), 500
+
+def guard_blocks(blocks):
+    """Pass blocks through, ending the document cleanly if reading them fails"""
+    try:
+        yield from blocks
+    except SQLAlchemyError as e:
+        # Headers may already be sent, so end the document where it stopped
+        db.session.rollback()
+        current_app.logger.error(f"Database error reading statute blocks: {str(e)}")
+
+def peek_blocks(blocks):
+    """
+    Read the first block so templates can tell whether a tree is empty
     
-    return processed_text, footnotes
+    Returns:
+        An iterator over all blocks, or None if there are none
+    """
+    for first in blocks:
+        return chain([first], blocks)
+    return None
+
+def buffered(chunks, size=16384):
+    """Join the small pieces a streamed template yields into larger writes"""
+    pending, length = [], 0
+    for chunk in chunks:
+        pending.append(chunk)
+        length += len(chunk)
+        if length >= size:
+            yield ''.join(pending)
+            pending, length = [], 0
+    if pending:
+        yield ''.join(pending)
 
 @statute_bp.route('/new', methods=['GET', 'POST'])
 @login_required
@@ -257,7 +171,6 @@ def add_statute():
         try:
             # Check if statute with same name already exists
             existing = check_exists(Statute, name=form.name.data)
-            print(existing, '=======================================')
             if existing:
                 flash(f"A statute with the name '{form.name.data}' already exists.", "danger")
                 return render_template('statute/add.html', form=form)
@@ -309,14 +222,13 @@ def view_statute(statute_id):
             flash("Statute not found.", "danger")
             return redirect(url_for('statute.list_statutes'))
         
-        # Get the full hierarchy for this statute
-        hierarchy = get_full_hierarchy(statute_id)
-        
+        # Only the top level is rendered; deeper levels are fetched on expand
         return render_template(
             'statute/view.html', 
             statute=statute, 
-            parts=hierarchy.get('parts', []) if hierarchy else [],
-            sch_parts=hierarchy.get('sch_parts', []) if hierarchy else []
+            parts=get_child_nodes('part', statute_id),
+            sch_parts=get_child_nodes('sch_part', statute_id),
+            revision=get_statute_revision(statute_id)
         )
         
     except SQLAlchemyError as e:
@@ -395,7 +307,8 @@ def delete_statute(statute_id):
         # Store name for flash message
         statute_name = statute.name
         
-        # Delete the statute (cascade will delete all children)
+        # Clear its trees by path first, so the cascade does not load every row
+        delete_statute_trees(statute_id)
         db.session.delete(statute)
         db.session.commit()
         
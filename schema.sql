@@ -5,6 +5,8 @@ CREATE TABLE statute (
     act_no TEXT UNIQUE,
     date DATE,
     preface TEXT,
+    annotation_revision INTEGER NOT NULL DEFAULT 0,
+    render_version INTEGER,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
 );
@@ -16,63 +18,85 @@ CREATE TABLE part (
     name TEXT NOT NULL,
     part_no TEXT,
     order_no INTEGER NOT NULL,
+    rendered_html JSONB,
+    render_version INTEGER,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
     CONSTRAINT fk_part_statute FOREIGN KEY (statute_id) REFERENCES statute(id) ON DELETE CASCADE,
-    CONSTRAINT uq_part_statute_order UNIQUE (statute_id, order_no)
+    CONSTRAINT uq_part_statute_order UNIQUE (statute_id, order_no) DEFERRABLE INITIALLY DEFERRED
 );
 
 -- Create chapter table
 CREATE TABLE chapter (
     id SERIAL PRIMARY KEY,
     part_id INTEGER NOT NULL,
+    statute_id INTEGER NOT NULL,
+    path INTEGER[] NOT NULL,
     name TEXT NOT NULL,
     chapter_no TEXT,
     order_no INTEGER NOT NULL,
+    rendered_html JSONB,
+    render_version INTEGER,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
     CONSTRAINT fk_chapter_part FOREIGN KEY (part_id) REFERENCES part(id) ON DELETE CASCADE,
-    CONSTRAINT uq_chapter_part_order UNIQUE (part_id, order_no)
+    CONSTRAINT fk_chapter_statute FOREIGN KEY (statute_id) REFERENCES statute(id) ON DELETE CASCADE,
+    CONSTRAINT uq_chapter_part_order UNIQUE (part_id, order_no) DEFERRABLE INITIALLY DEFERRED
 );
 
 -- Create set table
 CREATE TABLE set (
     id SERIAL PRIMARY KEY,
     chapter_id INTEGER NOT NULL,
+    statute_id INTEGER NOT NULL,
+    path INTEGER[] NOT NULL,
     name TEXT NOT NULL,
     set_no TEXT,
     order_no INTEGER NOT NULL,
+    rendered_html JSONB,
+    render_version INTEGER,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
     CONSTRAINT fk_set_chapter FOREIGN KEY (chapter_id) REFERENCES chapter(id) ON DELETE CASCADE,
-    CONSTRAINT uq_set_chapter_order UNIQUE (chapter_id, order_no)
+    CONSTRAINT fk_set_statute FOREIGN KEY (statute_id) REFERENCES statute(id) ON DELETE CASCADE,
+    CONSTRAINT uq_set_chapter_order UNIQUE (chapter_id, order_no) DEFERRABLE INITIALLY DEFERRED
 );
 
 -- Create section table
 CREATE TABLE section (
     id SERIAL PRIMARY KEY,
     set_id INTEGER NOT NULL,
+    statute_id INTEGER NOT NULL,
+    path INTEGER[] NOT NULL,
     name TEXT NOT NULL,
     section_no TEXT,
     order_no INTEGER NOT NULL,
+    rendered_html JSONB,
+    render_version INTEGER,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
     CONSTRAINT fk_section_set FOREIGN KEY (set_id) REFERENCES set(id) ON DELETE CASCADE,
-    CONSTRAINT uq_section_set_order UNIQUE (set_id, order_no)
+    CONSTRAINT fk_section_statute FOREIGN KEY (statute_id) REFERENCES statute(id) ON DELETE CASCADE,
+    CONSTRAINT uq_section_set_order UNIQUE (set_id, order_no) DEFERRABLE INITIALLY DEFERRED
 );
 
 -- Create subsection table
 CREATE TABLE subsection (
     id SERIAL PRIMARY KEY,
     section_id INTEGER NOT NULL,
+    statute_id INTEGER NOT NULL,
+    path INTEGER[] NOT NULL,
     name TEXT NOT NULL,
     subsection_no TEXT,
     content TEXT NOT NULL,
     order_no INTEGER NOT NULL,
+    rendered_html JSONB,
+    render_version INTEGER,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
     CONSTRAINT fk_subsection_section FOREIGN KEY (section_id) REFERENCES section(id) ON DELETE CASCADE,
-    CONSTRAINT uq_subsection_section_order UNIQUE (section_id, order_no)
+    CONSTRAINT fk_subsection_statute FOREIGN KEY (statute_id) REFERENCES statute(id) ON DELETE CASCADE,
+    CONSTRAINT uq_subsection_section_order UNIQUE (section_id, order_no) DEFERRABLE INITIALLY DEFERRED
 );
 
 CREATE TABLE annotation (
@@ -94,64 +118,105 @@ CREATE TABLE sch_part (
     name TEXT NOT NULL,
     part_no TEXT,
     order_no INTEGER NOT NULL,
+    rendered_html JSONB,
+    render_version INTEGER,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
     CONSTRAINT fk_sch_part_statute FOREIGN KEY (statute_id) REFERENCES statute(id) ON DELETE CASCADE,
-    CONSTRAINT uq_sch_part_statute_order UNIQUE (statute_id, order_no)
+    CONSTRAINT uq_sch_part_statute_order UNIQUE (statute_id, order_no) DEFERRABLE INITIALLY DEFERRED
 );
 
 -- Create schedule chapter table
 CREATE TABLE sch_chapter (
     id SERIAL PRIMARY KEY,
     sch_part_id INTEGER NOT NULL,
+    statute_id INTEGER NOT NULL,
+    path INTEGER[] NOT NULL,
     name TEXT NOT NULL,
     chapter_no TEXT,
     order_no INTEGER NOT NULL,
+    rendered_html JSONB,
+    render_version INTEGER,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
     CONSTRAINT fk_sch_chapter_part FOREIGN KEY (sch_part_id) REFERENCES sch_part(id) ON DELETE CASCADE,
-    CONSTRAINT uq_sch_chapter_part_order UNIQUE (sch_part_id, order_no)
+    CONSTRAINT fk_sch_chapter_statute FOREIGN KEY (statute_id) REFERENCES statute(id) ON DELETE CASCADE,
+    CONSTRAINT uq_sch_chapter_part_order UNIQUE (sch_part_id, order_no) DEFERRABLE INITIALLY DEFERRED
 );
 
 -- Create schedule set table
 CREATE TABLE sch_set (
     id SERIAL PRIMARY KEY,
     sch_chapter_id INTEGER NOT NULL,
+    statute_id INTEGER NOT NULL,
+    path INTEGER[] NOT NULL,
     name TEXT NOT NULL,
     set_no TEXT,
     order_no INTEGER NOT NULL,
+    rendered_html JSONB,
+    render_version INTEGER,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
     CONSTRAINT fk_sch_set_chapter FOREIGN KEY (sch_chapter_id) REFERENCES sch_chapter(id) ON DELETE CASCADE,
-    CONSTRAINT uq_sch_set_chapter_order UNIQUE (sch_chapter_id, order_no)
+    CONSTRAINT fk_sch_set_statute FOREIGN KEY (statute_id) REFERENCES statute(id) ON DELETE CASCADE,
+    CONSTRAINT uq_sch_set_chapter_order UNIQUE (sch_chapter_id, order_no) DEFERRABLE INITIALLY DEFERRED
 );
 
 -- Create schedule section table
 CREATE TABLE sch_section (
     id SERIAL PRIMARY KEY,
     sch_set_id INTEGER NOT NULL,
+    statute_id INTEGER NOT NULL,
+    path INTEGER[] NOT NULL,
     name TEXT NOT NULL,
     section_no TEXT,
     order_no INTEGER NOT NULL,
+    rendered_html JSONB,
+    render_version INTEGER,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
     CONSTRAINT fk_sch_section_set FOREIGN KEY (sch_set_id) REFERENCES sch_set(id) ON DELETE CASCADE,
-    CONSTRAINT uq_sch_section_set_order UNIQUE (sch_set_id, order_no)
+    CONSTRAINT fk_sch_section_statute FOREIGN KEY (statute_id) REFERENCES statute(id) ON DELETE CASCADE,
+    CONSTRAINT uq_sch_section_set_order UNIQUE (sch_set_id, order_no) DEFERRABLE INITIALLY DEFERRED
 );
 
 -- Create schedule subsection table
 CREATE TABLE sch_subsection (
     id SERIAL PRIMARY KEY,
     sch_section_id INTEGER NOT NULL,
+    statute_id INTEGER NOT NULL,
+    path INTEGER[] NOT NULL,
     name TEXT NOT NULL,
     subsection_no TEXT,
     content TEXT NOT NULL,
     order_no INTEGER NOT NULL,
+    rendered_html JSONB,
+    render_version INTEGER,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
     CONSTRAINT fk_sch_subsection_section FOREIGN KEY (sch_section_id) REFERENCES sch_section(id) ON DELETE CASCADE,
-    CONSTRAINT uq_sch_subsection_section_order UNIQUE (sch_section_id, order_no)
+    CONSTRAINT fk_sch_subsection_statute FOREIGN KEY (statute_id) REFERENCES statute(id) ON DELETE CASCADE,
+    CONSTRAINT uq_sch_subsection_section_order UNIQUE (sch_section_id, order_no) DEFERRABLE INITIALLY DEFERRED
+);
+-- Create statute snapshot table (assembled hierarchy, NULL document when stale)
+CREATE TABLE statute_snapshot (
+    statute_id INTEGER PRIMARY KEY,
+    revision INTEGER NOT NULL DEFAULT 0,
+    document JSONB,
+    built_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT fk_statute_snapshot_statute FOREIGN KEY (statute_id) REFERENCES statute(id) ON DELETE CASCADE
+);
+
+-- Which text fields reference which annotation key ("no" or "no_page")
+CREATE TABLE annotation_usage (
+    node_table TEXT NOT NULL,
+    node_id INTEGER NOT NULL,
+    annotation_key TEXT NOT NULL,
+    statute_id INTEGER NOT NULL,
+    PRIMARY KEY (node_table, node_id, annotation_key),
+    CONSTRAINT fk_annotation_usage_statute FOREIGN KEY (statute_id) REFERENCES statute(id) ON DELETE CASCADE
 );
+
 CREATE TABLE "user" (
     id SERIAL PRIMARY KEY,
     username TEXT UNIQUE NOT NULL,
@@ -167,6 +232,24 @@ CREATE TABLE "log" (
     timestamp TIMESTAMPTZ DEFAULT NOW()
 );
 
+-- Inline editor saves applied in the background, with their progress
+CREATE TABLE bulk_save_job (
+    id SERIAL PRIMARY KEY,
+    statute_id INTEGER NOT NULL,
+    tree TEXT NOT NULL,
+    user_id INTEGER REFERENCES "user"(id),
+    payload JSONB NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',
+    phase TEXT,
+    rows_done INTEGER NOT NULL DEFAULT 0,
+    rows_total INTEGER NOT NULL DEFAULT 0,
+    result JSONB,
+    error TEXT,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT fk_bulk_save_job_statute FOREIGN KEY (statute_id) REFERENCES statute(id) ON DELETE CASCADE
+);
+
 -- Create indexes for performance
 CREATE INDEX idx_part_statute_id ON part(statute_id);
 CREATE INDEX idx_chapter_part_id ON chapter(part_id);
@@ -177,4 +260,22 @@ CREATE INDEX idx_sch_part_statute_id ON sch_part(statute_id);
 CREATE INDEX idx_sch_chapter_part_id ON sch_chapter(sch_part_id);
 CREATE INDEX idx_sch_set_chapter_id ON sch_set(sch_chapter_id);
 CREATE INDEX idx_sch_section_set_id ON sch_section(sch_set_id);
-CREATE INDEX idx_sch_subsection_section_id ON sch_subsection(sch_section_id);
\ No newline at end of file
+CREATE INDEX idx_sch_subsection_section_id ON sch_subsection(sch_section_id);
+CREATE INDEX idx_chapter_statute_id ON chapter(statute_id);
+CREATE INDEX idx_chapter_path ON chapter USING GIN (path);
+CREATE INDEX idx_set_statute_id ON set(statute_id);
+CREATE INDEX idx_set_path ON set USING GIN (path);
+CREATE INDEX idx_section_statute_id ON section(statute_id);
+CREATE INDEX idx_section_path ON section USING GIN (path);
+CREATE INDEX idx_subsection_statute_id ON subsection(statute_id);
+CREATE INDEX idx_subsection_path ON subsection USING GIN (path);
+CREATE INDEX idx_sch_chapter_statute_id ON sch_chapter(statute_id);
+CREATE INDEX idx_sch_chapter_path ON sch_chapter USING GIN (path);
+CREATE INDEX idx_sch_set_statute_id ON sch_set(statute_id);
+CREATE INDEX idx_sch_set_path ON sch_set USING GIN (path);
+CREATE INDEX idx_sch_section_statute_id ON sch_section(statute_id);
+CREATE INDEX idx_sch_section_path ON sch_section USING GIN (path);
+CREATE INDEX idx_sch_subsection_statute_id ON sch_subsection(statute_id);
+CREATE INDEX idx_sch_subsection_path ON sch_subsection USING GIN (path);
+CREATE INDEX idx_annotation_usage_statute_key ON annotation_usage(statute_id, annotation_key);
+CREATE INDEX idx_bulk_save_job_statute_id ON bulk_save_job(statute_id);
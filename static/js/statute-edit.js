@@ -2,12 +2,36 @@
   const $  = sel => document.querySelector(sel);
   const $$ = sel => [...document.querySelectorAll(sel)];
 
-  const state = {};          // id → {status, level, parent_id}
+  const state = {};          // "level:id" → {status, level, parent_id}
+
+  // Node ids are only unique within a table, so state is keyed by level and id
+  const keyOf   = node => `${node.dataset.level}:${node.dataset.id}`;
+  const nodeFor = key => {
+    const [level, id] = key.split(/:(.*)/);
+    return $(`.tree-node[data-level="${level}"][data-id="${id}"]`);
+  };
+
+  // Lists whose order was changed since the last save: ul → children before the change
+  const originalOrder = new Map();
+  const rememberOrder = (ul, except) => {
+    if (!originalOrder.has(ul)) originalOrder.set(ul, [...ul.children].filter(li => li !== except));
+  };
+
+  let revision = 0;          // statute revision the page reflects, from the last save
+
+  // The two trees of the page, each saved with its own bulk-save request
+  const TREES = [
+    { root: '.statute-structure', owns: lvl => !lvl.startsWith('sch-'),
+      url: () => `${location.pathname}/bulk-save` },
+    { root: '.statute-schedules', owns: lvl => lvl.startsWith('sch-'),
+      url: () => `/schedule${location.pathname}/bulk-save` },
+  ];
 
   document.addEventListener('DOMContentLoaded', () => {
     document.addEventListener('click', delegatedClick,  true);
     document.addEventListener('input', delegatedInput,  false);
 
+    revision = Number($('.edit-toolbox')?.dataset.revision || 0);
     initGlobalButtons();
     enableAllDraggables();
     window.onbeforeunload = () => hasUnsaved() ? 'Unsaved changes' : null;
@@ -15,20 +39,25 @@
 
   // Delegated click for add/edit/delete/move
   function delegatedClick (e) {
+    const show = e.target.closest('.btn-show-content');
+    if (show) {
+      e.preventDefault();
+      ensureContent(show.closest('.tree-node')).catch(() => {});
+      return;
+    }
     const btn = e.target.closest('.btn-small');
     if (!btn) return;
     e.preventDefault();
 
-    if (btn.classList.contains('btn-add') && btn.dataset.level === 'part') {
-      createPart();
+    const node = btn.closest('.tree-node');
+    if (!node && btn.classList.contains('btn-add')) {
+      createRoot(btn.dataset.level);
       updateSaveBar();
       return;
     }
-
-    const node = btn.closest('.tree-node');
     if (!node) return;
 
-    if (node.dataset.level === 'subsection' && btn.classList.contains('btn-edit')) {
+    if (isLeaf(node.dataset.level) && btn.classList.contains('btn-edit')) {
       return launchContentDialog(node);
     }
 
@@ -39,8 +68,8 @@
       markEdited(node);
     } else if (btn.classList.contains('btn-delete')) {
       node.classList.toggle('deleted');
-      const id = node.dataset.id;
-      state[id] = { ...(state[id] || {}), status: node.classList.contains('deleted') ? 'deleted' : 'edited' };
+      const key = keyOf(node);
+      state[key] = { ...(state[key] || {}), status: node.classList.contains('deleted') ? 'deleted' : 'edited' };
     } else if (btn.classList.contains('btn-up') || btn.classList.contains('btn-down')) {
       moveNode(btn);
     }
@@ -61,26 +90,32 @@
 
   function markEdited (node) {
     node.classList.add('edited');
-    const id = node.dataset.id;
-    state[id] = state[id] || {};
-    if (state[id].status !== 'new') state[id].status = 'edited';
+    const key = keyOf(node);
+    state[key] = state[key] || {};
+    if (state[key].status !== 'new') state[key].status = 'edited';
   }
 
   const hasUnsaved = () => Object.values(state).some(s => s.status && s.status !== 'unchanged');
 
-  function createPart () {
-    const rootUl = $('#hierarchy-tree .parts-list.tree-root');
+  function createRoot (level) {
+    const rootUl = $(`.tree-root[data-level="${level}"]`);
     if (!rootUl) return;
     const id = `new-${crypto.randomUUID()}`;
-    rootUl.insertAdjacentHTML('beforeend', templateFor('part', id));
+    rootUl.insertAdjacentHTML('beforeend', templateFor(level, id));
     const li = rootUl.lastElementChild;
     li.classList.add('new');
+    li.dataset.loaded = 'true';
     toggleEditable(li, true);
-    state[id] = { status: 'new', level: 'part', parent_id: null };
+    state[keyOf(li)] = { status: 'new', level, parent_id: null };
     enableDraggable(li);
   }
 
-  function createChild (parentNode, level) {
+  async function createChild (parentNode, level) {
+    // Existing children must be on the page before a sibling is appended
+    await ensureChildren(parentNode);
+    parentNode.querySelector(':scope > .empty-list')?.remove();
+    parentNode.classList.remove('collapsed');
+    parentNode.classList.add('expanded');
     let ul = parentNode.querySelector(':scope > .tree-children.sortable-list');
     if (!ul) {
       ul = document.createElement('ul');
@@ -94,25 +129,36 @@
     ul.insertAdjacentHTML('beforeend', templateFor(level, id));
     const li = ul.lastElementChild;
     li.classList.add('new');
+    li.dataset.loaded = 'true';
     toggleEditable(li, true);
-    state[id] = { status: 'new', level, parent_id: parentNode.dataset.id };
+    state[keyOf(li)] = { status: 'new', level, parent_id: parentNode.dataset.id };
     enableDraggable(li);
+    updateSaveBar();
   }
 
   // ------ template (with handle) ------
-  const LABELS = { part:'PART', chapter:'CHAPTER', set:'SET', section:'SECTION', subsection:'SUBSECTION' };
-  const nextLevel = lvl => ({ part:'chapter', chapter:'set', set:'section', section:'subsection' }[lvl]);
+  // Levels as used in the DOM: part … subsection, sch-part … sch-subsection
+  const LABELS = { part:'PART', chapter:'CHAPTER', set:'SET', section:'SECTION', subsection:'SUBSECTION',
+                   'sch-part':'SCHEDULE PART', 'sch-chapter':'CHAPTER', 'sch-set':'SET',
+                   'sch-section':'SECTION', 'sch-subsection':'SUBSECTION' };
+  const NEXT = { part:'chapter', chapter:'set', set:'section', section:'subsection' };
+  const nextLevel = lvl => lvl.startsWith('sch-')
+    ? (NEXT[lvl.slice(4)] ? `sch-${NEXT[lvl.slice(4)]}` : undefined)
+    : NEXT[lvl];
+  const isLeaf = lvl => !nextLevel(lvl);
+  const contentClass = lvl => lvl.startsWith('sch-') ? 'sch-subsection-content' : 'subsection-content';
 
   function templateFor (level, id) {
     const next   = nextLevel(level);
-    const addBtn = level !== 'subsection'
-      ? `<button class="btn-small btn-add" data-level="${next}">+ Add ${LABELS[next]}</button>`
+    const addBtn = next
+      ? `<button class="btn-small btn-add" data-level="${next}">+ Add ${LABELS[next]}</button>
+         <button class="btn-small btn-edit">✎ Edit</button>`
       : `<button class="btn-small btn-edit">✎ Edit</button>`;
     return /*html*/`
       <li class="tree-node ${level}-node" data-level="${level}" data-id="${id}">
         <div class="tree-item">
           <span class="drag-handle" title="Drag to reorder">☰</span>
-          ${level==='subsection'
+          ${isLeaf(level)
               ? '<div class="tree-leaf-spacer"></div>'
               : '<div class="tree-toggle"><span class="toggle-icon collapsed">▶</span><span class="toggle-icon expanded">▼</span></div>'}
           <div class="tree-content">
@@ -127,11 +173,133 @@
             <button class="btn-small btn-down">▼</button>
           </div>
         </div>
-        ${level==='subsection' ? '<div class="subsection-content hidden"></div>' : ''}
+        ${isLeaf(level) ? `<div class="${contentClass(level)} hidden"></div>` : ''}
       </li>`;
   }
 
-  function showLoadingOverlay() {
+  // ------ lazy loading of deeper levels ------
+  const PLURALS = { chapter:'chapters', set:'sets', section:'sections', subsection:'subsections' };
+
+  const childLevelOf = lvl => lvl.startsWith('sch_')
+    ? (nextLevel(lvl.slice(4)) ? `sch_${nextLevel(lvl.slice(4))}` : undefined)
+    : nextLevel(lvl);
+
+  const nl2br = str => (str || '').replace(/\n/g, '<br>\n');
+
+  function childrenUrl (node, depth) {
+    const lvl = node.dataset.level;
+    const path = lvl.startsWith('sch-') ? `/schedule/${lvl.slice(4)}` : `/${lvl}`;
+    return `${path}/${node.dataset.id}/children?depth=${depth}`;
+  }
+
+  // Fetch and render the direct children of a node once
+  function ensureChildren (node, depth = 1) {
+    if (node.dataset.loaded !== 'false') return Promise.resolve();
+    if (!node._loading) {
+      node._loading = fetch(childrenUrl(node, depth))
+        .then(r => { if (!r.ok) throw new Error(`HTTP ${r.status}`); return r.json(); })
+        .then(data => {
+          appendChildren(node, data.level, data.nodes);
+          node.dataset.loaded = 'true';
+        })
+        .catch(err => { console.error(err); alert(`Could not load children:\n${err}`); })
+        .finally(() => { node._loading = null; });
+    }
+    return node._loading;
+  }
+
+  // Make sure everything below a node is on the page, one request per unloaded subtree
+  async function ensureSubtree (node) {
+    if (node.dataset.loaded === 'false') return ensureChildren(node, 4);
+    const kids = node.querySelectorAll(':scope > .tree-children > .tree-node');
+    await Promise.all([...kids].map(ensureSubtree));
+  }
+
+  function appendChildren (parentLi, level, nodes) {
+    const sch = level.startsWith('sch_');
+    const domLevel = level.replace('_', '-');
+    if (!nodes.length) {
+      const what = PLURALS[sch ? level.slice(4) : level];
+      parentLi.insertAdjacentHTML('beforeend',
+        `<div class="empty-list tree-children"><p>No ${what} added yet</p></div>`);
+      return;
+    }
+    const ul = document.createElement('ul');
+    ul.className = `${domLevel}s-list tree-children sortable-list`;
+    ul.dataset.parentId = parentLi.dataset.id;
+    ul.dataset.level = domLevel;
+    ul.dataset.groupName = domLevel;
+    nodes.forEach(n => ul.appendChild(renderNode(n)));
+    parentLi.appendChild(ul);
+    makeSortable(ul);
+  }
+
+  function finishNode (li, data, childLevel) {
+    if (childLevel) {
+      li.classList.add('collapsed');
+      li.dataset.loaded = data.has_children && !data.children ? 'false' : 'true';
+      if (data.children) appendChildren(li, childLevel, data.children);
+    } else {
+      li.classList.add('leaf-node');
+      li.dataset.loaded = 'true';
+    }
+    return li;
+  }
+
+  function renderNode (data) {
+    const level = data.level.replace('_', '-');
+    const tpl = document.createElement('template');
+    tpl.innerHTML = templateFor(level, data.id).trim();
+    const li = tpl.content.firstElementChild;
+    // defaultValue is what Cancel goes back to
+    li.querySelector('.num-input').defaultValue  = data.number || '';
+    li.querySelector('.name-input').defaultValue = data.name || '';
+    if (isLeaf(level)) {
+      const div = li.querySelector(`.${contentClass(level)}`);
+      div.classList.remove('hidden');
+      if ('content' in data) div.innerHTML = nl2br(data.content);
+      else deferContent(li, div, data);
+    }
+    return finishNode(li, data, childLevelOf(data.level));
+  }
+
+  // ------ subsection content, fetched only when it is needed ------
+  function deferContent (li, div, data) {
+    div.dataset.loaded = 'false';
+    if (data.has_content) {
+      li.querySelector('.tree-actions').insertAdjacentHTML('afterbegin',
+        '<button type="button" class="btn-small btn-show-content">¶ Show Content</button>');
+    }
+  }
+
+  function contentUrl (node) {
+    const lvl = node.dataset.level;
+    return `${lvl.startsWith('sch-') ? '/schedule' : ''}/subsection/${node.dataset.id}/content`;
+  }
+
+  // Resolves with the content element once it holds the stored text
+  function ensureContent (node) {
+    const div = node.querySelector(':scope > .subsection-content, :scope > .sch-subsection-content');
+    if (div.dataset.loaded !== 'false') return Promise.resolve(div);
+    if (!div._loading) {
+      div._loading = fetch(contentUrl(node))
+        .then(r => { if (!r.ok) throw new Error(`HTTP ${r.status}`); return r.json(); })
+        .then(data => {
+          div.innerHTML = nl2br(data.content);
+          div.dataset.loaded = 'true';
+          node.querySelector(':scope > .tree-item .btn-show-content')?.remove();
+          return div;
+        })
+        .catch(err => { console.error(err); alert(`Could not load content:\n${err}`); throw err; })
+        .finally(() => { div._loading = null; });
+    }
+    return div._loading;
+  }
+
+  window.statuteTree = { ensureChildren, ensureSubtree };
+
+  function showLoadingOverlay(text = 'Saving changes…') {
+    $('#loading-overlay span').textContent = text;
     document.getElementById('loading-overlay').style.display = 'flex';
   }
   function hideLoadingOverlay() {
@@ -145,23 +313,30 @@
     const idx  = list.indexOf(li);
     const swap = up ? idx - 1 : idx + 1;
     if (swap < 0 || swap >= list.length) return;
+    rememberOrder(li.parentNode);
     li.parentNode.insertBefore(li, up ? list[swap] : list[swap].nextSibling);
     [...li.parentNode.children].forEach((node, i) => {
       node.dataset.order = i + 1;
-      const id = node.dataset.id;
-      state[id] = { ...(state[id] || {}), status: state[id]?.status || 'unchanged' };
+      const key = keyOf(node);
+      state[key] = { ...(state[key] || {}), status: state[key]?.status || 'unchanged' };
     });
     markEdited(li);
     updateSaveBar();
   }
 
-  function launchContentDialog (subNode) {
+  async function launchContentDialog (subNode) {
     const dlg  = $('#subContentDlg');
     const area = $('#dlgContent');
-    const div  = subNode.querySelector('.subsection-content');
+    let div;
+    try {
+      div = await ensureContent(subNode);
+    } catch (err) {
+      return;
+    }
     area.value = div.innerHTML.trim();
     dlg.showModal();
     $('#dlgOk').onclick = () => {
+      if (div._original === undefined) div._original = div.innerHTML;
       div.innerHTML = area.value;
       markEdited(subNode);
       dlg.close();
@@ -171,7 +346,7 @@
 
   function initGlobalButtons () {
     $('#statute-save')  .addEventListener('click', saveAll);
-    $('#statute-cancel').addEventListener('click', () => location.reload());
+    $('#statute-cancel').addEventListener('click', cancelAll);
   }
   function updateSaveBar () {
     const dirty = hasUnsaved();
@@ -181,22 +356,24 @@
 
   async function saveAll () {
     showLoadingOverlay();
-    const payload = buildPayload();
     try {
-      const r = await fetch(`${location.pathname}/bulk-save`, {
-        method : 'POST',
-        headers: { 'Content-Type':'application/json', 'X-CSRFToken' : $('meta[name=csrf-token]')?.content || '' },
-        body   : JSON.stringify(payload)
-      });
-      if (!r.ok) throw await r.text();
-      const map = await r.json();
-      Object.entries(map).forEach(([tmp, real]) => {
-        const n = document.querySelector(`.tree-node[data-id="${tmp}"]`);
-        if (n) n.dataset.id = real;
-      });
-      document.querySelectorAll('.tree-node.deleted').forEach(n => n.remove());
-      Object.keys(state).forEach(k => delete state[k]);
-      document.querySelectorAll('.tree-node').forEach(n => n.classList.remove('new','edited'));
+      for (const tree of TREES) {
+        const payload = buildPayload(tree);
+        if (!Object.values(payload).some(items => items.length)) continue;
+        const r = await fetch(tree.url(), {
+          method : 'POST',
+          headers: { 'Content-Type':'application/json', 'X-CSRFToken' : $('meta[name=csrf-token]')?.content || '' },
+          body   : JSON.stringify({ ...payload, revision })
+        });
+        if (!r.ok) throw await r.text();
+        // Large saves are queued (202) and applied in the background
+        const delta = r.status === 202 ? await waitForJob(await r.json()) : await r.json();
+        applyDelta(tree, delta);
+        if (delta.stale) {
+          alert('This statute was also changed elsewhere since the page was loaded.\n' +
+                'Your changes are saved; reload the page to see the other changes.');
+        }
+      }
       updateSaveBar();
       hideLoadingOverlay();
       alert('Save successful');
@@ -207,17 +384,114 @@
     }
   }
 
-  function buildPayload () {
+  // Poll a background save until it finishes; resolves to its delta
+  async function waitForJob (job) {
+    for (;;) {
+      await new Promise(resolve => setTimeout(resolve, 1000));
+      const r = await fetch(job.progress_url);
+      if (!r.ok) throw await r.text();
+      const progress = await r.json();
+      if (progress.status === 'done')   return progress.result;
+      if (progress.status === 'failed') throw progress.error;
+      showLoadingOverlay(`Saving changes… ${progress.phase || 'queued'} ` +
+                         `(${progress.rows_done} of ${progress.rows_total})`);
+    }
+  }
+
+  // Bring one tree in line with the server's answer to a save, without reloading
+  function applyDelta (tree, delta) {
+    Object.entries(delta.ids).forEach(([tmp, real]) => {
+      const n = document.querySelector(`.tree-node[data-id="${tmp}"]`);
+      if (n) n.dataset.id = real;
+      document.querySelectorAll(`.sortable-list[data-parent-id="${tmp}"]`).forEach(ul => (ul.dataset.parentId = real));
+    });
+    delta.nodes.forEach(n => {
+      const node = nodeFor(`${n.level.replace('_', '-')}:${n.id}`);
+      if (!node) return;
+      const item = node.querySelector(':scope > .tree-item');
+      item.querySelector('.num-input').defaultValue  = item.querySelector('.num-input').value  = n.number || '';
+      item.querySelector('.name-input').defaultValue = item.querySelector('.name-input').value = n.name || '';
+      node.dataset.orderNo = n.order_no;
+    });
+    // The server's parent wins: a node the page shows elsewhere is moved under it
+    delta.nodes.forEach(n => {
+      const node = nodeFor(`${n.level.replace('_', '-')}:${n.id}`);
+      if (node && n.parent_id != null && node.parentNode.dataset.parentId !== String(n.parent_id)) {
+        placeUnder(node, String(n.parent_id), Number(n.order_no));
+      }
+    });
+    const root = $(tree.root);
+    delta.deleted.forEach(n => nodeFor(`${n.level.replace('_', '-')}:${n.id}`)?.remove());
+    root.querySelectorAll('.tree-node.deleted').forEach(n => n.remove());
+    Object.keys(state).filter(k => tree.owns(k)).forEach(k => delete state[k]);
+    root.querySelectorAll('.tree-node').forEach(n => n.classList.remove('new','edited'));
+    root.querySelectorAll('.subsection-content, .sch-subsection-content').forEach(div => delete div._original);
+    [...originalOrder.keys()].filter(ul => root.contains(ul)).forEach(ul => originalOrder.delete(ul));
+    revision = delta.revision;
+  }
+
+  // Move a node into the list of its parent, at its order key; a parent that is
+  // not on the page, or whose children are not loaded yet, shows it when expanded
+  function placeUnder (node, parentId, orderNo) {
+    const level  = node.dataset.level;
+    const parent = [...document.querySelectorAll(`.tree-node[data-id="${parentId}"]`)]
+      .find(li => nextLevel(li.dataset.level) === level);
+    if (!parent || parent.dataset.loaded === 'false') {
+      node.remove();
+      return;
+    }
+    parent.querySelector(':scope > .empty-list')?.remove();
+    let ul = parent.querySelector(':scope > .tree-children.sortable-list');
+    if (!ul) {
+      ul = document.createElement('ul');
+      ul.className = `${level}s-list tree-children sortable-list`;
+      ul.dataset.parentId = parentId;
+      ul.dataset.level = level;
+      ul.dataset.groupName = level;
+      parent.appendChild(ul);
+      makeSortable(ul);
+    }
+    const next = [...ul.children].find(li => li !== node && Number(li.dataset.orderNo) > orderNo);
+    ul.insertBefore(node, next || null);
+  }
+
+  // Undo every unsaved change in place
+  function cancelAll () {
+    // Lists first: their remembered children include new nodes, removed next
+    originalOrder.forEach((children, ul) => children.forEach(li => ul.appendChild(li)));
+    originalOrder.clear();
+    $$('.tree-node.new').forEach(n => n.remove());
+    $$('.tree-node.deleted').forEach(n => n.classList.remove('deleted'));
+    $$('.tree-node.edited').forEach(node => {
+      node.querySelectorAll(':scope > .tree-item input').forEach(i => (i.value = i.defaultValue));
+      const div = node.querySelector(':scope > .subsection-content, :scope > .sch-subsection-content');
+      if (div && div._original !== undefined) {
+        div.innerHTML = div._original;
+        delete div._original;
+      }
+      toggleEditable(node, false);
+      node.classList.remove('edited');
+    });
+    Object.keys(state).forEach(k => delete state[k]);
+    updateSaveBar();
+  }
+
+  function buildPayload (tree) {
     const created=[], updated=[], deleted=[], order=[];
-    Object.entries(state).forEach(([id, st]) => {
-      const node = $(`.tree-node[data-id="${id}"]`);
+    Object.entries(state).forEach(([key, st]) => {
+      if (!tree.owns(key)) return;
+      const node = nodeFor(key);
       if (!node) return;
-      const level = node.dataset.level;
+      const id = node.dataset.id;
+      const level = node.dataset.level.replace('-', '_');   // level names of the API
+      const contentDiv = isLeaf(node.dataset.level)
+        ? node.querySelector(`:scope > .${contentClass(node.dataset.level)}`) : null;
       const fields = {
         number   : node.querySelector('.num-input') ?.value.trim() || null,
         name     : node.querySelector('.name-input')?.value.trim() || null,
-        content  : level==='subsection'
-                    ? node.querySelector('.subsection-content').innerHTML.trim()
+        // content that was never fetched is left out so the server keeps it
+        content  : contentDiv
+                    ? (contentDiv.dataset.loaded === 'false' ? undefined : contentDiv.innerHTML.trim())
                     : null,
         order_no : [...node.parentNode.children].indexOf(node)+1,
         parent_id: node.parentNode.dataset.parentId || null
@@ -225,39 +499,45 @@
       if (st.status==='new')      created.push({temp_id:id, level, ...fields});
       else if (st.status==='edited') updated.push({id, level, ...fields});
       else if (st.status==='deleted') deleted.push({id, level});
-      if (st.status!=='deleted') order.push({id, order_no: fields.order_no});
+      if (st.status!=='deleted') order.push({id, level, order_no: fields.order_no});
     });
     return {created, updated, deleted, order};
   }
 
 /* ---------- DRAG & DROP (cross-parent) ---------- */
 function makeSortable(ul) {
+  if (ul._sortable) return;
   const level = ul.dataset.level || 'all';
-  Sortable.create(ul, {
+  ul._sortable = Sortable.create(ul, {
     group : { name: `grp-${level}`, pull: true, put: true }, // <-- SAME-LEVEL lists share items
     handle: '.drag-handle',
     animation: 150,
+    onStart(e){ rememberOrder(e.from); },
     onUpdate(e){ afterMove(e.to, e.item); },  // same list
-    onAdd(e){ afterMove(e.to, e.item); }      // moved to new parent
+    onAdd(e){ rememberOrder(e.to, e.item); afterMove(e.to, e.item); }      // moved to new parent
   });
 }
 
 function afterMove(parentList, movedLi) {
   [...parentList.children].forEach((li, idx) => {
     li.dataset.order = idx + 1;
-    const id = li.dataset.id;
-    state[id] = state[id] || {};
-    if (state[id].status !== 'new') state[id].status = 'edited';
+    const key = keyOf(li);
+    state[key] = state[key] || {};
+    if (state[key].status !== 'new') state[key].status = 'edited';
   });
 
-  const id = movedLi.dataset.id;
-  state[id] = state[id] || {};
-  state[id].parent_id = parentList.dataset.parentId;
-  if (state[id].status !== 'new') state[id].status = 'edited';
+  const key = keyOf(movedLi);
+  state[key] = state[key] || {};
+  state[key].parent_id = parentList.dataset.parentId;
+  if (state[key].status !== 'new') state[key].status = 'edited';
 
   updateSaveBar();
 }
 
+function enableDraggable(li) {
+  li.querySelectorAll('.sortable-list').forEach(makeSortable);
+}
+
 function enableAllDraggables() {
   document.querySelectorAll('.sortable-list').forEach(ul => {
     if (!ul._sortable) makeSortable(ul);
@@ -0,0 +1,52 @@
+"""Annotation tag parser (annotations.render_annotations), against the regex loop it replaced"""
+import pytest
+
+from annotations import render_annotations
+from benchmarks.annotation_parser import regex_loop
+
+ANNOTATIONS = {'1': 'Inserted by Act I of 2001', '2': 'Omitted by "Ordinance" II', '3_4': "Substituted by SRO 3/4"}
+
+@pytest.mark.parametrize('text', [
+    'Plain text without tags',
+    'The <fa a=1>inserted words</fa> and <pa a=2>omitted words</pa>.',
+    '<fa a=1>outer <pa a=2>inner</pa> outer</fa>',
+    '<pa a=3 p=4>with a page</pa> and <fa a=9>an unknown annotation</fa>',
+    '<fa a=1>multi\nline</fa>',
+    'An <fa a=1>unclosed tag',
+    'A stray </pa> closing tag',
+    '<fa a=1>closed with <pa a=2>one left open</fa>',
+])
+def test_renders_as_the_regex_loop(text):
+    assert render_annotations(text, ANNOTATIONS) == regex_loop(text, ANNOTATIONS)
+
+def test_nested_tags_of_one_type_pair_innermost_first():
+    html, footnotes = render_annotations('<fa a=1>a <fa a=2>b</fa> c</fa>', ANNOTATIONS)
+    assert html == (
+        '<span class="annotated-text" title="Inserted by Act I of 2001" data-annotation="1">'
+        '<sup class="annotation-number">1</sup>[a '
+        '<span class="annotated-text" title="Omitted by &quot;Ordinance&quot; II" data-annotation="2">'
+        '<sup class="annotation-number">2</sup>[b]</span> c]</span>'
+    )
+    assert [footnote['number'] for footnote in footnotes] == ['2', '1']
+
+def test_unclosed_and_stray_tags_are_kept_as_text():
+    text = 'a </fa> b <pa a=2>c <fa a=1>d</fa>'
+    html, footnotes = render_annotations(text, ANNOTATIONS)
+    assert html.startswith('a </fa> b <pa a=2>c <span class="annotated-text"')
+    assert [footnote['number'] for footnote in footnotes] == ['1']
+
+def test_without_a_map_spans_reference_footnotes_by_key():
+    html, footnotes = render_annotations('<pa a=3 p=4>x</pa> <fa a=1>y</fa>')
+    assert html == (
+        '<span class="annotated-text" data-footnote="3_4" data-annotation="3">'
+        '<sup class="annotation-number">3</sup>[x]</span> '
+        '<span class="annotated-text" data-footnote="1" data-annotation="1">'
+        '<sup class="annotation-number">1</sup>[y]</span>'
+    )
+    assert footnotes[0] == {'number': '3', 'page': '4', 'text': None, 'type': 'pa'}
+
+def test_with_a_map_spans_carry_the_footnote_as_title():
+    html, footnotes = render_annotations('<fa a=2>x</fa> <fa a=7>y</fa>', ANNOTATIONS)
+    assert 'title="Omitted by &quot;Ordinance&quot; II"' in html
+    assert 'title="Annotation 7 not found"' in html
+    assert [footnote['text'] for footnote in footnotes] == ['Omitted by "Ordinance" II', 'Annotation 7 not found']
@@ -0,0 +1,120 @@
+"""Inline editor saves (database.apply_bulk_save through the bulk-save endpoint)"""
+
+def rows(db, sql, **params):
+    return db.session.execute(db.text(sql), params).all()
+
+def bulk_save(client, statute_id, **payload):
+    return client.post(f"/statute/{statute_id}/bulk-save", json=payload)
+
+def test_reparent_moves_row_and_its_descendants(app, db, client, statute):
+    chapter, (old_part, new_part) = statute['chapter'][0], statute['part']
+    response = bulk_save(client, statute['statute'][0],
+                         updated=[{"id": str(chapter), "level": "chapter", "parent_id": str(new_part)}])
+    assert response.status_code == 200
+    node = next(n for n in response.json['nodes'] if n['level'] == 'chapter' and n['id'] == chapter)
+    assert node['parent_id'] == new_part
+    
+    with app.app_context():
+        assert rows(db, "SELECT part_id, path FROM chapter WHERE id = :id", id=chapter) == [(new_part, [new_part])]
+        assert rows(db, "SELECT count(*) FROM chapter WHERE part_id = :id", id=old_part) == [(0,)]
+        # Every row below the chapter now starts its path at the new part
+        for table in ('set', 'section', 'subsection'):
+            paths = rows(db, f"SELECT path FROM {table} WHERE path[2] = :id", id=chapter)
+            assert paths and all(path[0] == new_part for path, in paths)
+        # Its key is unique in the new group
+        keys = rows(db, "SELECT order_no FROM chapter WHERE part_id = :id", id=new_part)
+        assert len(set(keys)) == 2
+
+def test_reparent_under_parent_of_another_statute_is_rejected(app, db, client, statute):
+    response = bulk_save(client, statute['statute'][0],
+                         updated=[{"id": str(statute['chapter'][0]), "level": "chapter", "parent_id": "999"}])
+    assert response.status_code == 400
+    with app.app_context():
+        assert rows(db, "SELECT part_id FROM chapter WHERE id = :id",
+                    id=statute['chapter'][0]) == [(statute['part'][0],)]
+
+def test_delete_removes_the_subtree(app, db, client, statute):
+    part = statute['part'][0]
+    response = bulk_save(client, statute['statute'][0], deleted=[{"id": str(part), "level": "part"}])
+    assert response.status_code == 200
+    assert response.json['deleted'] == [{"level": "part", "id": part}]
+    
+    with app.app_context():
+        for table in ('chapter', 'set', 'section', 'subsection'):
+            assert rows(db, f"SELECT id FROM {table} WHERE path[1] = :id", id=part) == []
+        assert rows(db, "SELECT count(*) FROM subsection")[0][0] == 2
+        # Deleted rows leave the usage index and are logged
+        assert rows(db, "SELECT count(*) FROM annotation_usage WHERE node_table = 'subsection'")[0][0] == 2
+        assert rows(db, "SELECT count(*) FROM log WHERE action = 'DELETE' AND table_name = 'subsection'")[0][0] == 2
+
+def test_create_under_deleted_subtree_is_rejected(app, db, client, statute):
+    # The set is not deleted itself, but it is inside the deleted part
+    part, set_ = statute['part'][0], statute['set'][0]
+    response = bulk_save(client, statute['statute'][0],
+                         deleted=[{"id": str(part), "level": "part"}],
+                         created=[{"temp_id": "new-1", "level": "section", "parent_id": str(set_),
+                                   "number": "9", "name": "Orphan"}])
+    assert response.status_code == 400
+    assert "deleted by this save" in response.json['detail']
+    with app.app_context():
+        # Nothing of the save was applied
+        assert rows(db, "SELECT id FROM part WHERE id = :id", id=part) == [(part,)]
+        assert rows(db, "SELECT count(*) FROM section WHERE name = 'Orphan'")[0][0] == 0
+
+def test_revision_is_the_one_this_save_wrote(app, db, client, statute):
+    from sqlalchemy import event
+    statute_id = statute['statute'][0]
+    
+    def other_editor_commits(session):
+        # Another save lands right after this one commits
+        with db.engine.begin() as connection:
+            connection.execute(db.text("UPDATE statute_snapshot SET revision = revision + 1 "
+                                       "WHERE statute_id = :id"), {'id': statute_id})
+    
+    with app.app_context():
+        before = rows(db, "SELECT revision FROM statute_snapshot WHERE statute_id = :id", id=statute_id)
+    event.listen(db.session, 'after_commit', other_editor_commits, once=True)
+    try:
+        response = bulk_save(client, statute_id,
+                             updated=[{"id": str(statute['part'][0]), "level": "part", "name": "Renamed"}])
+    finally:
+        if event.contains(db.session, 'after_commit', other_editor_commits):
+            event.remove(db.session, 'after_commit', other_editor_commits)
+    assert response.status_code == 200
+    written = (before[0][0] if before else 0) + 1
+    assert response.json['revision'] == written
+    with app.app_context():
+        assert rows(db, "SELECT revision FROM statute_snapshot WHERE statute_id = :id",
+                    id=statute_id) == [(written + 1,)]
+
+def test_update_of_another_statutes_row_is_rejected(app, db, client, statute):
+    from models import Statute
+    with app.app_context():
+        other = Statute(name='Other Act', act_no='2 of 2024')
+        db.session.add(other)
+        db.session.commit()
+        other_id = other.id
+    response = bulk_save(client, other_id,
+                         updated=[{"id": str(statute['part'][0]), "level": "part", "name": "Hijacked"}])
+    assert response.status_code == 400
+    with app.app_context():
+        assert rows(db, "SELECT name FROM part WHERE id = :id", id=statute['part'][0]) == [('Part 0',)]
+
+def test_malformed_items_are_rejected(client, statute):
+    statute_id = statute['statute'][0]
+    for payload in ({"updated": [{"level": "part", "name": "No id"}]},
+                    {"deleted": [{"id": "1"}]},
+                    {"created": [{"level": "part", "name": "No temp id"}]},
+                    {"order": [{"id": "1", "level": "part"}]},
+                    {"updated": ["1"]}):
+        response = bulk_save(client, statute_id, **payload)
+        assert response.status_code == 400, payload
+        assert response.json['error'] == 'bad-request'
+
+def test_edited_row_deleted_with_its_ancestor_is_skipped(app, db, client, statute):
+    response = bulk_save(client, statute['statute'][0],
+                         deleted=[{"id": str(statute['part'][0]), "level": "part"}],
+                         updated=[{"id": str(statute['section'][0]), "level": "section", "name": "Edited"}])
+    assert response.status_code == 200
+    with app.app_context():
+        assert rows(db, "SELECT id FROM section WHERE id = :id", id=statute['section'][0]) == []
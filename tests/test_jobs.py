@@ -0,0 +1,66 @@
+"""Background saves (jobs.py)"""
+from datetime import datetime, timedelta
+import threading
+
+import pytz
+
+import jobs
+
+def queued_job(db, statute_id, payload):
+    from models import BulkSaveJob
+    job = BulkSaveJob(statute_id=statute_id, tree='parts', payload=payload, status='queued',
+                      rows_total=jobs.bulk_save_size(payload))
+    db.session.add(job)
+    db.session.commit()
+    return job.id
+
+def test_job_reported_failed_is_not_committed(app, db, statute, monkeypatch):
+    statute_id, section = statute['statute'][0], statute['section'][0]
+    payload = {"created": [{"temp_id": "new-1", "level": "subsection", "parent_id": str(section),
+                            "number": "3", "name": "Late", "content": "Text"}]}
+    with app.app_context():
+        job_id = queued_job(db, statute_id, payload)
+    
+    def poll():
+        with app.app_context():
+            seen.append(jobs.get_bulk_save_job(job_id)['status'])
+    
+    def timed_out_meanwhile(*args, **kwargs):
+        delta = apply_bulk_save(*args, **kwargs)
+        # A poller, on a thread and session of its own, gives up on the job while it works
+        app.config['BULK_SAVE_JOB_TIMEOUT'] = 0
+        try:
+            poller = threading.Thread(target=poll)
+            poller.start()
+            poller.join()
+        finally:
+            app.config['BULK_SAVE_JOB_TIMEOUT'] = 600
+        return delta
+    
+    seen = []
+    
+    apply_bulk_save = jobs.apply_bulk_save
+    monkeypatch.setattr(jobs, 'apply_bulk_save', timed_out_meanwhile)
+    jobs.run_bulk_save_job(app, job_id)
+    
+    assert seen == ['failed']
+    with app.app_context():
+        progress = jobs.get_bulk_save_job(job_id)
+        assert (progress['status'], progress['result']) == ('failed', None)
+        assert db.session.execute(db.text("SELECT count(*) FROM subsection WHERE name = 'Late'")).scalar() == 0
+
+def test_finished_job_is_not_failed_by_timeout(app, db, statute):
+    statute_id = statute['statute'][0]
+    payload = {"updated": [{"id": str(statute['part'][0]), "level": "part", "name": "Renamed"}]}
+    with app.app_context():
+        job_id = queued_job(db, statute_id, payload)
+    jobs.run_bulk_save_job(app, job_id)
+    
+    with app.app_context():
+        # Even once it is older than the timeout, a done job stays done
+        db.session.execute(db.text("UPDATE bulk_save_job SET updated_at = :at WHERE id = :id"),
+                           {'at': datetime.now(pytz.UTC) - timedelta(hours=1), 'id': job_id})
+        db.session.commit()
+        progress = jobs.get_bulk_save_job(job_id)
+        assert progress['status'] == 'done'
+        assert progress['result']['revision'] == jobs.get_statute_revision(statute_id)
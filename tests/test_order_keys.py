@@ -0,0 +1,87 @@
+"""Sparse sibling order keys (database.arrange_siblings / order_keys_for)"""
+import random
+
+from database import ORDER_GAP, ORDER_KEY_MAX, arrange_siblings, order_keys_for, _longest_increasing
+
+def spaced(*ids):
+    """Keys of a freshly spaced group: ORDER_GAP apart, in the given order"""
+    return {node_id: ORDER_GAP * i for i, node_id in enumerate(ids, 1)}
+
+def reorder(keys, requested):
+    """New keys of the whole group after the client's request, and the changed ones"""
+    # New rows are stored with the placeholder key 0 until they are given one
+    sequence = arrange_siblings([(node_id, key or 0) for node_id, key in keys.items()], requested)
+    changed = order_keys_for(sequence, keys)
+    return sequence, {**keys, **changed}, changed
+
+def assert_sorted_as(sequence, keys):
+    ordered = [keys[node_id] for node_id in sequence]
+    assert all(a < b for a, b in zip(ordered, ordered[1:])), ordered
+
+def test_move_rewrites_one_key():
+    keys = spaced(1, 2, 3, 4, 5)
+    sequence, new_keys, changed = reorder(keys, {5: 2})
+    assert sequence == [1, 5, 2, 3, 4]
+    assert changed == {5: ORDER_GAP + ORDER_GAP // 2}
+    assert_sorted_as(sequence, new_keys)
+
+def test_move_to_the_front_and_back():
+    keys = spaced(1, 2, 3)
+    assert reorder(keys, {3: 1})[2] == {3: ORDER_GAP // 2}
+    assert reorder(keys, {1: 3})[2] == {1: 4 * ORDER_GAP}
+
+def test_insert_rewrites_one_key():
+    keys = {**spaced(1, 2, 3), 9: None}
+    sequence, new_keys, changed = reorder(keys, {9: 2})
+    assert sequence == [1, 9, 2, 3]
+    assert list(changed) == [9]
+    assert_sorted_as(sequence, new_keys)
+
+def test_keys_stay_strictly_increasing():
+    rng = random.Random(20)
+    keys = spaced(*range(1, 31))
+    for _ in range(500):
+        node_id = rng.choice(list(keys))
+        sequence, keys, changed = reorder(keys, {node_id: rng.randint(1, len(keys))})
+        assert_sorted_as(sequence, keys)
+        assert all(0 < key <= ORDER_KEY_MAX for key in keys.values())
+
+def test_longest_increasing_run_keeps_its_keys():
+    keys = {1: 100, 2: 50, 3: 200, 4: 300, 5: 10}
+    assert _longest_increasing([1, 2, 3, 4, 5], keys) in ({1, 3, 4}, {2, 3, 4})
+    assert _longest_increasing([9, 1], {9: None, 1: 5}) == {1}
+
+def test_used_up_gap_respaces_the_group():
+    keys = {1: 1, 2: 2, 3: 3}
+    sequence, new_keys, changed = reorder(keys, {3: 2})
+    assert sequence == [1, 3, 2]
+    assert new_keys == spaced(1, 3, 2)
+    assert 3 in changed and 2 in changed
+
+def test_no_room_at_the_top_respaces_the_group():
+    keys = {1: ORDER_KEY_MAX - 1, 9: None}
+    sequence, new_keys, _ = reorder(keys, {9: 2})
+    assert new_keys == spaced(1, 9)
+
+def test_new_last_child_rebalances_a_full_group(app, db, statute, monkeypatch):
+    import database
+    from models import Part
+    calls = []
+    rebalance = database.rebalance_sibling_group
+    
+    def spy(*args):
+        calls.append(args)
+        return rebalance(*args)
+    
+    monkeypatch.setattr(database, 'rebalance_sibling_group', spy)
+    statute_id = statute['statute'][0]
+    with app.test_request_context():
+        assert database.get_next_order_no(statute_id, Part, 'statute_id') == 3 * ORDER_GAP
+        assert calls == []
+        db.session.execute(db.text("UPDATE part SET order_no = :key WHERE id = :id"),
+                           {'key': ORDER_KEY_MAX - 1, 'id': statute['part'][1]})
+        assert database.get_next_order_no(statute_id, Part, 'statute_id') == 3 * ORDER_GAP
+        assert calls == [(Part, 'statute_id', statute_id)]
+        keys = db.session.execute(db.text("SELECT order_no FROM part ORDER BY order_no")).scalars().all()
+        assert keys == [ORDER_GAP, 2 * ORDER_GAP]
+        db.session.rollback()
@@ -0,0 +1,31 @@
+"""Hierarchy snapshots (database.get_hierarchy_snapshot)"""
+from database import get_hierarchy_snapshot
+
+def snapshot_row(db, statute_id):
+    return db.session.execute(db.text("SELECT revision, document IS NOT NULL FROM statute_snapshot "
+                                      "WHERE statute_id = :id"), {'id': statute_id}).first()
+
+def test_first_read_stores_snapshot_without_committing_the_session(app, db, statute):
+    from models import Statute
+    statute_id = statute['statute'][0]
+    with app.test_request_context():
+        revision, _ = snapshot_row(db, statute_id)
+        db.session.get(Statute, statute_id).name = 'Pending rename'
+        document = get_hierarchy_snapshot(statute_id)
+        assert [part['id'] for part in document['parts']] == statute['part']
+        db.session.rollback()
+        
+        # The caller's change was not committed, and no revision was used up for it
+        assert db.session.get(Statute, statute_id).name == 'Test Act'
+        assert snapshot_row(db, statute_id) == (revision, True)
+
+def test_commit_invalidates_and_bumps_the_revision(app, db, statute):
+    from models import Part
+    statute_id = statute['statute'][0]
+    with app.test_request_context():
+        get_hierarchy_snapshot(statute_id)
+        revision, _ = snapshot_row(db, statute_id)
+        db.session.get(Part, statute['part'][0]).name = 'Renamed'
+        db.session.commit()
+        assert snapshot_row(db, statute_id) == (revision + 1, False)
+        assert get_hierarchy_snapshot(statute_id)['parts'][0]['name'] == 'Renamed'
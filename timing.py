@@ -0,0 +1,109 @@
+import logging
+import random
+from contextlib import contextmanager
+from time import perf_counter
+
+from flask import current_app, g, has_app_context
+
+class PhaseTimer:
+    """
+    Wall-clock time spent in the named phases of one request or job
+
+    Phases may nest; time is charged to the innermost phase only, so a
+    fetch that runs while a template renders counts as fetch, not render,
+    and the phases add up to the time measured.
+    """
+
+    def __init__(self):
+        self.started = perf_counter()
+        self.phases = {}  # {name: seconds}, in the order first entered
+        self._stack = []
+        self._since = None
+
+    def _charge(self, now):
+        name = self._stack[-1]
+        self.phases[name] = self.phases.get(name, 0.0) + now - self._since
+        self._since = now
+
+    @contextmanager
+    def phase(self, name):
+        """Charge the time spent in the block to phase name"""
+        now = perf_counter()
+        if self._stack:
+            self._charge(now)
+        self._stack.append(name)
+        self._since = now
+        try:
+            yield
+        finally:
+            now = perf_counter()
+            self._charge(now)
+            self._stack.pop()
+
+    def iterate(self, name, iterable):
+        """Yield from iterable, charging the time spent producing each item to phase name"""
+        iterator = iter(iterable)
+        while True:
+            with self.phase(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def total(self):
+        """Seconds since the timer was started"""
+        return perf_counter() - self.started
+
+    def server_timing(self):
+        """Value for a Server-Timing header, e.g. "load;dur=1.2, commit;dur=3.4, total;dur=5.0" """
+        entries = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.phases.items()]
+        entries.append(f"total;dur={self.total() * 1000:.1f}")
+        return ", ".join(entries)
+
+    def summary(self):
+        """Phases for a log line, e.g. "total=5.0ms load=1.2ms commit=3.4ms" """
+        return " ".join([f"total={self.total() * 1000:.1f}ms"] +
+                        [f"{name}={seconds * 1000:.1f}ms" for name, seconds in self.phases.items()])
+
+def current_timer():
+    """
+    The timer of the current request (or app context), started on first use
+
+    Outside an app context a fresh timer is returned, so timed code runs the
+    same anywhere and the timings are simply not reported.
+    """
+    if not has_app_context():
+        return PhaseTimer()
+    if 'phase_timer' not in g:
+        g.phase_timer = PhaseTimer()
+    return g.phase_timer
+
+def phase(name):
+    """Time a block as phase name of the current request"""
+    return current_timer().phase(name)
+
+def trace_enabled():
+    """
+    Whether this request is traced
+
+    Decided once per request: a TRACE_SAMPLE_RATE share of requests is traced,
+    and only while the app logger lets DEBUG records through.
+    """
+    if not has_app_context():
+        return False
+    if 'trace_sampled' not in g:
+        rate = current_app.config.get('TRACE_SAMPLE_RATE', 0.0)
+        g.trace_sampled = (current_app.logger.isEnabledFor(logging.DEBUG)
+                           and rate > 0 and random.random() < rate)
+    return g.trace_sampled
+
+def trace(message, *args):
+    """
+    Log a debug line for sampled requests
+
+    Args are %-formatted by logging, so nothing is formatted for requests
+    that are not traced.
+    """
+    if trace_enabled():
+        current_app.logger.debug(message, *args)